@@ -0,0 +1,52 @@
+"""
+Compares solving tracks in float32 and float64.
+
+    python benchmarks/bench_precision.py
+
+For each size, reports the time for a fixed number of optimize iterations,
+the peak memory allocated while doing them, and the largest difference in
+the solved curve between the two types.
+"""
+import time
+import tracemalloc
+
+import numpy as np
+
+from editor.core import hermite
+
+
+def points(n, dtype):
+    r = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    radius = (n * 10) * (1 + 0.1 * np.sin(7 * r))
+    return np.stack((radius * np.sin(r), radius * np.cos(r), 20 * np.sin(5 * r)), axis=1).astype(dtype)
+
+
+def solve(p, its=10):
+    m0, a, b, tangents, lengths = hermite.construct(p)
+    return hermite.optimize(p, tangents, lengths, its)
+
+
+def measure(n, dtype):
+    p = points(n, dtype)
+    solve(p, 1)
+    start = time.perf_counter()
+    result = solve(p)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    solve(p)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    print(f'{"points":>8} {"f32 ms":>8} {"f64 ms":>8} {"f32 MiB":>8} {"f64 MiB":>8} {"max rel err":>12}')
+    for n in (100, 1000, 10000, 100000):
+        t32, m32, r32 = measure(n, np.float32)
+        t64, m64, r64 = measure(n, np.float64)
+        err = np.max(np.abs(r32[0] - r64[0])) / np.max(np.abs(r64[0]))
+        print(f'{n:>8} {t32 * 1000:>8.1f} {t64 * 1000:>8.1f} {m32 / 2**20:>8.1f} {m64 / 2**20:>8.1f} {err:>12.2e}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+
+SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+
+
+def pytest_addoption(parser):
+    parser.addoption('--max-points', type=int, default=100000, help="Largest track to benchmark.")
+
+
+def pytest_generate_tests(metafunc):
+    if 'n' in metafunc.fixturenames:
+        sizes = [n for n in SIZES if n <= metafunc.config.getoption('max_points')]
+        metafunc.parametrize('n', sizes, ids=[f'{n}pts' for n in sizes])
+
+
+def track_points(n):
+    """A closed, hilly, wobbly track of n points with roughly 10 units between them."""
+    r = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    radius = (n * 10 / (2 * np.pi)) * (1 + 0.05 * np.sin(7 * r))
+    return np.stack((radius * np.sin(r), radius * np.cos(r), 20 * np.sin(5 * r)), axis=1)
+
+
+@pytest.fixture
+def points(n):
+    return track_points(n)
+
+
+@pytest.fixture
+def peak_memory(benchmark):
+    """Runs f once under tracemalloc and records the peak allocation in the results."""
+    def measure(f, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            result = f(*args, **kwargs)
+            benchmark.extra_info['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result
+    return measure
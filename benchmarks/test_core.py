@@ -0,0 +1,76 @@
+"""
+Benchmarks for the core engine. These do not need a display or a GPU.
+
+    python -m pytest benchmarks --benchmark-save=baseline
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:20%
+
+Each result records the peak memory allocated by one extra run in
+extra_info, and the solver benchmarks also record iterations to converge.
+"""
+import numpy as np
+import pytest
+
+from editor.core import hermite
+from editor.core.track import Track
+
+
+def rounds(n):
+    return max(1, min(20, 200000 // n))
+
+
+@pytest.fixture
+def track(points):
+    return Track(points)
+
+
+def test_construct(benchmark, peak_memory, track, n):
+    peak_memory(track.construct, keep=False)
+    benchmark.pedantic(track.construct, kwargs={'keep': False}, rounds=rounds(n))
+
+
+def test_optimize(benchmark, peak_memory, points, n):
+    p = points.astype(np.float32)
+    m0, a, b, tangents, lengths = hermite.construct(p)
+    peak_memory(hermite.optimize, p, tangents, lengths, 20)
+    benchmark.pedantic(hermite.optimize, (p, tangents, lengths, 20), rounds=rounds(n))
+
+
+def test_converge(benchmark, points, n):
+    p = points.astype(np.float32)
+    m0, a, b, tangents, lengths = hermite.construct(p)
+    result = benchmark.pedantic(hermite.optimize, (p, tangents, lengths, 200), {'return_its': True}, rounds=1)
+    benchmark.extra_info['iterations'] = result[-1]
+
+
+def selected_track(points, step=10):
+    track = Track(points)
+    track.select(np.arange(0, track.P.shape[0], step))
+    return track
+
+
+def test_subdivide(benchmark, peak_memory, points, n):
+    peak_memory(selected_track(points).add_after)
+    benchmark.pedantic(Track.add_after, setup=lambda: ((selected_track(points), ), {}), rounds=min(5, rounds(n)))
+
+
+def test_delete(benchmark, peak_memory, points, n):
+    if n < 20:
+        pytest.skip("too few points to delete from")
+    peak_memory(selected_track(points).delete)
+    benchmark.pedantic(Track.delete, setup=lambda: ((selected_track(points), ), {}), rounds=min(5, rounds(n)))
+
+
+def test_serialize(benchmark, peak_memory, track, n):
+    peak_memory(track.serialize)
+    benchmark.pedantic(track.serialize, rounds=rounds(n))
+
+
+def test_deserialize(benchmark, peak_memory, track, n):
+    jsonstr = track.serialize()
+    peak_memory(Track().deserialize, jsonstr)
+    benchmark.pedantic(Track().deserialize, (jsonstr, ), rounds=min(5, rounds(n)))
+
+
+def test_snapshot(benchmark, peak_memory, track, n):
+    peak_memory(track.create_snapshot)
+    benchmark.pedantic(track.create_snapshot, rounds=rounds(n))
@@ -0,0 +1,138 @@
+"""
+Rendering benchmarks. These need an OpenGL 3.3 context but not a GPU, eg.
+
+    xvfb-run python -m pytest benchmarks/test_render.py
+
+runs them on Mesa llvmpipe. They are skipped if no context can be made.
+Each frame is finished with glFinish so the timings include the GL work.
+extra_info records the GL calls made and bytes uploaded by one frame.
+"""
+import collections
+import functools
+import os
+
+import pytest
+
+QtGui = pytest.importorskip('PySide6.QtGui')
+QtWidgets = pytest.importorskip('PySide6.QtWidgets')
+gl = pytest.importorskip('OpenGL.GL')
+
+from editor.gui import shaders, trackglsl, view
+from editor.gui.trackglsl import TrackGLSL
+from editor.gui.view import View3D, View1D
+
+
+class CallCounter:
+    """
+    Stands in for OpenGL.GL in the modules under test, counting the calls
+    made through it. ShaderProgram methods which call GL through Qt are
+    counted too.
+    """
+
+    def __init__(self, module):
+        self._module = module
+        self.counts = collections.Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self._module, name)
+        if name.startswith('gl') and callable(attr):
+            return self._counted(name, attr)
+        return attr
+
+    def _counted(self, name, f):
+        @functools.wraps(f)
+        def counted(*args, **kwargs):
+            self.counts[name] += 1
+            return f(*args, **kwargs)
+        return counted
+
+    def patch(self, monkeypatch):
+        for module in (shaders, trackglsl, view):
+            monkeypatch.setattr(module, 'gl', self)
+        for name in ('bind', 'setUniform', 'setUniform1f', 'setUniform1i', 'setAttribute'):
+            monkeypatch.setattr(shaders.ShaderProgram, name, self._counted(name, getattr(shaders.ShaderProgram, name)))
+
+
+@pytest.fixture(scope='session')
+def app():
+    # the offscreen platform can still use GLX when there is an X server, eg. Xvfb
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    context = QtGui.QOpenGLContext()
+    surface = QtGui.QOffscreenSurface()
+    surface.create()
+    if not context.create() or not context.makeCurrent(surface):
+        pytest.skip("no OpenGL context available")
+    version = context.format().version()
+    context.doneCurrent()
+    if version < (3, 3):
+        pytest.skip(f"OpenGL {version} is too old")
+    return app
+
+
+@pytest.fixture(params=[View3D, View1D], ids=['3d', '1d'])
+def widget(request, app, points):
+    w = request.param(None, TrackGLSL(points))
+    w.resize(800, 600)
+    # grabbing a frame runs initializeGL and resizeGL
+    w.grabFramebuffer()
+    w.makeCurrent()
+    yield w
+    w.doneCurrent()
+
+
+def buffers(track):
+    return (track._points_vbo, track._selection_vbo)
+
+
+def record_frame(benchmark, monkeypatch, track, frame):
+    """Runs one frame with GL calls and uploads counted, and records them."""
+    uploaded = sum(b.uploaded for b in buffers(track))
+    counter = CallCounter(gl)
+    with monkeypatch.context() as m:
+        counter.patch(m)
+        frame()
+    benchmark.extra_info['gl_calls'] = sum(counter.counts.values())
+    benchmark.extra_info['gl_call_counts'] = dict(counter.counts)
+    benchmark.extra_info['bytes_uploaded'] = sum(b.uploaded for b in buffers(track)) - uploaded
+
+
+def finished(f, *args, **kwargs):
+    def frame():
+        f(*args, **kwargs)
+        gl.glFinish()
+    return frame
+
+
+@pytest.mark.parametrize('interp', [10, 20, 40])
+def test_draw(benchmark, monkeypatch, widget, interp, n):
+    track = widget._track
+    frame = finished(track.draw, widget._camera.mvp, interp=interp, mode=widget.mode)
+    record_frame(benchmark, monkeypatch, track, frame)
+    benchmark(frame)
+
+
+def test_draw_ids(benchmark, monkeypatch, widget, n):
+    track = widget._track
+    frame = finished(track.draw_ids, widget._camera.mvp, mode=widget.mode)
+    record_frame(benchmark, monkeypatch, track, frame)
+    benchmark(frame)
+
+
+def test_paint(benchmark, monkeypatch, widget, n):
+    frame = finished(widget.paintGL)
+    record_frame(benchmark, monkeypatch, widget._track, frame)
+    benchmark(frame)
+
+
+def test_upload(benchmark, monkeypatch, widget, n):
+    """A frame after an edit, which has to upload the points again first."""
+    track = widget._track
+
+    def edited():
+        track._points_vbo.modified()
+        widget.paintGL()
+        gl.glFinish()
+
+    record_frame(benchmark, monkeypatch, track, edited)
+    benchmark(edited)
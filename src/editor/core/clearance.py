@@ -0,0 +1,178 @@
+import argparse
+import pathlib
+
+import numpy as np
+
+from . import hermite
+from .track import Track
+
+
+"""
+Self-intersection and clearance checking.
+
+Each segment is sampled and wrapped in a bounding box padded by half the
+clearance. Boxes are swept along X to find candidate pairs, and only those
+pairs have their samples compared. Parts of the track that are close to
+each other along the track are not compared, and neither are parts that
+pass over each other with at least headroom between them.
+
+"""
+
+
+def candidate_pairs(mins, maxs, query):
+    """
+    Sweep and prune. Returns the (query, other) index pairs whose boxes
+    overlap, for the boxes in query against all boxes.
+    """
+    order = np.argsort(mins[:, 0], kind='stable')
+    smin = mins[order, 0]
+    width = np.max(maxs[:, 0] - mins[:, 0])
+    lo = np.searchsorted(smin, mins[query, 0] - width, side='left')
+    hi = np.searchsorted(smin, maxs[query, 0], side='right')
+    counts = hi - lo
+    a = np.repeat(query, counts)
+    b = order[np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+    keep = (
+        (a != b)
+        & (mins[a, 0] <= maxs[b, 0]) & (mins[b, 0] <= maxs[a, 0])
+        & (mins[a, 1] <= maxs[b, 1]) & (mins[b, 1] <= maxs[a, 1])
+    )
+    return a[keep], b[keep]
+
+
+def _cross(o, a, b):
+    return ((a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1])) - ((a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0]))
+
+
+def chords_intersect(p0, p1, q0, q1):
+    """Tests whether the 2D chords p0-p1 and q0-q1 properly intersect."""
+    d1 = _cross(q0, q1, p0)
+    d2 = _cross(q0, q1, p1)
+    d3 = _cross(p0, p1, q0)
+    d4 = _cross(p0, p1, q1)
+    return (d1 * d2 < 0) & (d3 * d4 < 0)
+
+
+class ClearanceChecker:
+    """
+    Finds pairs of segments which cross or come within clearance of each
+    other. update() only re-checks segments whose curve data moved by more
+    than tolerance since they were last checked.
+    """
+
+    def __init__(self, clearance=12, headroom=5, steps=8, tolerance=1e-3):
+        self.clearance = clearance
+        self.headroom = headroom
+        self._steps = steps
+        self._tolerance = tolerance
+        self._data = None
+        self._conflicts = {}
+
+    @property
+    def conflicts(self):
+        """Dict mapping segment pairs (a, b) with a < b to (distance, crossing)."""
+        return self._conflicts
+
+    @property
+    def segments(self):
+        """Sorted array of the segments involved in any conflict."""
+        return np.unique(np.array(list(self._conflicts.keys()), dtype=np.intp).reshape(-1))
+
+    def _sample(self, track, segments):
+        p, dp, ddp = hermite.eval(
+            track.P[segments], track.M[segments], track.A[segments], track.B[segments],
+            track._len[segments], steps=self._steps
+        )
+        self._samples[segments] = p
+        self._mins[segments] = np.min(p[:, :, :2], axis=1) - (self.clearance / 2)
+        self._maxs[segments] = np.max(p[:, :, :2], axis=1) + (self.clearance / 2)
+
+    def _narrow(self, track, a, b):
+        pa = self._samples[a]
+        pb = self._samples[b]
+        t = np.linspace(0, 1, self._steps)
+        da = track._distances[a, :1] + (track._len[a, np.newaxis] * t)
+        db = track._distances[b, :1] + (track._len[b, np.newaxis] * t)
+        along = np.abs(da[:, :, np.newaxis] - db[:, np.newaxis, :])
+        along = np.minimum(along, track.total_length - along)
+        dz = np.abs(pa[:, :, np.newaxis, 2] - pb[:, np.newaxis, :, 2])
+        valid = (along > self.clearance * np.pi / 2) & (dz < self.headroom)
+        dist = np.linalg.norm(pa[:, :, np.newaxis, :2] - pb[:, np.newaxis, :, :2], axis=3)
+        dist = np.min(np.where(valid, dist, np.inf), axis=(1, 2))
+        crossing = chords_intersect(
+            pa[:, :-1, np.newaxis, :2], pa[:, 1:, np.newaxis, :2],
+            pb[:, np.newaxis, :-1, :2], pb[:, np.newaxis, 1:, :2],
+        ) & valid[:, :-1, :-1]
+        crossing = np.any(crossing, axis=(1, 2))
+        return dist, crossing
+
+    def _check(self, track, segments):
+        a, b = candidate_pairs(self._mins, self._maxs, segments)
+        a, b = np.minimum(a, b), np.maximum(a, b)
+        # neighbours along the track can never conflict, so skip them before sampling
+        d = track._distances
+        near = (np.maximum(d[a, 1], d[b, 1]) - np.minimum(d[a, 0], d[b, 0])) <= self.clearance * np.pi / 2
+        a, b = a[~near], b[~near]
+        if len(a):
+            pairs = np.unique(np.stack((a, b), axis=1), axis=0)
+            a, b = pairs[:, 0], pairs[:, 1]
+        dist, crossing = self._narrow(track, a, b)
+        for i in np.where(crossing | (dist < self.clearance))[0]:
+            self._conflicts[(int(a[i]), int(b[i]))] = (float(dist[i]), bool(crossing[i]))
+
+    def update(self, track, rows=None):
+        """
+        Brings the conflicts up to date with track and returns the number of
+        segments that were re-checked. If rows is given, only the control
+        points in it can have changed since the last update.
+        """
+        n = track._data.shape[0]
+        if self._data is None or self._data.shape != track._data.shape:
+            self._samples = np.empty((n, self._steps, 3))
+            self._mins = np.empty((n, 2))
+            self._maxs = np.empty((n, 2))
+            self._conflicts = {}
+            self._data = track._data.copy()
+            dirty = np.arange(n)
+        else:
+            candidates = hermite.segments_around(rows, n)
+            moved = np.any(np.abs(self._data[candidates] - track._data[candidates]) > self._tolerance, axis=(1, 2))
+            dirty = candidates[moved]
+            if not len(dirty):
+                return 0
+            changed = set(dirty.tolist())
+            self._conflicts = {k: v for k, v in self._conflicts.items() if not changed.intersection(k)}
+            self._data[dirty] = track._data[dirty]
+        self._sample(track, dirty)
+        self._check(track, dirty)
+        return len(dirty)
+
+
+def check(track, clearance=12, headroom=5, steps=8):
+    """Checks a whole track and returns its conflicts."""
+    checker = ClearanceChecker(clearance, headroom, steps)
+    checker.update(track)
+    return checker.conflicts
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Check tracks for self-intersections and insufficient clearance.")
+    parser.add_argument('tracks', type=pathlib.Path, nargs='+', help="Track files to check.")
+    parser.add_argument('-c', '--clearance', type=float, default=12, help="Minimum distance between parts of the track.")
+    parser.add_argument('--headroom', type=float, default=5, help="Height difference at which parts of the track may cross.")
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.tracks:
+        track = Track()
+        track.deserialize(path.read_text())
+        conflicts = check(track, args.clearance, args.headroom)
+        for (a, b), (dist, crossing) in sorted(conflicts.items()):
+            kind = 'crosses' if crossing else f'is {dist:.1f} from'
+            print(f'{path}: segment {a} {kind} segment {b}')
+        failed |= bool(conflicts)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    run()
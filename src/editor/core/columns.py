@@ -0,0 +1,86 @@
+import numpy as np
+
+
+class ColumnStore:
+    """
+    Per-point attributes interleaved in a single structured array. Rows are
+    inserted, deleted and snapshotted for every column at once, and the whole
+    array can be uploaded as one vertex buffer using offset() and stride.
+    """
+
+    def __init__(self, columns, n=0):
+        self._array = np.zeros((n, ), dtype=np.dtype(columns))
+        self._fills = {}
+
+    def __len__(self):
+        return self._array.shape[0]
+
+    def __getitem__(self, name):
+        """Returns a writable view of a column."""
+        return self._array[name]
+
+    @property
+    def array(self):
+        return self._array
+
+    @property
+    def columns(self):
+        return self._array.dtype.names
+
+    @property
+    def stride(self):
+        """Size in bytes of one row."""
+        return self._array.dtype.itemsize
+
+    def offset(self, name, *index):
+        """Byte offset of a column within a row, or of one element of an array column."""
+        dtype, offset = self._array.dtype.fields[name][:2]
+        if index:
+            offset += int(np.ravel_multi_index(index, dtype.shape)) * dtype.base.itemsize
+        return offset
+
+    def add_column(self, name, dtype, shape=(), fill=0):
+        """Adds a column to every row. Existing columns are kept."""
+        if name in self.columns:
+            raise ValueError(f"Column {name} already exists.")
+        descr = [(n, self._array.dtype.fields[n][0]) for n in self.columns]
+        array = np.empty(self._array.shape, dtype=descr + [(name, dtype, shape)])
+        for n in self.columns:
+            array[n] = self._array[n]
+        array[name] = fill
+        self._array = array
+        self._fills[name] = fill
+
+    def rows(self, indices):
+        """Returns a copy of the given rows for passing to insert()."""
+        return self._array[indices].copy()
+
+    def insert(self, indices, rows):
+        self._array = np.insert(self._array, indices, rows, axis=0)
+
+    def delete(self, indices):
+        self._array = np.delete(self._array, indices, axis=0)
+
+    def resize(self, n):
+        """
+        Replaces every row with n new rows, zeroed except for added columns,
+        which take their fill value.
+        """
+        self._array = np.zeros((n, ), dtype=self._array.dtype)
+        for name, fill in self._fills.items():
+            self._array[name] = fill
+
+    def snapshot(self):
+        return self._array.copy()
+
+    def restore(self, snapshot):
+        """
+        Restores a snapshot. Columns added since it was taken are kept, and
+        take their fill value.
+        """
+        if snapshot.dtype != self._array.dtype:
+            array = np.empty(snapshot.shape, dtype=self._array.dtype)
+            for n in self.columns:
+                array[n] = snapshot[n] if n in snapshot.dtype.names else self._fills[n]
+            snapshot = array
+        self._array = snapshot
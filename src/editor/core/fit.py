@@ -0,0 +1,291 @@
+import argparse
+import pathlib
+import sys
+
+import numpy as np
+
+from . import hermite
+from .importer import READERS, douglas_peucker
+from .track import Track, TrackException
+
+
+"""
+Least-squares fitting of a track to reference geometry.
+
+The reference is a dense closed polyline, such as a surveyed centre line.
+Each iteration solves the curve through the control points, samples it,
+and finds the closest point on the curve to every reference sample with a
+grid index. Every control point then moves by the mean residual of the
+samples on its two segments, weighted by the Hermite basis function that
+gives its influence on them. That is one Jacobi step of the linearised
+least squares problem.
+
+Segments whose error stays above the tolerance are subdivided. Once
+everything is within tolerance, control points between two good segments
+are removed for as long as the fit can recover.
+
+    python -m editor.core.fit survey.csv --tolerance 0.5 -o track.json
+
+"""
+
+
+class GridIndex:
+    """
+    Nearest neighbour queries in 3D over points bucketed into a uniform
+    grid on XY. Queries search outwards from their own cell until the best
+    candidate is closer than any unsearched cell.
+    """
+
+    def __init__(self, points, cell):
+        self._points = points
+        self._cell = cell
+        cells = np.floor(points[:, :2] / cell).astype(np.int64)
+        self._origin = cells.min(axis=0)
+        cells -= self._origin
+        self._stride = int(cells[:, 1].max()) + 1
+        keys = (cells[:, 0] * self._stride) + cells[:, 1]
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+
+    def nearest(self, queries):
+        """Returns the index of and distance to the nearest point for each query."""
+        index = np.full((queries.shape[0], ), -1, dtype=np.intp)
+        dist = np.full((queries.shape[0], ), np.inf)
+        cells = np.floor(queries[:, :2] / self._cell).astype(np.int64) - self._origin
+        low = cells.min(axis=0)
+        width = int(cells[:, 1].max() - low[1]) + 1
+        query_keys = ((cells[:, 0] - low[0]) * width) + (cells[:, 1] - low[1])
+        pending = np.arange(queries.shape[0])
+        radius = 1
+        while len(pending):
+            # look up the candidates once per occupied query cell
+            unique, first, inverse = np.unique(query_keys[pending], return_index=True, return_inverse=True)
+            offsets = np.arange(-radius, radius + 1)
+            cx = cells[pending[first], 0, np.newaxis, np.newaxis] + offsets[:, np.newaxis]
+            cy = cells[pending[first], 1, np.newaxis, np.newaxis] + offsets[np.newaxis, :]
+            keys = np.where((cy >= 0) & (cy < self._stride), (cx * self._stride) + cy, -1).reshape(len(unique), -1)
+            lo = np.searchsorted(self._keys, keys, side='left')
+            sizes = np.searchsorted(self._keys, keys, side='right') - lo
+            sizes[keys < 0] = 0
+            cell_counts = sizes.sum(axis=1)
+            lo, sizes = lo.ravel(), sizes.ravel()
+            cell_candidates = self._order[np.repeat(lo - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())]
+
+            # then expand them to every query, grouped by query
+            counts = cell_counts[inverse]
+            starts = (np.cumsum(cell_counts) - cell_counts)[inverse]
+            owners = np.repeat(pending, counts)
+            candidates = cell_candidates[np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+            diff = self._points[candidates] - queries[owners]
+            d = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+            if len(d):
+                found = counts > 0
+                mins = np.minimum.reduceat(d, (np.cumsum(counts) - counts)[found])
+                hits = np.flatnonzero(d == np.repeat(mins, counts[found]))
+                best = hits[np.flatnonzero(np.diff(owners[hits], prepend=-1))]
+                better = d[best] < dist[owners[best]]
+                dist[owners[best][better]] = d[best][better]
+                index[owners[best][better]] = candidates[best][better]
+            # anything outside the searched square is at least radius cells away
+            pending = pending[dist[pending] > radius * self._cell]
+            radius *= 2
+        return index, dist
+
+
+class HermiteFit:
+    """
+    Fits the control points of a closed curve to reference samples, a
+    (n, 3) array in order along the track. steps is the number of samples
+    per segment used for closest point queries.
+    """
+
+    _STATE = ('points', '_tan', '_len', '_curve', 'segment', 't', 'closest', 'distances', 'segment_errors')
+
+    def __init__(self, reference, tolerance=1.0, steps=16, points=None):
+        self.reference = np.asarray(reference, dtype=np.float64)
+        self.tolerance = tolerance
+        self._steps = steps
+        if points is None:
+            closed = np.concatenate((self.reference, self.reference[:1]))
+            points = closed[douglas_peucker(closed, tolerance * 4)[:-1]]
+        if len(points) < 3:
+            raise TrackException("Not enough points to make a track.")
+        self.set_points(points)
+        self.iterations = 0
+
+    def snapshot(self):
+        """Returns the current fit, which is replaced but never modified in place."""
+        return {name: getattr(self, name) for name in self._STATE}
+
+    def restore(self, snapshot):
+        self.__dict__.update(snapshot)
+
+    def set_points(self, points):
+        self.points = np.array(points, dtype=np.float64)
+        self._tan = None
+        self._len = None
+        self._solve(20)
+
+    def _solve(self, its):
+        if self._tan is None:
+            M, A, B, self._tan, self._len = hermite.construct(self.points)
+        M, A, B, self._tan, self._len = hermite.optimize(self.points, self._tan, self._len, its)
+        self._curve = (M, A, B)
+        self._evaluate()
+
+    def _evaluate(self):
+        """Finds the closest point on the curve to each reference sample."""
+        M, A, B = self._curve
+        n = self.points.shape[0]
+        # the curve as a closed polyline, without the duplicated end of each segment
+        per = self._steps - 1
+        vertices = hermite.eval(self.points, M, A, B, self._len, steps=self._steps)[0][:, :-1].reshape(-1, 3)
+        spacing = np.mean(self._len) / per
+        nearest, dist = GridIndex(vertices, max(spacing, self.tolerance)).nearest(self.reference)
+
+        # refine to the closer of the chords either side of the nearest vertex
+        chord = nearest.copy()
+        u = np.zeros((self.reference.shape[0], ))
+        closest = vertices[nearest]
+        for c in ((nearest - 1) % len(vertices), nearest):
+            a = vertices[c]
+            ab = vertices[(c + 1) % len(vertices)] - a
+            length2 = np.maximum(np.sum(ab * ab, axis=1), 1e-300)
+            cu = np.clip(np.sum((self.reference - a) * ab, axis=1) / length2, 0, 1)
+            p = a + (cu[:, np.newaxis] * ab)
+            d = np.linalg.norm(self.reference - p, axis=1)
+            closer = d < dist
+            dist = np.where(closer, d, dist)
+            closest = np.where(closer[:, np.newaxis], p, closest)
+            chord = np.where(closer, c, chord)
+            u = np.where(closer, cu, u)
+
+        self.segment, step = np.divmod(chord, per)
+        self.t = (step + u) / per
+        self.closest = closest
+        self.distances = dist
+        self.segment_errors = np.zeros((n, ))
+        np.maximum.at(self.segment_errors, self.segment, dist)
+
+    @property
+    def max_error(self):
+        return float(np.max(self.distances))
+
+    @property
+    def rms_error(self):
+        return float(np.sqrt(np.mean(self.distances ** 2)))
+
+    def relax(self, its=5):
+        """Moves every control point by its weighted mean residual and re-solves the curve."""
+        n = self.points.shape[0]
+        t = self.t
+        h0 = (2 * t**3) - (3 * t**2) + 1
+        h1 = 1 - h0
+        residual = self.reference - self.closest
+        nxt = (self.segment + 1) % n
+        weights = np.bincount(self.segment, h0, n) + np.bincount(nxt, h1, n)
+        delta = np.stack([
+            np.bincount(self.segment, h0 * residual[:, k], n) + np.bincount(nxt, h1 * residual[:, k], n)
+            for k in range(3)
+        ], axis=1)
+        self.points = self.points + (delta / np.where(weights > 0, weights, 1)[:, np.newaxis])
+        self.iterations += 1
+        self._solve(its)
+
+    def subdivide(self, limit=None):
+        """
+        Splits the segments with error above the tolerance, worst first, at
+        their midpoints. Returns the number split.
+        """
+        bad = np.flatnonzero(self.segment_errors > self.tolerance)
+        if limit is not None:
+            bad = bad[np.argsort(self.segment_errors[bad])[::-1][:limit]]
+        if not len(bad):
+            return 0
+        M, A, B = self._curve
+        mid = hermite.eval(self.points[bad], M[bad], A[bad], B[bad], self._len[bad], steps=[0.5])[0][:, 0]
+        self.set_points(np.insert(self.points, np.sort(bad) + 1, mid[np.argsort(bad)], axis=0))
+        return len(bad)
+
+    def remove(self, fraction=0.1):
+        """
+        Removes up to fraction of the control points, choosing those whose
+        segments on both sides are within half the tolerance and never two
+        neighbours. Returns the number removed.
+        """
+        n = self.points.shape[0]
+        around = np.maximum(self.segment_errors, np.roll(self.segment_errors, 1))
+        candidates = np.flatnonzero(around < self.tolerance / 2)
+        candidates = candidates[np.argsort(around[candidates], kind='stable')][:int(n * fraction)]
+        chosen = np.zeros((n, ), dtype=bool)
+        for j in candidates.tolist():
+            if not (chosen[j - 1] or chosen[(j + 1) % n]):
+                chosen[j] = True
+        if n - np.count_nonzero(chosen) < 3 or not np.any(chosen):
+            return 0
+        self.set_points(self.points[~chosen])
+        return int(np.count_nonzero(chosen))
+
+    def settle(self, steps=5):
+        """
+        Relaxes until every sample is within tolerance, the error stops
+        improving or steps have been taken. Returns True if within tolerance.
+        """
+        for i in range(steps):
+            if self.max_error <= self.tolerance:
+                return True
+            error = self.max_error
+            self.relax()
+            if self.max_error > error * 0.99:
+                break
+        return self.max_error <= self.tolerance
+
+    def fit(self, rounds=50, relax_steps=5, simplify=True):
+        """
+        Relaxes and subdivides until every sample is within tolerance, then
+        removes control points while the fit stays within it. Returns True
+        if the tolerance was met.
+        """
+        for round in range(rounds):
+            if self.settle(relax_steps):
+                break
+            self.subdivide(limit=max(1, self.points.shape[0] // 4))
+        else:
+            return False
+
+        while simplify:
+            accepted = self.snapshot()
+            if not self.remove() or not self.settle(relax_steps):
+                self.restore(accepted)
+                break
+        return True
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Fit a track to a dense CSV, GPX or SVG reference line.")
+    parser.add_argument('reference', type=pathlib.Path, help="Reference line to fit.")
+    parser.add_argument('-t', '--tolerance', type=float, default=1.0, help="Maximum distance of the curve from the reference.")
+    parser.add_argument('-o', '--output', type=pathlib.Path, required=True, help="Track file to write.")
+    args = parser.parse_args()
+
+    try:
+        reader = READERS[args.reference.suffix.lower()]
+    except KeyError:
+        raise SystemExit(f"Cannot read {args.reference.suffix} files.")
+    reference = np.concatenate(list(reader(args.reference)))
+    result = HermiteFit(reference, args.tolerance)
+    met = result.fit()
+    args.output.write_text(Track(result.points).serialize())
+
+    distances = np.concatenate(([0], np.cumsum(result._len)))
+    for n in np.argsort(result.segment_errors)[::-1][:10].tolist():
+        print(f'segment {n} at {distances[n]:.0f}m: max error {result.segment_errors[n]:.3f}', file=sys.stderr)
+    print(
+        f'{result.points.shape[0]} control points, max error {result.max_error:.3f}, '
+        f'rms {result.rms_error:.3f}, {result.iterations} iterations', file=sys.stderr
+    )
+    raise SystemExit(0 if met else 1)
+
+
+if __name__ == '__main__':
+    run()
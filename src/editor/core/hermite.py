@@ -1,5 +1,7 @@
 import numpy as np
 
+from .profile import timed
+
 
 """
 Cubic Hermite curve constructor.
@@ -12,6 +14,9 @@ Properties:
 1. Near constant speed, ie magnitude of first differential.
 2. Near continuous curvature.
 
+All functions work in the floating point type of the points they are
+given and do not promote float32 input to float64.
+
 """
 
 
@@ -36,6 +41,18 @@ def rotate_vectors_2d(vectors, angles):
     return result
 
 
+def rotate_vectors_axis(vectors, rotations):
+    """Rotates each vector by the matching axis-angle rotation vector."""
+    angles = np.linalg.norm(rotations, axis=1)[..., np.newaxis]
+    axes = rotations / np.where(angles > 0, angles, 1)
+    cos = np.cos(angles)
+    sin = np.sin(angles)
+    dot = np.sum(axes * vectors, axis=1)[..., np.newaxis]
+    result = (vectors * cos) + (np.cross(axes, vectors) * sin) + (axes * dot * (1 - cos))
+    result /= np.linalg.norm(result, axis=1)[..., np.newaxis]
+    return result
+
+
 def rotate_vectors(vectors, angles):
     if vectors.shape[1] == 3:
         return rotate_vectors_3d(vectors, angles)
@@ -49,6 +66,17 @@ def cyclic_diff(arr, first, second):
     return b - a
 
 
+def segments_around(rows, n):
+    """
+    Returns the sorted segments of an n point track which start or end at
+    the control points in rows, or every segment if rows is None.
+    """
+    if rows is None:
+        return np.arange(n)
+    rows = np.asarray(rows, dtype=np.intp)
+    return np.unique(np.concatenate((rows, rows - 1)) % n)
+
+
 def m(P0, tangents, lengths):
     P1 = np.roll(P0, -1, axis=0)
     M0 = tangents * lengths[..., np.newaxis]
@@ -68,9 +96,9 @@ def eval(P0, M0, A, B, lengths, steps: (int, list[int]) = 3):
     A = A[:, np.newaxis, :]
     B = B[:, np.newaxis, :]
     if isinstance(steps, int):
-        t = np.linspace(0, 1, steps)[np.newaxis, :, np.newaxis]
+        t = np.linspace(0, 1, steps, dtype=P0.dtype)[np.newaxis, :, np.newaxis]
     else:
-        t = np.array(steps)[np.newaxis, :, np.newaxis]
+        t = np.array(steps, dtype=P0.dtype)[np.newaxis, :, np.newaxis]
     t2 = t ** 2
     t3 = t ** 3
     r = (A * t3) + (B * t2) + (M0 * t) + P0
@@ -110,17 +138,52 @@ def curvature(dp, ddp):
     return den/num
 
 
+def curvature_vectors(dp, ddp):
+    num = np.linalg.norm(dp, axis=2)[..., np.newaxis]**4
+    return np.cross(np.cross(dp, ddp), dp) / num
+
+
 def discontinuity(dp, ddp):
     c = curvature(dp, ddp)
     return np.roll(c[:, -1], 1, axis=0) - c[:, 0]
 
 
+def discontinuity_vectors(dp, ddp):
+    k = curvature_vectors(dp, ddp)
+    return np.roll(k[:, -1], 1, axis=0) - k[:, 0]
+
+
+def converged(error, curvature, stalled=0):
+    """
+    Tests the total curvature discontinuity against 1e-10. Types less precise
+    than float64 cannot always get that close, so they are also converged
+    once the error is within the rounding noise of the curvature, or after
+    stalled iterations without improving on the best error so far.
+    """
+    total = np.sum(error)
+    if total < 1e-10:
+        return True
+    eps = np.finfo(error.dtype).eps
+    if eps <= np.finfo(np.float64).eps:
+        return False
+    return total < 32 * eps * np.sum(curvature) or stalled >= 3
+
+
 def _construct(P0, tangents, lengths):
     P1, M0, M1 = m(P0, tangents, lengths)
     A, B = coeffs(P0, P1, M0, M1)
     return M0, A, B
 
 
+def construct_segments(P0, tangents, lengths, segments):
+    """Constructs only the given segments, from existing tangents and lengths."""
+    nxt = (segments + 1) % P0.shape[0]
+    M0 = tangents[segments] * lengths[segments, np.newaxis]
+    M1 = tangents[nxt] * lengths[segments, np.newaxis]
+    A, B = coeffs(P0[segments], P0[nxt], M0, M1)
+    return M0, A, B
+
+
 def construct(P0, tangents=None, lengths=None):
     if tangents is None:
         tangents = base_tangents(P0)
@@ -131,10 +194,14 @@ def construct(P0, tangents=None, lengths=None):
     return M0, A, B, tangents, lengths
 
 
-def optimize(P0, tangents, lengths, max_opt_its=1, opt_steps=32):
+@timed('hermite.optimize')
+def optimize(P0, tangents, lengths, max_opt_its=1, opt_steps=32, return_its=False):
     M0, A, B = _construct(P0, tangents, lengths)
 
-    for n in range(max_opt_its):
+    its = 0
+    best = np.inf
+    stalled = 0
+    for its in range(1, max_opt_its + 1):
         # update length approximation
         p, dp, ddp = eval(P0, M0, A, B, lengths, steps=opt_steps)
         lengths = estimate_lengths(p)
@@ -142,11 +209,27 @@ def optimize(P0, tangents, lengths, max_opt_its=1, opt_steps=32):
 
         # turn tangents towards curvature discontinuity
         p, dp, ddp = eval(P0, M0, A, B, lengths, steps=[0, 1])
-        e = discontinuity(dp[:, :2], ddp[:, :2])
-        if np.sum(np.abs(e)) < 1e-10:
+        if P0.shape[1] == 3:
+            # rotate about the axis perpendicular to the tangent and the
+            # curvature error, which is the z axis for flat tracks
+            k = curvature_vectors(dp, ddp)
+            e = np.roll(k[:, -1], 1, axis=0) - k[:, 0]
+            error, c = np.linalg.norm(e, axis=1), np.linalg.norm(k[:, 0], axis=1)
+        else:
+            c = curvature(dp, ddp)
+            e = np.roll(c[:, -1], 1, axis=0) - c[:, 0]
+            error, c = np.abs(e), np.abs(c[:, 0])
+
+        total = np.sum(error)
+        stalled = stalled + 1 if total >= best else 0
+        best = min(best, total)
+        if converged(error, c, stalled):
             break
 
-        tangents = rotate_vectors(tangents, e) # FIXME: THIS ONLY WORKS ON 2D VECTORS!
+        if P0.shape[1] == 3:
+            tangents = rotate_vectors_axis(tangents, np.cross(e, tangents))
+        else:
+            tangents = rotate_vectors(tangents, e)
 
         M0, A, B = _construct(P0, tangents, lengths)
 
@@ -154,4 +237,6 @@ def optimize(P0, tangents, lengths, max_opt_its=1, opt_steps=32):
     lengths = estimate_lengths(p)
     M0, A, B = _construct(P0, tangents, lengths)
 
+    if return_its:
+        return M0, A, B, tangents, lengths, its
     return M0, A, B, tangents, lengths
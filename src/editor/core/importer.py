@@ -0,0 +1,317 @@
+import argparse
+import math
+import pathlib
+import re
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from .track import Track, TrackException
+
+
+"""
+Importing dense polylines as control points.
+
+Readers yield the samples of a CSV, GPX or SVG file as chunks of (n, 3)
+arrays, and Decimator simplifies them as they arrive with Douglas-Peucker
+over a sliding window, so memory use depends on the chunk and window sizes
+rather than the size of the input.
+
+    python -m editor.core.importer survey.gpx --tolerance 2 -o track.json
+
+"""
+
+
+EARTH_RADIUS = 6371000
+
+
+def _tag(element):
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def _iterparse(path, tags):
+    """
+    Yields the elements of an XML file with the given tags as they end.
+    Every element is removed from its parent once it has ended, except
+    those inside a yielded element, which go with it. The tree therefore
+    never holds more than the elements still open.
+    """
+    parents = []
+    inside = 0
+    for event, element in ET.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            parents.append(element)
+            inside += _tag(element) in tags
+            continue
+        parents.pop()
+        if _tag(element) in tags:
+            inside -= 1
+            yield element
+        elif inside:
+            continue
+        element.clear()
+        if parents:
+            parents[-1].remove(element)
+
+
+def read_csv(path, chunk_size=65536):
+    """
+    Reads x, y and optionally z columns separated by commas or whitespace.
+    A header line and lines starting with # are skipped.
+    """
+    def parse(lines):
+        delimiter = ',' if ',' in lines[0] else None
+        data = np.loadtxt(lines, delimiter=delimiter, ndmin=2)
+        chunk = np.zeros((data.shape[0], 3))
+        chunk[:, :min(3, data.shape[1])] = data[:, :3]
+        return chunk
+
+    with open(path) as f:
+        lines = []
+        first = True
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            if first:
+                first = False
+                try:
+                    parse([line])
+                except ValueError:
+                    continue
+            lines.append(line)
+            if len(lines) == chunk_size:
+                yield parse(lines)
+                lines = []
+        if lines:
+            yield parse(lines)
+
+
+def read_gpx(path, chunk_size=65536):
+    """
+    Reads track points, projected to metres east and north of the first
+    point. Route points are read only if there are no track points, and
+    way points only if there are neither. Elevation is used as z when
+    present.
+    """
+    for tag in ('trkpt', 'rtept', 'wpt'):
+        found = False
+        for chunk in _read_gpx_points(path, tag, chunk_size):
+            found = True
+            yield chunk
+        if found:
+            return
+
+
+def _read_gpx_points(path, tag, chunk_size):
+    origin = None
+    chunk = []
+    for element in _iterparse(path, (tag, )):
+        lat = math.radians(float(element.get('lat')))
+        lon = math.radians(float(element.get('lon')))
+        if origin is None:
+            origin = lat, lon, math.cos(lat)
+        ele = next((float(child.text) for child in element if _tag(child) == 'ele'), 0.0)
+        chunk.append((
+            EARTH_RADIUS * (lon - origin[1]) * origin[2],
+            EARTH_RADIUS * (lat - origin[0]),
+            ele,
+        ))
+        if len(chunk) == chunk_size:
+            yield np.array(chunk)
+            chunk = []
+    if chunk:
+        yield np.array(chunk)
+
+
+_SVG_TOKEN = re.compile(r'[MmLlHhVvCcSsQqTtZz]|[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?')
+_SVG_ARGS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'Z': 0}
+
+
+def svg_path_points(d, steps=8):
+    """
+    Yields the points along SVG path data, with Bezier curves flattened to
+    steps lines each. Arcs are not supported.
+    """
+    tokens = _SVG_TOKEN.findall(d)
+    if len(''.join(tokens)) < len(re.sub(r'[\s,]', '', d)):
+        raise ValueError("Unsupported SVG path data.")
+    t = np.linspace(0, 1, steps + 1)[1:, np.newaxis]
+    pos = start = control = np.zeros(2)
+    previous = None
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+        elif previous is None:
+            raise ValueError("SVG path data does not start with a command.")
+        else:
+            # repeated arguments repeat the command, with moveto becoming lineto
+            command = {'M': 'L', 'm': 'l'}.get(previous, previous)
+        upper = command.upper()
+        n = _SVG_ARGS[upper]
+        args = np.array(tokens[i:i + n], dtype=float)
+        i += n
+        relative = command.islower()
+        if upper == 'Z':
+            pos = start
+            yield pos
+        elif upper in 'HV':
+            axis = 0 if upper == 'H' else 1
+            pos = pos.copy()
+            pos[axis] = args[0] + (pos[axis] if relative else 0)
+            yield pos
+        else:
+            points = args.reshape(-1, 2) + (pos if relative else 0)
+            if upper in 'ML':
+                if upper == 'M':
+                    start = points[0]
+                yield points[0]
+            elif upper in 'CS':
+                c1 = (2 * pos) - control if upper == 'S' else points[0]
+                c2, end = points[-2:]
+                yield from ((1 - t)**3 * pos) + (3 * (1 - t)**2 * t * c1) + (3 * (1 - t) * t**2 * c2) + (t**3 * end)
+                control = c2
+            else:
+                c = (2 * pos) - control if upper == 'T' else points[0]
+                end = points[-1]
+                yield from ((1 - t)**2 * pos) + (2 * (1 - t) * t * c) + (t**2 * end)
+                control = c
+            pos = points[-1]
+        if upper not in 'CSQT':
+            control = pos
+        previous = command
+
+
+def read_svg(path, chunk_size=65536):
+    """
+    Reads every path in an SVG as one polyline in the XY plane, with y
+    flipped to point up. Transforms are ignored, and the data of each path
+    is held in memory while its points are read.
+    """
+    chunk = []
+    for element in _iterparse(path, ('path', )):
+        if element.get('d'):
+            for x, y in svg_path_points(element.get('d')):
+                chunk.append((x, -y, 0.0))
+                if len(chunk) == chunk_size:
+                    yield np.array(chunk)
+                    chunk = []
+    if chunk:
+        yield np.array(chunk)
+
+
+READERS = {
+    '.csv': read_csv,
+    '.txt': read_csv,
+    '.gpx': read_gpx,
+    '.svg': read_svg,
+}
+
+
+def segment_distances(points, a, b):
+    """Distance from each of points to the line segment a-b."""
+    ab = b - a
+    length2 = np.dot(ab, ab)
+    if length2 > 0:
+        t = np.clip(np.dot(points - a, ab) / length2, 0, 1)
+    else:
+        t = np.zeros((points.shape[0], ))
+    return np.linalg.norm(points - (a + (t[:, np.newaxis] * ab)), axis=1)
+
+
+def douglas_peucker(points, tolerance):
+    """Sorted indices of the points of an open polyline kept when simplifying it to within tolerance."""
+    keep = np.zeros((points.shape[0], ), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, points.shape[0] - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        d = segment_distances(points[i + 1:j], points[i], points[j])
+        k = int(np.argmax(d))
+        if d[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            stack.extend(((i, k), (k, j)))
+    return np.flatnonzero(keep)
+
+
+class Decimator:
+    """
+    Streaming Douglas-Peucker. Samples are buffered until there is a full
+    window, which is simplified. Every kept point before the last interior
+    one is final, and the rest of the window is carried over. If a window
+    simplifies to a single line its end is kept, so the buffer never grows
+    beyond window samples.
+    """
+
+    def __init__(self, tolerance, window=4096):
+        self._tolerance = tolerance
+        self._window = window
+        self._buffer = np.empty((0, 3))
+        self.samples = 0
+
+    def feed(self, samples):
+        """Adds samples and returns the control points they made final."""
+        self.samples += samples.shape[0]
+        self._buffer = np.concatenate((self._buffer, samples))
+        result = []
+        while self._buffer.shape[0] >= self._window:
+            window = self._buffer[:self._window]
+            kept = douglas_peucker(window, self._tolerance)
+            cut = kept[-2] if len(kept) > 2 else kept[-1]
+            result.append(window[kept[kept < cut]])
+            self._buffer = self._buffer[cut:]
+        return np.concatenate(result) if result else np.empty((0, 3))
+
+    def finish(self):
+        """Returns the remaining control points."""
+        if not self._buffer.shape[0]:
+            return self._buffer
+        result = self._buffer[douglas_peucker(self._buffer, self._tolerance)]
+        self._buffer = np.empty((0, 3))
+        return result
+
+
+def decimate(chunks, tolerance, window=4096):
+    """Simplifies a stream of sample chunks to the control points of a closed track."""
+    decimator = Decimator(tolerance, window)
+    points = [decimator.feed(chunk) for chunk in chunks]
+    points.append(decimator.finish())
+    points = np.concatenate(points)
+    # the track is closed, so an end point which returns to the start is redundant
+    if points.shape[0] > 1 and np.linalg.norm(points[-1] - points[0]) <= tolerance:
+        points = points[:-1]
+    if points.shape[0] < 3:
+        raise TrackException("Not enough points to make a track.")
+    return points
+
+
+def import_points(path, tolerance=1.0, window=4096):
+    """Reads and simplifies a CSV, GPX or SVG file, returning (n, 3) control points."""
+    path = pathlib.Path(path)
+    try:
+        reader = READERS[path.suffix.lower()]
+    except KeyError:
+        raise TrackException(f"Cannot import {path.suffix} files.")
+    return decimate(reader(path), tolerance, window)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Import a dense CSV, GPX or SVG polyline as a track.")
+    parser.add_argument('input', type=pathlib.Path, help="Polyline to import.")
+    parser.add_argument('-t', '--tolerance', type=float, default=1.0, help="Maximum distance of the samples from the simplified line.")
+    parser.add_argument('-o', '--output', type=pathlib.Path, required=True, help="Track file to write.")
+    args = parser.parse_args()
+
+    points = import_points(args.input, args.tolerance)
+    track = Track(points)
+    args.output.write_text(track.serialize())
+    print(f'{args.input}: {points.shape[0]} control points', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,224 @@
+import os
+import pathlib
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+
+"""
+Crash recovery journal.
+
+The saved state of a track, its control point positions and styles, is
+journalled as a full snapshot followed by one delta per edit. A delta
+replaces rows start to start + removed with new rows, which covers moves,
+inserts and deletes alike. Every record is framed with its kind, length
+and a CRC, so a record torn by a crash ends the journal instead of
+corrupting it.
+
+Records are written by a background thread which flushes after every
+batch and fsyncs at most once per sync interval. After compact_every
+deltas the journal is rewritten as a single snapshot.
+
+"""
+
+
+STATE = np.dtype([('position', '<f8', (3, )), ('style', '<u4')])
+
+MAGIC = b'RCJ1'
+SNAPSHOT = b'S'
+DELTA = b'D'
+
+_HEADER = struct.Struct('<cI')
+_SPLICE = struct.Struct('<II')
+_CRC = struct.Struct('<I')
+
+
+def state_of(track):
+    """Copies the saved state of a track."""
+    state = np.empty((track._data.shape[0], ), dtype=STATE)
+    state['position'] = track._data[:, 0]
+    state['style'] = track._styles
+    return state
+
+
+def splice(old, new):
+    """
+    Returns (start, removed, rows) such that replacing old[start:start+removed]
+    with rows gives new, or None if they are equal.
+    """
+    m = min(len(old), len(new))
+    diff = np.flatnonzero(old[:m] != new[:m])
+    prefix = int(diff[0]) if len(diff) else m
+    if prefix == m and len(old) == len(new):
+        return None
+    rest = m - prefix
+    diff = np.flatnonzero(old[::-1][:rest] != new[::-1][:rest])
+    suffix = int(diff[0]) if len(diff) else rest
+    return prefix, len(old) - prefix - suffix, new[prefix:len(new) - suffix]
+
+
+def apply_splice(state, start, removed, rows):
+    return np.concatenate((state[:start], rows, state[start + removed:]))
+
+
+def _record(kind, payload):
+    return _HEADER.pack(kind, len(payload)) + payload + _CRC.pack(zlib.crc32(kind + payload))
+
+
+def encode_snapshot(state):
+    return _record(SNAPSHOT, state.tobytes())
+
+
+def encode_delta(start, removed, rows):
+    return _record(DELTA, _SPLICE.pack(start, removed) + rows.tobytes())
+
+
+def read(path):
+    """
+    Replays a journal and returns the state it ends in. Returns None if
+    there is no journal or it holds no complete snapshot.
+    """
+    try:
+        data = pathlib.Path(path).read_bytes()
+    except FileNotFoundError:
+        return None
+    if data[:len(MAGIC)] != MAGIC:
+        return None
+    state = None
+    pos = len(MAGIC)
+    while pos + _HEADER.size <= len(data):
+        kind, size = _HEADER.unpack_from(data, pos)
+        start = pos + _HEADER.size
+        end = start + size
+        if end + _CRC.size > len(data):
+            break
+        payload = data[start:end]
+        if _CRC.unpack_from(data, end)[0] != zlib.crc32(kind + payload):
+            break
+        if kind == SNAPSHOT:
+            state = np.frombuffer(payload, dtype=STATE).copy()
+        elif kind == DELTA and state is not None:
+            a, removed = _SPLICE.unpack_from(payload)
+            state = apply_splice(state, a, removed, np.frombuffer(payload[_SPLICE.size:], dtype=STATE))
+        else:
+            break
+        pos = end + _CRC.size
+    return state
+
+
+def atomic_write(path, data, mode='w'):
+    """Writes data to a temporary file beside path and renames it over path."""
+    path = pathlib.Path(path)
+    tmp = path.with_name(f'.{path.name}.tmp')
+    with open(tmp, mode) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Journal:
+    """
+    Journals the states passed to record(). Nothing is written until the
+    first record() after construction or reset(), which writes a snapshot.
+    reset() deletes the journal, for when the track has been saved.
+    """
+
+    def __init__(self, path, compact_every=200, sync_interval=1.0):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.error = None
+        self._compact_every = compact_every
+        self._sync_interval = sync_interval
+        self._state = None
+        self._deltas = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._write, name='journal', daemon=True)
+        self._thread.start()
+
+    def record(self, state):
+        if self._state is None or self._deltas >= self._compact_every:
+            self._queue.put(('compact', encode_snapshot(state)))
+            self._deltas = 0
+        else:
+            change = splice(self._state, state)
+            if change is None:
+                return
+            self._queue.put(('append', encode_delta(*change)))
+            self._deltas += 1
+        self._state = state
+
+    def reset(self):
+        self._state = None
+        self._queue.put(('discard', None))
+
+    def flush(self):
+        """Blocks until everything recorded so far is on disk."""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        done.wait()
+
+    def close(self, discard=True):
+        if discard:
+            self.reset()
+        self._queue.put(('stop', None))
+        self._thread.join()
+
+    def _write(self):
+        f = None
+        synced = True
+        last_sync = time.monotonic()
+        while True:
+            try:
+                timeout = None if synced else max(0, self._sync_interval - (time.monotonic() - last_sync))
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for op, arg in batch:
+                try:
+                    if op == 'append' and f is not None:
+                        f.write(arg)
+                        synced = False
+                    elif op == 'compact':
+                        if f is not None:
+                            f.close()
+                        atomic_write(self.path, MAGIC + arg, 'wb')
+                        f = open(self.path, 'ab')
+                        synced = True
+                    elif op == 'discard':
+                        if f is not None:
+                            f.close()
+                            f = None
+                        self.path.unlink(missing_ok=True)
+                        synced = True
+                    elif op in ('flush', 'stop') and f is not None:
+                        f.flush()
+                        os.fsync(f.fileno())
+                        synced = True
+                        last_sync = time.monotonic()
+                except OSError as e:
+                    # journalling is best effort, the editor carries on without it
+                    self.error = e
+                if op == 'flush':
+                    arg.set()
+                elif op == 'stop':
+                    if f is not None:
+                        f.close()
+                    return
+
+            if f is not None and not synced:
+                f.flush()
+                if time.monotonic() - last_sync >= self._sync_interval:
+                    os.fsync(f.fileno())
+                    synced = True
+                    last_sync = time.monotonic()
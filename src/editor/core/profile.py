@@ -0,0 +1,174 @@
+import collections
+import functools
+import json
+import threading
+import time
+
+import numpy as np
+
+
+"""
+Hot path timing.
+
+Functions decorated with timed() and blocks wrapped in section() record
+their duration in a rolling histogram per name, and in a trace which can
+be written out in Chrome's trace event format for chrome://tracing or
+Perfetto. Everything is skipped while the profiler is disabled, leaving
+only the cost of checking a flag.
+
+    from editor.core.profile import profiler
+    profiler.enabled = True
+    ...
+    print(profiler.report())
+    profiler.dump_trace('trace.json')
+
+"""
+
+
+class Histogram:
+    """The most recent size durations recorded under one name, in seconds."""
+
+    # log spaced bin edges from 10us to 10s
+    EDGES = np.logspace(-5, 1, 25)
+
+    def __init__(self, size=1000):
+        self._samples = np.empty((size, ))
+        self._next = 0
+        self.count = 0
+        self.total = 0.0
+
+    def __len__(self):
+        return min(self.count, self._samples.shape[0])
+
+    def add(self, duration):
+        self._samples[self._next] = duration
+        self._next = (self._next + 1) % self._samples.shape[0]
+        self.count += 1
+        self.total += duration
+
+    @property
+    def samples(self):
+        """The retained durations, oldest first."""
+        if self.count < self._samples.shape[0]:
+            return self._samples[:self.count].copy()
+        return np.roll(self._samples, -self._next)
+
+    def percentiles(self, q=(50, 95, 99)):
+        if not len(self):
+            return np.full((len(q), ), np.nan)
+        return np.percentile(self._samples[:len(self)], q)
+
+    def counts(self, edges=EDGES):
+        """Number of retained durations falling in each bin between edges."""
+        return np.histogram(self._samples[:len(self)], edges)[0]
+
+    def clear(self):
+        self._next = 0
+        self.count = 0
+        self.total = 0.0
+
+
+class _Section:
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self._profiler.record(self._name, self._start, time.perf_counter())
+
+
+class _Disabled:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_disabled = _Disabled()
+
+
+class Profiler:
+    """
+    Rolling histograms and a bounded trace of timed sections. Nothing is
+    recorded until enabled is set.
+    """
+
+    def __init__(self, size=1000, trace_size=100000):
+        self.enabled = False
+        self._size = size
+        self._origin = time.perf_counter()
+        self.histograms = collections.defaultdict(lambda: Histogram(self._size))
+        self.trace = collections.deque(maxlen=trace_size)
+
+    def record(self, name, start, stop):
+        self.histograms[name].add(stop - start)
+        self.trace.append((name, start, stop, threading.get_ident()))
+
+    def section(self, name):
+        """Context manager timing the block it wraps."""
+        if self.enabled:
+            return _Section(self, name)
+        return _disabled
+
+    def timed(self, name=None):
+        """Decorator timing every call of a function."""
+        def decorator(f):
+            label = f.__qualname__ if name is None else name
+
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return f(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    self.record(label, start, time.perf_counter())
+            return wrapper
+        return decorator
+
+    def clear(self):
+        self.histograms.clear()
+        self.trace.clear()
+
+    def summary(self):
+        """Dict mapping each name to its count and p50, p95 and max in milliseconds."""
+        result = {}
+        for name, h in sorted(self.histograms.items()):
+            p50, p95 = h.percentiles((50, 95)) * 1000
+            result[name] = {'count': h.count, 'p50': p50, 'p95': p95, 'max': np.max(h.samples) * 1000}
+        return result
+
+    def report(self):
+        lines = []
+        for name, s in self.summary().items():
+            lines.append(f"{name}: {s['count']} calls, p50 {s['p50']:.2f} p95 {s['p95']:.2f} max {s['max']:.2f} ms")
+        return '\n'.join(lines)
+
+    def trace_events(self):
+        """The trace as Chrome trace event format complete events."""
+        threads = {}
+        return {
+            'traceEvents': [
+                {
+                    'name': name, 'ph': 'X', 'pid': 1,
+                    'tid': threads.setdefault(tid, len(threads)),
+                    'ts': (start - self._origin) * 1e6, 'dur': (stop - start) * 1e6,
+                }
+                for name, start, stop, tid in list(self.trace)
+            ],
+            'displayTimeUnit': 'ms',
+        }
+
+    def dump_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.trace_events(), f)
+
+
+profiler = Profiler()
+timed = profiler.timed
+section = profiler.section
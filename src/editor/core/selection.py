@@ -0,0 +1,104 @@
+import numpy as np
+
+
+class Selection:
+    """
+    Selected points of a closed track. The mask holds one int per point plus
+    a copy of the first at the end, so the GPU can read whether each
+    segment's next point is selected. Index sets derived from the mask are
+    cached until the next change.
+    """
+
+    def __init__(self, n):
+        self._mask = np.zeros((n + 1, ), dtype=np.int32)
+        self._cache = {}
+
+    def __len__(self):
+        return self._mask.shape[0] - 1
+
+    @property
+    def mask(self):
+        return self._mask
+
+    def _changed(self):
+        self._mask[-1] = self._mask[0]
+        self._cache.clear()
+
+    def _cached(self, name, f):
+        try:
+            return self._cache[name]
+        except KeyError:
+            result = self._cache[name] = f()
+            if isinstance(result, np.ndarray):
+                # shared between callers until the next change
+                result.flags.writeable = False
+            return result
+
+    def select(self, selection, multi=False):
+        """Toggles the points indexed by selection. None toggles every point."""
+        if not multi:
+            self._mask[:] = 0
+        self._mask[:-1][selection] ^= 1
+        self._changed()
+
+    def select_range(self, start, stop, multi=False):
+        """Selects points start to stop inclusive, wrapping past the end of the track."""
+        n = len(self)
+        if not multi:
+            self._mask[:] = 0
+        self._mask[np.arange(start, start + ((stop - start) % n) + 1) % n] = 1
+        self._changed()
+
+    def insert(self, indices, value=1):
+        self._mask = np.insert(self._mask, indices, value)
+        self._changed()
+
+    def delete(self, indices):
+        self._mask = np.delete(self._mask, indices)
+        self._changed()
+
+    def snapshot(self):
+        return self._mask.copy()
+
+    def restore(self, snapshot):
+        self._mask = snapshot
+        self._cache.clear()
+
+    @property
+    def points(self):
+        """Sorted indices of the selected points."""
+        return self._cached('points', lambda: np.flatnonzero(self._mask[:-1]))
+
+    @property
+    def segments(self):
+        """Sorted indices of the segments with both ends selected."""
+        return self._cached('segments', lambda: np.flatnonzero(self._mask[:-1] & self._mask[1:]))
+
+    @property
+    def inner(self):
+        """Sorted indices of the selected points with both neighbours selected."""
+        return self._cached('inner', lambda: self.segments[self._mask[:-1][self.segments - 1] == 1])
+
+    @property
+    def runs(self):
+        """
+        Contiguous runs of selected points as (start, stop) pairs. A run
+        which wraps past the end of the track has stop > len(self).
+        """
+        return self._cached('runs', self._runs)
+
+    def _runs(self):
+        n = len(self)
+        m = self._mask[:-1]
+        if np.all(m):
+            return [(0, n)]
+        # start counting from an unselected point so that no run is split by the wrap
+        shift = int(np.argmin(m))
+        edges = np.diff(np.concatenate(([0], np.roll(m, -shift), [0])))
+        starts = np.flatnonzero(edges == 1) + shift
+        stops = np.flatnonzero(edges == -1) + shift
+        wrap = (starts >= n)
+        starts[wrap] -= n
+        stops[wrap] -= n
+        order = np.argsort(starts)
+        return list(zip(starts[order].tolist(), stops[order].tolist()))
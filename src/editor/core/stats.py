@@ -0,0 +1,203 @@
+import collections
+
+import numpy as np
+
+from . import hermite
+
+
+"""
+Incremental track statistics.
+
+Per-segment contributions are kept in the leaves of a reduction tree,
+so after an edit only the segments that changed are re-evaluated and
+each one costs O(log N) to fold back into the totals.
+
+"""
+
+
+class SegmentTree:
+    """
+    Array backed reduction tree over n leaves. Each column is reduced with
+    its own ufunc, given as (ufunc, identity) pairs.
+    """
+
+    def __init__(self, ops, n):
+        self._ops = ops
+        self._n = n
+        self._size = 1 << max(0, (n - 1).bit_length())
+        identity = np.array([i for op, i in ops], dtype=np.float64)
+        self._tree = np.tile(identity, (2 * self._size, 1))
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def root(self):
+        return self._tree[1]
+
+    @property
+    def leaves(self):
+        return self._tree[self._size:self._size + self._n]
+
+    def _combine(self, nodes):
+        for c, (op, i) in enumerate(self._ops):
+            self._tree[nodes, c] = op(self._tree[2 * nodes, c], self._tree[(2 * nodes) + 1, c])
+
+    def set(self, indices, values):
+        nodes = np.asarray(indices) + self._size
+        self._tree[nodes] = values
+        nodes = np.unique(nodes // 2)
+        while len(nodes) and nodes[-1] >= 1:
+            self._combine(nodes)
+            nodes = np.unique(nodes // 2)
+            nodes = nodes[nodes >= 1]
+
+    def build(self, values):
+        self._tree[self._size:self._size + self._n] = values
+        level = self._size
+        while level > 1:
+            level //= 2
+            self._combine(np.arange(level, 2 * level))
+
+    def query(self, start, stop):
+        """Reduces the leaves start to stop - 1."""
+        result = np.array([i for op, i in self._ops], dtype=np.float64)
+        lo = start + self._size
+        hi = stop + self._size
+        while lo < hi:
+            if lo & 1:
+                result = self._reduce(result, self._tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result = self._reduce(result, self._tree[hi])
+            lo //= 2
+            hi //= 2
+        return result
+
+    def _reduce(self, a, b):
+        return np.array([op(x, y) for (op, i), x, y in zip(self._ops, a, b)])
+
+
+class TrackStats:
+    """
+    Statistics over a track, brought up to date by update(). Segments whose
+    curve data moved by less than tolerance since they were last evaluated
+    are not recomputed.
+    """
+    FIELDS = (
+        ('length', np.add, 0.0),
+        ('max_curvature', np.maximum, 0.0),
+        ('min_curvature', np.minimum, np.inf),
+        ('max_gradient', np.maximum, 0.0),
+        ('residual', np.add, 0.0),
+    )
+
+    def __init__(self, steps=16, tolerance=1e-4):
+        self._steps = steps
+        self._tolerance = tolerance
+        self._data = None
+        self._styles = None
+        self._tree = None
+
+    def _evaluate(self, track, segments):
+        """Returns the leaf values for segments and the signed curvature at their ends."""
+        p, dp, ddp = hermite.eval(
+            track.P[segments], track.M[segments], track.A[segments], track.B[segments],
+            track._len[segments], steps=self._steps
+        )
+        c = hermite.curvature(dp, ddp)
+        k = np.abs(c)
+        flat = np.linalg.norm(dp[:, :, :2], axis=2)
+        gradient = np.abs(dp[:, :, 2]) / np.where(flat > 0, flat, np.inf)
+        values = np.empty((len(segments), len(self.FIELDS)))
+        values[:, 0] = track._len[segments]
+        values[:, 1] = np.max(k, axis=1)
+        values[:, 2] = np.min(k, axis=1)
+        values[:, 3] = np.max(gradient, axis=1)
+        return values, c[:, 0], c[:, -1]
+
+    def _update_residuals(self, segments):
+        n = len(self._tree)
+        segments = np.unique(np.concatenate((segments, (segments + 1) % n)))
+        values = self._tree.leaves[segments].copy()
+        values[:, 4] = np.abs(self._c1[segments - 1] - self._c0[segments])
+        self._tree.set(segments, values)
+
+    def _rebuild(self, track):
+        n = track._data.shape[0]
+        segments = np.arange(n)
+        values, self._c0, self._c1 = self._evaluate(track, segments)
+        values[:, 4] = np.abs(np.roll(self._c1, 1) - self._c0)
+        self._tree = SegmentTree([(op, i) for name, op, i in self.FIELDS], n)
+        self._tree.build(values)
+        self._data = track._data.copy()
+        self._styles = track._styles.copy()
+        self._style_lengths = collections.Counter()
+        for style, length in zip(self._styles.tolist(), values[:, 0].tolist()):
+            self._style_lengths[style] += length
+
+    def update(self, track, rows=None):
+        """
+        Brings the stats up to date with track and returns the number of
+        segments that were recomputed. If rows is given, only the control
+        points in it can have changed since the last update, and only the
+        segments either side of them are checked.
+        """
+        if self._data is None or self._data.shape != track._data.shape:
+            self._rebuild(track)
+            return len(self._tree)
+
+        candidates = hermite.segments_around(rows, len(self._tree))
+        moved = np.any(np.abs(self._data[candidates] - track._data[candidates]) > self._tolerance, axis=(1, 2))
+        dirty = candidates[moved | (self._styles[candidates] != track._styles[candidates])]
+        if not len(dirty):
+            return 0
+
+        old = self._tree.leaves[dirty, 0]
+        for style, length in zip(self._styles[dirty].tolist(), old.tolist()):
+            self._style_lengths[style] -= length
+
+        values, self._c0[dirty], self._c1[dirty] = self._evaluate(track, dirty)
+        self._tree.set(dirty, values)
+        self._update_residuals(dirty)
+        self._data[dirty] = track._data[dirty]
+        self._styles[dirty] = track._styles[dirty]
+
+        for style, length in zip(self._styles[dirty].tolist(), values[:, 0].tolist()):
+            self._style_lengths[style] += length
+        return len(dirty)
+
+    def _field(self, name):
+        return self._tree.root[[f[0] for f in self.FIELDS].index(name)]
+
+    @property
+    def length(self):
+        return self._field('length')
+
+    @property
+    def min_radius(self):
+        c = self._field('max_curvature')
+        return 1 / c if c > 0 else np.inf
+
+    @property
+    def max_radius(self):
+        c = self._field('min_curvature')
+        return 1 / c if c > 0 else np.inf
+
+    @property
+    def max_gradient(self):
+        return self._field('max_gradient')
+
+    @property
+    def residual(self):
+        """Sum of the curvature discontinuities at the control points."""
+        return self._field('residual')
+
+    @property
+    def style_lengths(self):
+        return {style: length for style, length in sorted(self._style_lengths.items()) if length > 1e-6}
+
+    def query(self, start, stop):
+        """Returns the reduced fields over segments start to stop - 1 as a dict."""
+        return dict(zip([f[0] for f in self.FIELDS], self._tree.query(start, stop).tolist()))
@@ -0,0 +1,24 @@
+import numpy as np
+
+
+class StyleRuns:
+    """
+    Run-length index of per-point styles. Segment n has the style of point
+    n, so run i covers segments starts[i] to stops[i] - 1.
+    """
+
+    def __init__(self, styles):
+        styles = np.asarray(styles)
+        self.starts = np.flatnonzero(np.diff(styles, prepend=~styles[:1]))
+        self.stops = np.append(self.starts[1:], len(styles))
+        self.styles = styles[self.starts]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts.tolist(), self.stops.tolist(), self.styles.tolist())
+
+    def run_of(self, segments):
+        """Index of the run containing each segment."""
+        return np.searchsorted(self.starts, segments, side='right') - 1
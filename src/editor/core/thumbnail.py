@@ -0,0 +1,156 @@
+import hashlib
+import io
+import pathlib
+
+import numpy as np
+
+from . import hermite
+from .journal import atomic_write
+from .track import Track
+
+
+"""
+Thumbnails of track files.
+
+A thumbnail is the track seen from above, with a height profile along its
+length underneath, rasterised with numpy from the solved curve so that it
+can be rendered in a worker process without OpenGL. Thumbnails are cached
+by a hash of the track file, so renaming or touching a file keeps its
+thumbnail and editing it makes a new one.
+
+"""
+
+
+VERSION = 1
+
+BACKGROUND = (0, 0, 0, 0)
+PROFILE = (91, 173, 51, 255)
+# segment colours by style, repeating
+STYLES = np.array([
+    (84, 66, 66, 255), (200, 0, 0, 255), (0, 120, 200, 255), (220, 160, 0, 255), (130, 0, 160, 255),
+], dtype=np.uint8)
+
+
+def content_key(data, width):
+    """Cache key of the bytes of a track file rendered at width."""
+    h = hashlib.sha256(data)
+    h.update(f'{VERSION}:{width}'.encode())
+    return h.hexdigest()
+
+
+def sample(track, spacing):
+    """
+    Samples the curve of a track at most spacing apart. Returns positions,
+    distances along the track and the style of the segment of each sample.
+    """
+    n = track.P.shape[0]
+    steps = int(min(max(np.ceil(np.max(track._len) / spacing), 1), 4096 // n + 1)) + 1
+    positions = hermite.eval(track.P, track.M, track.A, track.B, track._len, steps=steps)[0]
+    t = np.linspace(0, 1, steps)
+    distances = track._distances[:, 0, np.newaxis] + (track._len[:, np.newaxis] * t)
+    styles = np.repeat(track._styles, steps)
+    return positions.reshape(-1, 3).astype(np.float64), distances.ravel(), styles
+
+
+def _plot(image, x, y, colours, radius=1):
+    h, w = image.shape[:2]
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            px = np.clip(x + dx, 0, w - 1)
+            py = np.clip(y + dy, 0, h - 1)
+            image[py, px] = colours
+
+
+def render(track, width=128):
+    """
+    Renders a track to a (width * 5 // 4, width, 4) RGBA array: the top view
+    in a width square, and the height profile in the strip below it.
+    """
+    profile = width // 4
+    image = np.empty((width + profile, width, 4), dtype=np.uint8)
+    image[:] = BACKGROUND
+    margin = 3
+
+    lo = track.P[:, :2].min(axis=0)
+    hi = track.P[:, :2].max(axis=0)
+    scale = (width - (2 * margin) - 1) / max(float(np.max(hi - lo)), 1e-6)
+    positions, distances, styles = sample(track, 0.5 / scale)
+
+    # top view, centred, y up
+    xy = (positions[:, :2] - lo) * scale
+    xy += (width - 1 - (hi - lo) * scale) / 2
+    colours = STYLES[styles % len(STYLES)]
+    _plot(image, np.rint(xy[:, 0]).astype(int), np.rint(width - 1 - xy[:, 1]).astype(int), colours)
+
+    # height profile, filled down from the curve
+    columns = np.minimum((distances / max(track.total_length, 1e-6) * width).astype(int), width - 1)
+    z = positions[:, 2]
+    top = np.full((width, ), np.nan)
+    np.fmax.at(top, columns, z)
+    top = np.interp(np.arange(width), np.flatnonzero(~np.isnan(top)), top[~np.isnan(top)])
+    zmin, zmax = z.min(), z.max()
+    rows = profile - 2 - ((top - zmin) / max(zmax - zmin, 1e-6) * (profile - 4))
+    if zmax - zmin < 1e-6:
+        rows[:] = profile - 2
+    y = np.arange(profile)[:, np.newaxis]
+    image[width:][y >= np.rint(rows)] = PROFILE
+    return image
+
+
+def header(track):
+    """Summary of a track for listing alongside its thumbnail."""
+    z = track.P[:, 2]
+    return {
+        'points': int(track.P.shape[0]),
+        'length': float(track.total_length),
+        'climb': float(z.max() - z.min()),
+    }
+
+
+class ThumbnailCache:
+    """Thumbnails and headers stored in a directory as .npz files named by content key."""
+
+    def __init__(self, directory):
+        self.directory = pathlib.Path(directory)
+
+    def _path(self, key):
+        return self.directory / f'{key}.npz'
+
+    def get(self, key):
+        try:
+            with np.load(self._path(key)) as f:
+                return f['image'], {k: f[k].item() for k in f.files if k != 'image'}
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, image, info):
+        buffer = io.BytesIO()
+        np.savez(buffer, image=image, **info)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            atomic_write(self._path(key), buffer.getvalue(), 'wb')
+        except OSError:
+            # caching is best effort
+            pass
+
+
+def thumbnail(path, cache=None, width=128):
+    """
+    Returns the thumbnail and header of a track file, from the cache
+    directory if it has them. Runs in worker processes.
+    """
+    data = pathlib.Path(path).read_bytes()
+    cache = None if cache is None else ThumbnailCache(cache)
+    key = content_key(data, width)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    track = Track()
+    track.deserialize(data)
+    image = render(track, width)
+    info = header(track)
+    if cache is not None:
+        cache.put(key, image, info)
+    return image, info
+
@@ -3,36 +3,102 @@ import math
 import numpy as np
 
 from . import hermite
+from .columns import ColumnStore
+from .profile import timed
+from .selection import Selection
+from .styles import StyleRuns
 from .undo import UndoStack, with_undo
 
 
-def Watcher(callback):
+def Watcher(callback, indexed=False):
     class _Watcher(np.ndarray):
         def __setitem__(self, item, value):
             super().__setitem__(item, value)
-            callback()
+            if indexed:
+                callback(item)
+            else:
+                callback()
+
+        # only writes to the watched array itself are reported, so anything
+        # derived from it by indexing or arithmetic is a plain array
+        def __getitem__(self, item):
+            result = super().__getitem__(item)
+            if isinstance(result, np.ndarray):
+                return result.view(np.ndarray)
+            return result
+
+        def __array_wrap__(self, array, context=None, return_scalar=None):
+            array = array.view(np.ndarray)
+            # numpy 1 does not pass return_scalar and expects 0-d results unwrapped here
+            if return_scalar is None:
+                return_scalar = array.ndim == 0
+            return array[()] if return_scalar else array
     return _Watcher
 
 
+def dumps(points, styles):
+    """Serializes control points and their styles, as saved by Track.serialize()."""
+    data = []
+    for n in range(points.shape[0]):
+        data.append((*points[n].astype(float), styles[n].astype(float)))
+    return json.dumps(data, indent=4)
+
+
 class TrackException(Exception):
     pass
 
 
 class Track(UndoStack):
-    def __init__(self, data=None):
+    """
+    dtype is the floating point type the track is stored and solved in.
+    float32 halves the memory traffic and is what the GPU path uploads,
+    float64 is for when accuracy matters more, such as exporting.
+
+    optimize_on_load controls whether set_data() blocks until the curve is
+    optimised. Subclasses which optimise progressively turn it off.
+    """
+    optimize_on_load = True
+
+    def __init__(self, data=None, dtype=np.float32):
         super().__init__()
+        self.dtype = np.dtype(dtype)
+        self._points = ColumnStore(self.columns())
         self.set_data(data)
 
+    def columns(self):
+        """
+        The per-point columns as (name, dtype, shape) tuples. Subclasses can
+        extend this, or add_column() can be used on an existing track.
+        """
+        return [
+            ('data', self.dtype, (4, 3)),
+            ('distance', self.dtype, (2, )),
+            ('style', np.uint32, ()),
+        ]
+
+    def add_column(self, name, dtype, shape=(), fill=0):
+        """Adds a per-point attribute such as road width or banking."""
+        self._points.add_column(name, dtype, shape, fill)
+        self.data_moved()
+
     def data_set(self):
         """
         Called when data is set by loading.
         """
         pass
 
-    def data_modified(self):
+    def data_modified(self, item=None):
         """
         Called when values in self._data have been modified.
         The array referenced by self._data has not changed.
+        item is the index that was written to P.
+        """
+        pass
+
+    def styles_modified(self, item=None):
+        """
+        Called when values in self._styles have been modified.
+        item is the index that was written to S.
         """
         pass
 
@@ -47,24 +113,35 @@ class Track(UndoStack):
             rads = [math.radians(d) for d in range(0, 360, 36)]
             dist = 500 / math.pi
             data = [(dist * math.sin(r), dist * math.cos(r)) for r in rads]
-        self._data = np.zeros((len(data), 4, 3), dtype=np.float32)
+        self._points.resize(len(data))
         self._data[:, 0, :len(data[0])] = data
-        if styles is None:
-            self._styles = np.zeros((len(data), ), dtype=np.uint32)
-        else:
-            self._styles = np.array(styles, dtype=np.uint32)
-        self._selection = np.zeros((self._data.shape[0] + 1,), dtype=np.int32)
+        if styles is not None:
+            self._styles[:] = styles
+        self._selection = Selection(self._data.shape[0])
+        self._style_runs = None
         self._tan = None
         self._len = None
-        self._distances = None
         self.clear_all_undo()
         self.construct(keep=False)
-        self.optimize()
+        if self.optimize_on_load:
+            self.optimize()
         self.data_set()
 
+    @property
+    def _data(self):
+        return self._points['data']
+
+    @property
+    def _distances(self):
+        return self._points['distance']
+
+    @property
+    def _styles(self):
+        return self._points['style']
+
     @property
     def P(self):
-        return self._data[:, 0].view(Watcher(self.data_modified))
+        return self._data[:, 0].view(Watcher(self.data_modified, indexed=True))
 
     @property
     def M(self):
@@ -80,7 +157,51 @@ class Track(UndoStack):
 
     @property
     def S(self):
-        return self._styles
+        return self._styles.view(Watcher(self._styles_written, indexed=True))
+
+    def _styles_written(self, item):
+        self._style_runs = None
+        self.styles_modified(item)
+
+    @property
+    def style_runs(self):
+        """Run-length index of the styles, rebuilt on first use after they change."""
+        if self._style_runs is None:
+            self._style_runs = StyleRuns(self._styles)
+        return self._style_runs
+
+    def style_at(self, d):
+        """Returns the style of the track at distance d, which may be an array."""
+        runs = self.style_runs
+        d = np.asarray(d) % self.total_length
+        return runs.styles[np.searchsorted(self._distances[runs.starts, 0], d, side='right') - 1]
+
+    def segments_between(self, start, stop):
+        """Returns the segments which begin between distances start and stop."""
+        first, last = np.searchsorted(self._distances[:, 0], (start, stop), side='left')
+        return np.arange(first, last)
+
+    @with_undo("Set Style")
+    def set_style(self, style, start, stop):
+        """Sets the style of segments start to stop - 1."""
+        if stop <= start:
+            raise TrackException("Nothing to restyle.")
+        self.S[start:stop] = style
+
+    @with_undo("Set Style")
+    def set_style_between(self, style, start, stop):
+        """Sets the style of the segments which begin between distances start and stop."""
+        segments = self.segments_between(start, stop)
+        if not len(segments):
+            raise TrackException("Nothing to restyle.")
+        self.S[segments[0]:segments[-1] + 1] = style
+
+    @with_undo("Set Style")
+    def set_selected_style(self, style):
+        """Sets the style of the segments which begin at the selected points."""
+        if not len(self.selected):
+            raise TrackException("No control points selected.")
+        self.S[self.selected] = style
 
     @property
     def total_length(self):
@@ -91,14 +212,26 @@ class Track(UndoStack):
         self._distances[:, 1] = np.cumsum(self._len)
         self._distances[1:, 0] = self._distances[:-1, 1]
 
-    def construct(self, keep=True):
+    @timed('Track.construct')
+    def construct(self, keep=True, rows=None):
+        """
+        Rebuilds the curve from the control points, keeping the tangents
+        and lengths unless keep is false. If rows is given, only those
+        control points have moved, so only the segments either side of them
+        are rebuilt.
+        """
+        if rows is not None and keep and self._tan is not None:
+            segments = hermite.segments_around(rows, self._data.shape[0])
+            self.M[segments], self.A[segments], self.B[segments] = hermite.construct_segments(
+                self._data[:, 0], self._tan, self._len, segments
+            )
+            return
         if not keep:
             self._tan = None
             self._len = None
         self.M[:], self.A[:], self.B[:], self._tan, self._len = hermite.construct(
             self._data[:, 0], self._tan, self._len
         )
-        self._distances = np.empty((self._data.shape[0], 2), dtype=np.float32)
         self._update_distances()
 
     def optimize(self, max_opt_its=20, opt_steps=32):
@@ -109,42 +242,51 @@ class Track(UndoStack):
         self._update_distances()
 
     def select(self, selection, multi=False):
-        if not multi:
-            self._selection[:] = 0
-        self._selection[selection] ^= 1
-        self._selection[-1] = self._selection[0]
+        self._selection.select(selection, multi)
+
+    def select_range(self, start, stop, multi=False):
+        """Selects the points from start to stop along the track."""
+        self._selection.select_range(start, stop, multi)
 
     @property
     def selected(self):
-        return np.where(self._selection[:-1])[0]
+        return self._selection.points
 
     @property
     def selected_segments(self):
-        return np.where(self._selection[:-1] & self._selection[1:])[0]
+        return self._selection.segments
+
+    @property
+    def selected_runs(self):
+        return self._selection.runs
 
     def create_snapshot(self):
-        return self._data.copy(), self._styles.copy(), self._selection.copy()
+        return self._points.snapshot(), self._selection.snapshot()
 
     def restore_snapshot(self, snapshot):
-        self._data, self._styles, self._selection = snapshot
+        points, selection = snapshot
+        self._points.restore(points)
+        self._selection.restore(selection)
+        self._style_runs = None
         self.construct(keep=False)
         self.optimize()
         self.data_moved()
 
     @property
     def selected_inner(self):
-        return np.where(self._selection[:-1] & self._selection[1:] & np.roll(self._selection[:-1], 1))[0]
+        return self._selection.inner
 
     def _subdivide(self, segments):
         if not len(segments):
             raise TrackException("Nothing to subdivide.")
         p, dp, ddp = hermite.eval(self.P, self.M, self.A, self.B, self._len, [0.5])
-        newdata = np.zeros((len(segments), 4, 3), dtype=np.float32)
-        newdata[:, 0] = p[segments, 0]
-        self._data = np.insert(self._data, segments+1, newdata, axis=0)
-        self._styles = np.insert(self._styles, segments+1, self._styles[segments], axis=0)
-        self._selection = np.insert(self._selection, segments+1, 1, axis=0)
-        self._selection[-1] = self._selection[0]
+        # new points take their attributes from the point before them
+        rows = self._points.rows(segments)
+        rows['data'] = 0
+        rows['data'][:, 0] = p[segments, 0]
+        self._points.insert(segments+1, rows)
+        self._selection.insert(segments+1)
+        self._style_runs = None
         self.construct(keep=False)
         self.optimize()
         self.data_moved()
@@ -172,10 +314,9 @@ class Track(UndoStack):
             raise TrackException("Nothing to delete.")
         if self._data.shape[0] - len(points) < 3:
             raise TrackException("There must be at least three points at all times.")
-        self._data = np.delete(self._data, points, axis=0)
-        self._styles = np.delete(self._styles, points, axis=0)
-        self._selection = np.delete(self._selection, points, axis=0)
-        self._selection[-1] = self._selection[0]
+        self._points.delete(points)
+        self._selection.delete(points)
+        self._style_runs = None
         self.construct(keep=False)
         self.optimize()
         self.data_moved()
@@ -193,10 +334,7 @@ class Track(UndoStack):
         self._delete(self.selected_inner)
 
     def serialize(self):
-        data = []
-        for n in range(self._data.shape[0]):
-            data.append((*self._data[n, 0].astype(float), self._styles[n].astype(float)))
-        return json.dumps(data, indent=4)
+        return dumps(self._data[:, 0], self._styles)
 
     def deserialize(self, jsonstr):
         j = json.loads(jsonstr)
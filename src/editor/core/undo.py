@@ -28,6 +28,10 @@ class UndoStack:
     def restore_snapshot(self, snapshot):
         raise NotImplementedError
 
+    def history_changed(self):
+        """Called after an edit has been pushed, undone or redone."""
+        pass
+
     def clear_all_undo(self):
         self._undo.clear()
         self._redo.clear()
@@ -37,6 +41,7 @@ class UndoStack:
             snapshot = self.create_snapshot()
         self._undo.append((name, snapshot))
         self._redo.clear()
+        self.history_changed()
 
     def undo(self):
         try:
@@ -46,6 +51,7 @@ class UndoStack:
         else:
             self._redo.append((name, self.create_snapshot()))
             self.restore_snapshot(snapshot)
+            self.history_changed()
 
     def redo(self):
         try:
@@ -55,3 +61,4 @@ class UndoStack:
         else:
             self._undo.append((name, self.create_snapshot()))
             self.restore_snapshot(snapshot)
+            self.history_changed()
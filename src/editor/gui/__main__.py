@@ -1,19 +1,66 @@
-import functools
-
-from PySide6 import QtCore, QtWidgets
-from pyqtconsole.console import PythonConsole
+import time
+# for --profile-startup, taken before the heavy imports below
+_import_start = time.perf_counter()
 
+import argparse
+import concurrent.futures
+import functools
+import pathlib
+import uuid
+
+import numpy as np
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from ..core.clearance import ClearanceChecker
+from ..core.importer import import_points
+from ..core.journal import Journal, atomic_write, read, state_of
+from ..core.profile import profiler, timed
+from ..core.stats import TrackStats
+from ..core.track import TrackException, dumps
+from .library import LibraryDock
 from .opensave import OpenSaveController
 from .menu import MenuController
 from .trackglsl import TrackGLSL
 from .view import View3D, View1D
-from .preview import Preview
+from .preview import Preview, PreviewScheduler
+from .replay import EventRecorder
+
+
+JOURNAL_DIR = pathlib.Path(QtCore.QStandardPaths.writableLocation(
+    QtCore.QStandardPaths.StandardLocation.GenericCacheLocation
+)) / 'racer-editor' / 'journals'
+
+
+def _journal_lock(path):
+    lock = QtCore.QLockFile(str(path.with_suffix('.lock')))
+    # stale only once its editor has exited, however long it has been running
+    lock.setStaleLockTime(0)
+    return lock
 
 
 class TrackEditor(QtWidgets.QMainWindow):
-    def __init__(self):
+    """
+    If journal is a directory, every edit is journalled to a file of this
+    editor's own there until the track is saved, so that recover() can
+    restore it after a crash. Each journal has a lock file beside it which
+    is held while its editor runs.
+    """
+    saveFinished = QtCore.Signal(object, int, object)
+
+    def __init__(self, journal=None):
         super().__init__()
         self._track = TrackGLSL()
+        self._journal = None
+        if journal is not None:
+            path = pathlib.Path(journal) / f'{uuid.uuid4().hex}.bin'
+            self._journal = Journal(path)
+            self._lock = _journal_lock(path)
+            self._lock.lock()
+        self._edits = 0
+        self._track.historyChanged.connect(self._edited)
+        # saves are written in the background, one at a time
+        self._saver = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.saveFinished.connect(self._save_finished)
 
         splitter = QtWidgets.QSplitter(QtCore.Qt.Orientation.Vertical, self)
         view3d = View3D(self, self._track)
@@ -32,17 +79,27 @@ class TrackEditor(QtWidgets.QMainWindow):
         self.addDockWidget(QtCore.Qt.DockWidgetArea.RightDockWidgetArea, stats)
         segment = SegmentDock(self._track, self)
         self.addDockWidget(QtCore.Qt.DockWidgetArea.RightDockWidgetArea, segment)
-        console = ConsoleDock({'track': self._track}, self)
+        console = ConsoleDock({'track': self._track, 'profiler': profiler}, self)
         self.addDockWidget(QtCore.Qt.DockWidgetArea.BottomDockWidgetArea, console)
         console.hide()
+        library = LibraryDock(self)
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.LeftDockWidgetArea, library)
+        library.hide()
+        self._library = library
 
         self.statusBar()
 
+        style_colours = QtGui.QAction('Colour by Style', self, checkable=True)
+        style_colours.toggled.connect(self._track.set_style_colours)
+        overlay = QtGui.QAction('Profiler Overlay', self, checkable=True)
+        overlay.toggled.connect(view3d.set_overlay)
+
         self._menu = MenuController()
         self._menu.build_menu(self.menuBar(), [
             ('&File', [
                 ('New...', self.new, 'Ctrl+N'),
                 ('Open...', self.open, 'Ctrl+O'),
+                ('Import...', self.import_polyline, None),
                 (None, None, None),
                 ('Save', self.save, 'Ctrl+S'),
                 ('Save As...', self.saveas, 'Ctrl+Shift+S'),
@@ -58,13 +115,17 @@ class TrackEditor(QtWidgets.QMainWindow):
                 ('Stats', stats.toggleViewAction(), None),
                 ('Segment', segment.toggleViewAction(), None),
                 ('Console', console.toggleViewAction(), 'Ctrl+D'),
+                ('Library', library.toggleViewAction(), 'Ctrl+L'),
                 (None, None, None),
                 ('Top View', view3d.reset_view_rotation, 'Ctrl+T'),
+                ('Colour by Style', style_colours, None),
+                ('Profiler Overlay', overlay, None),
             ], None),
             ('&Select', [
                 ('All', functools.partial(self._track.select, None), 'Ctrl+A'),
                 ('None', functools.partial(self._track.select, slice(0, 0)), 'Ctrl+Shift+A'),
                 ('Invert', functools.partial(self._track.select, None, multi=True), None),
+                ('Conflicts', stats.select_conflicts, None),
             ], None),
             ('&Control Points', [
                 ('Add After', self._track.add_after, None),
@@ -81,6 +142,7 @@ class TrackEditor(QtWidgets.QMainWindow):
             ], None),
         ])
         self._menu.exception.connect(self._show_exception)
+        library.opened.connect(lambda path: self._menu.run_with_feedback(functools.partial(self.open, path)))
 
         self._opensave = OpenSaveController("track")
         self._track.dataChanged.connect(self._opensave.set_unsaved)
@@ -94,27 +156,115 @@ class TrackEditor(QtWidgets.QMainWindow):
         self.setWindowTitle(f'{self._opensave.filename}[*] - Track Editor')
         self.setWindowModified(self._opensave.unsaved)
 
+    def _edited(self):
+        self._edits += 1
+        if self._journal is not None:
+            self._journal.record(state_of(self._track))
+
+    def recover(self):
+        """
+        Offers to restore the track from the journals left behind by editors
+        which crashed, newest first, until one is accepted, and discards the
+        rest. Journals whose editor is still running are left alone.
+        """
+        if self._journal is None:
+            return
+        # a lock without a journal is left by a crash before the first edit
+        paths = {p.with_suffix('.bin') for p in self._journal.path.parent.iterdir() if p.suffix in ('.bin', '.lock')}
+        recovered = False
+        for path in sorted(paths, key=lambda p: p.stat().st_mtime if p.exists() else 0, reverse=True):
+            if path == self._journal.path:
+                continue
+            lock = _journal_lock(path)
+            if not lock.tryLock(0):
+                continue
+            state = None if recovered else read(path)
+            if state is not None:
+                ret = QtWidgets.QMessageBox.question(
+                    self, "Recover Track",
+                    f"The editor did not exit cleanly. Recover the unsaved track ({len(state)} control points)?"
+                )
+                if ret == QtWidgets.QMessageBox.StandardButton.Yes:
+                    self._track.set_data(state['position'], state['style'])
+                    self._opensave.set_unsaved()
+                    self._journal.reset()
+                    self._journal.record(state_of(self._track))
+                    recovered = True
+            path.unlink(missing_ok=True)
+            lock.unlock()
+
+    def _loaded(self):
+        self._edits += 1
+        if self._journal is not None:
+            self._journal.reset()
+
     def new(self):
         if self._opensave.new():
             self._track.set_data(None)
+            self._loaded()
 
-    def open(self):
-        filepath = self._opensave.open()
+    def open(self, path=None):
+        filepath = self._opensave.open(path)
         if filepath:
             self._track.deserialize(filepath.read_text())
+            self._loaded()
+
+    def import_polyline(self):
+        path, filter = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Import", filter="Polylines (*.csv *.txt *.gpx *.svg)"
+        )
+        if path and self._opensave.new():
+            QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.CursorShape.WaitCursor)
+            try:
+                self._track.set_data(import_points(path))
+            finally:
+                QtWidgets.QApplication.restoreOverrideCursor()
+            self._loaded()
+            self._opensave.set_unsaved()
+
+    def _write(self, filepath):
+        edits = self._edits
+        points = self._track._data[:, 0].copy()
+        styles = self._track._styles.copy()
+
+        def write():
+            try:
+                atomic_write(filepath, dumps(points, styles))
+            except OSError as e:
+                self.saveFinished.emit(filepath, edits, e)
+            else:
+                self.saveFinished.emit(filepath, edits, None)
+
+        self._saver.submit(write)
+
+    def _save_finished(self, filepath, edits, error):
+        if error is not None:
+            self._opensave.set_unsaved()
+            self._show_exception(f"Could not save {filepath.name}: {error}")
+        elif edits == self._edits and self._journal is not None:
+            # nothing has changed since the save started, so there is nothing to recover
+            self._journal.reset()
 
     def save(self):
         filepath = self._opensave.save()
         if filepath:
-            filepath.write_text(self._track.serialize())
+            self._write(filepath)
         return filepath
 
     def saveas(self):
         filepath = self._opensave.saveas()
         if filepath:
-            filepath.write_text(self._track.serialize())
+            self._write(filepath)
         return filepath
 
+    def closeEvent(self, event):
+        self._saver.shutdown(wait=True)
+        self._library.shutdown()
+        if self._journal is not None:
+            self._journal.close()
+            self._lock.unlock()
+        super().closeEvent(event)
+
     def quit(self):
         if self._opensave.warning():
             self.close()
@@ -122,16 +272,27 @@ class TrackEditor(QtWidgets.QMainWindow):
 
 class PreviewDock(QtWidgets.QDockWidget):
 
-    def __init__(self, track, parent=None):
+    def __init__(self, track, parent=None, fps=30, speed=3000):
         super().__init__("Preview", parent)
         self._preview = Preview(track)
         self._preview.setScaledContents(True)
         self._preview.setFixedSize(320, 240)
         self.setWidget(self._preview)
         self.topLevelChanged.connect(self.update_size)
-        self._timer = QtCore.QTimer()
-        self._timer.timeout.connect(self.update_time)
-        self._timer.start(1000 // 30)
+        self._scheduler = PreviewScheduler(self._preview, fps, speed)
+        self._scheduler.stats.connect(self.update_stats)
+        self.visibilityChanged.connect(self.update_running)
+        if parent is not None:
+            parent.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QtCore.QEvent.Type.WindowStateChange:
+            self.update_running()
+        return False
+
+    def update_running(self):
+        minimized = self.window().isMinimized() or (self.parent() is not None and self.parent().isMinimized())
+        self._scheduler.set_running(self.isVisible() and not minimized)
 
     def update_size(self):
         if self.isFloating():
@@ -140,10 +301,8 @@ class PreviewDock(QtWidgets.QDockWidget):
         else:
             self._preview.setFixedSize(320, 240)
 
-    def update_time(self):
-        self._preview.move(100)
-        if self.isVisible():
-            self._preview.redraw()
+    def update_stats(self, fps, frame_time):
+        self.setWindowTitle(f"Preview ({fps:.0f} fps, {frame_time:.1f} ms)")
 
 
 class StatsDock(QtWidgets.QDockWidget):
@@ -153,11 +312,19 @@ class StatsDock(QtWidgets.QDockWidget):
         self._rows = {}
         self.add_row('Control points:')
         self.add_row('Total length:')
+        self.add_row('Min radius:')
+        self.add_row('Max radius:')
+        self.add_row('Max gradient:')
+        self.add_row('Curvature residual:')
+        self.add_row('Style lengths:')
+        self.add_row('Conflicts:')
         widget = QtWidgets.QWidget()
         widget.setLayout(self.form)
         self.setWidget(widget)
         self.track = track
-        self.track.visualChanged.connect(self.update)
+        self._stats = TrackStats()
+        self.clearance = ClearanceChecker()
+        self.track.curveChanged.connect(self.update)
         self.update()
 
     def add_row(self, title):
@@ -167,9 +334,26 @@ class StatsDock(QtWidgets.QDockWidget):
     def set_row(self, title, value):
         self._rows[title].setText(str(value))
 
-    def update(self):
+    @timed('StatsDock.update')
+    def update(self, rows=None):
+        self._stats.update(self.track, rows)
+        self.clearance.update(self.track, rows)
         self.set_row('Control points:', self.track.P.shape[0])
         self.set_row('Total length:', f'{round(self.track.total_length/1000, 2)}km')
+        self.set_row('Min radius:', f'{round(self._stats.min_radius, 1)}m')
+        self.set_row('Max radius:', f'{round(self._stats.max_radius, 1)}m')
+        self.set_row('Max gradient:', f'{round(self._stats.max_gradient * 100, 1)}%')
+        self.set_row('Curvature residual:', f'{self._stats.residual:.2e}')
+        self.set_row('Style lengths:', ', '.join(
+            f'{style}: {round(length/1000, 2)}km' for style, length in self._stats.style_lengths.items()
+        ))
+        self.set_row('Conflicts:', len(self.clearance.conflicts))
+
+    def select_conflicts(self):
+        segments = self.clearance.segments
+        if not len(segments):
+            raise TrackException("No conflicts.")
+        self.track.select(np.unique(np.concatenate((segments, (segments + 1) % self.track.P.shape[0]))))
 
 
 class SegmentDock(QtWidgets.QDockWidget):
@@ -196,34 +380,118 @@ class SegmentDock(QtWidgets.QDockWidget):
         self._rows[title].setText(str(value))
 
     def update_style(self):
-        if len(self.track.selected) == 1:
-            self.track.S[self.track.selected[0]] = self.style.value()
+        # undoable, and so journalled
+        if len(self.track.selected):
+            self.track.set_selected_style(self.style.value())
 
+    @timed('SegmentDock.update')
     def update(self):
-        if len(self.track.selected) == 1:
-            self.set_row('Selected:', str(self.track.selected[0]))
-            self.style.setValue(self.track.S[self.track.selected[0]])
+        selected = self.track.selected
+        if len(selected) == 1:
+            self.set_row('Selected:', str(selected[0]))
+        else:
+            n = self.track.P.shape[0]
+            self.set_row('Selected:', ', '.join(
+                str(a) if b - a == 1 else f'{a}-{(b - 1) % n}' for a, b in self.track.selected_runs
+            ))
+        if len(selected):
+            with QtCore.QSignalBlocker(self.style):
+                self.style.setValue(int(self.track._styles[selected[0]]))
             self.style.show()
         else:
-            self.set_row('Selected:', str(self.track.selected))
             self.style.hide()
 
 
 class ConsoleDock(QtWidgets.QDockWidget):
+    """The console is only imported and built when the dock is first shown."""
+
     def __init__(self, locals, parent=None):
         super().__init__("Debug Console", parent)
-        console = PythonConsole(locals=locals)
-        console.eval_queued()
-        self.setWidget(console)
+        self._locals = locals
+        self.visibilityChanged.connect(self._create_console)
+
+    def _create_console(self, visible):
+        if visible and self.widget() is None:
+            from pyqtconsole.console import PythonConsole
+            console = PythonConsole(locals=self._locals)
+            console.eval_queued()
+            self.setWidget(console)
+
+
+class StartupTimer(QtCore.QObject):
+    """
+    Times each stage of startup from the first import until the window has
+    drawn and the first optimisation has finished, prints them and quits.
+    The exit status is 1 if the window took longer than budget seconds to
+    become interactive.
+    """
+
+    def __init__(self, editor, budget=1.0, timeout=10.0):
+        super().__init__(editor)
+        self._budget = budget
+        self.marks = {}
+        self._view = editor.findChild(View3D)
+        self._view.frameSwapped.connect(self._first_frame)
+        editor._track.optimized.connect(lambda: self.mark('optimised'))
+        QtCore.QTimer.singleShot(0, lambda: self.mark('event loop'))
+        QtCore.QTimer.singleShot(int(timeout * 1000), self.report)
+
+    def _first_frame(self):
+        self._view.frameSwapped.disconnect(self._first_frame)
+        self.mark('first frame')
+
+    def mark(self, name, t=None):
+        self.marks.setdefault(name, time.perf_counter() if t is None else t)
+        if 'optimised' in self.marks and 'first frame' in self.marks:
+            self.report()
+
+    def report(self):
+        previous = _import_start
+        for name, t in self.marks.items():
+            print(f'{name:<12} {(t - previous) * 1000:8.1f} ms {(t - _import_start) * 1000:8.1f} ms')
+            previous = t
+        # without OpenGL nothing is drawn, so fall back to the event loop starting
+        ready = self.marks.get('first frame', self.marks.get('event loop'))
+        if ready is None:
+            print("never interactive")
+            over = True
+        else:
+            print(f"interactive after {(ready - _import_start) * 1000:.1f} ms, budget {self._budget * 1000:.0f} ms")
+            over = ready - _import_start > self._budget
+        QtWidgets.QApplication.instance().exit(1 if over else 0)
 
 
 def run():
     import sys
+    imported = time.perf_counter()
+    parser = argparse.ArgumentParser(description="Track editor.")
+    parser.add_argument('--record', type=pathlib.Path, help="Record the session to a file for python -m editor.gui.replay.")
+    parser.add_argument('--profile', type=pathlib.Path, help="Enable profiling and write a Chrome trace to a file on exit.")
+    parser.add_argument('--profile-startup', type=float, nargs='?', const=1.0, metavar='BUDGET',
+                        help="Print startup times and exit, failing if startup took longer than BUDGET seconds (default 1).")
+    args, qt_args = parser.parse_known_args()
+    if args.profile is not None:
+        profiler.enabled = True
     #QtWidgets.QApplication.setAttribute(QtCore.Qt.ApplicationAttribute.AA_ShareOpenGLContexts, True)
-    app = QtWidgets.QApplication(sys.argv)
-    view = TrackEditor()
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    created = time.perf_counter()
+    # a startup profile neither journals nor stops at the recovery prompt
+    view = TrackEditor(journal=JOURNAL_DIR if args.profile_startup is None else None)
+    if args.profile_startup is not None:
+        startup = StartupTimer(view, args.profile_startup)
+        startup.mark('imports', imported)
+        startup.mark('application', created)
+        startup.mark('window')
     view.show()
-    sys.exit(app.exec())
+    if args.profile_startup is not None:
+        startup.mark('shown')
+    view.recover()
+    if args.record is not None:
+        EventRecorder(view, args.record)
+    result = app.exec()
+    if args.profile is not None:
+        profiler.dump_trace(args.profile)
+    sys.exit(result)
 
 
 if __name__ == '__main__':
@@ -2,7 +2,16 @@ import numpy as np
 from PySide6 import QtCore, QtGui
 
 
+def to_numpy(matrix):
+    """Converts a QMatrix4x4 to a numpy array for right-multiplying row vectors."""
+    return np.array(matrix.data()).reshape(4, 4)
+
+
 class Camera(QtCore.QObject):
+    """
+    Orthographic camera. The matrices are cached and only rebuilt after
+    zoom, translate, rotate or resize have changed them.
+    """
     moved = QtCore.Signal()
 
     def __init__(self):
@@ -13,6 +22,16 @@ class Camera(QtCore.QObject):
         self._rotation = 0
         self._zoom = 6
         self.rotation_locked = False
+        self._proj = QtGui.QMatrix4x4()
+        self._scrn = QtGui.QMatrix4x4()
+        self._invalidate()
+
+    def _invalidate(self):
+        self._view = None
+        self._mvp = None
+        self._scrn_view = None
+        self._scrn_np = None
+        self._scrn_np_i = None
 
     def resize(self, w, h):
         self._w = w
@@ -25,23 +44,46 @@ class Camera(QtCore.QObject):
         self._scrn.scale(self._w / 2, -self._h / 2, 1)
         self._scrn.translate(1, -1, 0)
         self._scrn *= self._proj
+        self._invalidate()
+
+    def unproject(self, x, y, scrn_np_i=None):
+        """
+        Projects screen coordinates back to the world xy plane.
+        scrn_np_i may be given to reuse a previous scrn_inverse.
+        """
+        return tuple(self.unproject_points(np.array(((x, y), )), scrn_np_i)[0])
 
-    def unproject(self, x, y):
-        """Projects screen coordinates back to the world xy plane."""
-        scrn_np_i = np.array(self.scrn.inverted()[0].data()).reshape(4, 4)
-        sv = np.array(((x, y, 0, 1), (x, y, 1, 1)))
-        wv = np.matmul(sv, scrn_np_i)
-        a = wv[1, :3] - wv[0, :3]
+    def unproject_points(self, points, scrn_np_i=None):
+        """Projects an (N, 2) array of screen coordinates back to the world xy plane."""
+        if scrn_np_i is None:
+            scrn_np_i = self.scrn_inverse
+        # screen points at depth 0 and 1 give a ray through the world
+        near = (points @ scrn_np_i[:2]) + scrn_np_i[3]
+        a = scrn_np_i[2, :3]
         if a[2] == 0:
-            return 0, 0
-        dx = a[0] / a[2]
-        dy = a[1] / a[2]
-        return wv[0, 0] - dx * wv[0, 2], wv[0, 1] - dy * wv[0, 2]
+            return np.zeros((points.shape[0], 2))
+        return near[:, :2] - (a[:2] / a[2]) * near[:, 2:3]
 
     @property
     def scrn(self):
         """QMatrix4x4 representing the transformation between world space and screen space."""
-        return self._scrn * self.view
+        if self._scrn_view is None:
+            self._scrn_view = self._scrn * self.view
+        return self._scrn_view
+
+    @property
+    def scrn_np(self):
+        """Numpy array of scrn, for right-multiplying row vectors."""
+        if self._scrn_np is None:
+            self._scrn_np = to_numpy(self.scrn)
+        return self._scrn_np
+
+    @property
+    def scrn_inverse(self):
+        """Numpy array of the inverse of scrn, for right-multiplying row vectors."""
+        if self._scrn_np_i is None:
+            self._scrn_np_i = to_numpy(self.scrn.inverted()[0])
+        return self._scrn_np_i
 
     @property
     def proj(self):
@@ -51,20 +93,31 @@ class Camera(QtCore.QObject):
     @property
     def view(self):
         """QMatrix4x4 representing the view matrix."""
-        view = QtGui.QMatrix4x4()
-        view.scale(1 / (self._zoom**3))
-        view.rotate(self._pitch, -1, 0, 0)
-        view.rotate(self._rotation, 0, 0, 1)
-        view.translate(-self._x, -self._y, 0)
-        return view
+        if self._view is None:
+            view = QtGui.QMatrix4x4()
+            view.scale(1 / (self._zoom**3))
+            view.rotate(self._pitch, -1, 0, 0)
+            view.rotate(self._rotation, 0, 0, 1)
+            view.translate(-self._x, -self._y, 0)
+            self._view = view
+        return self._view
+
+    @property
+    def mvp(self):
+        """QMatrix4x4 of proj * view."""
+        if self._mvp is None:
+            self._mvp = self.proj * self.view
+        return self._mvp
 
     def zoom(self, z):
         self._zoom = min(12, max(1, self._zoom - z))
+        self._invalidate()
         self.moved.emit()
 
     def translate(self, x, y):
         self._x -= x
         self._y -= y
+        self._invalidate()
         self.moved.emit()
 
     def rotate(self, dx, dy):
@@ -72,8 +125,15 @@ class Camera(QtCore.QObject):
             self._rotation += dx * 0.3
             self._pitch -= dy * 0.3
             self._pitch = max(0, min(80, self._pitch))
+            self._invalidate()
             self.moved.emit()
 
+    def reset_rotation(self):
+        self._rotation = 0
+        self._pitch = 0
+        self._invalidate()
+        self.moved.emit()
+
 
 class LockedCamera(Camera):
     def __init__(self):
@@ -0,0 +1,70 @@
+import numpy as np
+from PySide6 import QtCore
+
+
+GEOMETRY = 'geometry'
+CURVE = 'curve'
+SELECTION = 'selection'
+STYLE = 'style'
+
+
+def rows_of(item, n):
+    """Returns the sorted row indices of an array of n rows touched by item."""
+    if isinstance(item, tuple):
+        item = item[0]
+    return np.unique(np.arange(n)[item])
+
+
+def ranges_of(rows):
+    """Collapses sorted row indices into a list of (start, stop) ranges."""
+    if not len(rows):
+        return []
+    breaks = np.where(np.diff(rows) != 1)[0] + 1
+    starts = np.concatenate(((rows[0], ), rows[breaks]))
+    stops = np.concatenate((rows[breaks - 1], (rows[-1], ))) + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def rows_in(ranges):
+    """Expands a list of (start, stop) ranges back into sorted row indices."""
+    if not ranges:
+        return np.empty((0, ), dtype=np.intp)
+    return np.concatenate([np.arange(start, stop) for start, stop in ranges])
+
+
+class ChangeBus(QtCore.QObject):
+    """
+    Collects invalidations and delivers them together at most once per
+    display frame. changed is emitted with a dict mapping each invalidated
+    kind to a list of (start, stop) row ranges, or None if every row changed.
+    """
+    changed = QtCore.Signal(object)
+
+    def __init__(self, interval=16):
+        super().__init__()
+        self._pending = {}
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+    def invalidate(self, kind, rows=None):
+        if rows is None:
+            self._pending[kind] = None
+        elif self._pending.get(kind, ()) is not None:
+            self._pending.setdefault(kind, []).append(rows)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        self._timer.stop()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        changes = {}
+        for kind, rows in pending.items():
+            if rows is None:
+                changes[kind] = None
+            else:
+                changes[kind] = ranges_of(np.unique(np.concatenate(rows)))
+        self.changed.emit(changes)
@@ -0,0 +1,120 @@
+import argparse
+import collections
+import concurrent.futures
+import os
+import pathlib
+import sys
+import time
+
+from PySide6 import QtGui
+
+from ..core.track import Track
+from .preview import PreviewRenderer
+
+
+_renderer = None
+
+
+def _init_worker(jsonstr):
+    global _renderer
+    track = Track()
+    track.deserialize(jsonstr)
+    _renderer = PreviewRenderer(track)
+
+
+def _frame_at(distance):
+    _renderer.segment = 0
+    _renderer.py = 0
+    _renderer.move(distance * _renderer.SCALE)
+    return _renderer.render()
+
+
+def render_chunk(first, last, step, output=None):
+    """
+    Renders frames first to last - 1 in the current worker. With an output
+    directory the frames are written there as PNGs, otherwise the raw RGBA
+    bytes of the whole chunk are returned.
+    """
+    raw = []
+    for n in range(first, last):
+        frame = _frame_at(n * step)
+        if output is None:
+            raw.append(frame.tobytes())
+        else:
+            image = QtGui.QImage(
+                frame.data, frame.shape[1], frame.shape[0], frame.strides[0],
+                QtGui.QImage.Format.Format_RGBA8888
+            )
+            image.save(str(output / f'frame_{n:06d}.png'))
+    return b''.join(raw)
+
+
+def chunks(frames, size):
+    for first in range(0, frames, size):
+        yield first, min(first + size, frames)
+
+
+def flythrough(jsonstr, step, output=None, raw=None, workers=None, chunk_size=64):
+    """
+    Renders a flythrough of a serialized track, one frame every step track
+    units. Frames go to PNG files in output, or in order to the binary
+    stream raw. Returns the number of frames rendered.
+    """
+    if workers is None:
+        workers = os.cpu_count()
+    track = Track()
+    track.deserialize(jsonstr)
+    frames = int(track.total_length // step)
+    if output is not None:
+        output.mkdir(parents=True, exist_ok=True)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(jsonstr, )
+    ) as pool:
+        # keep a bounded number of chunks in flight so raw output does not pile up in memory
+        pending = collections.deque()
+        for first, last in chunks(frames, chunk_size):
+            pending.append(pool.submit(render_chunk, first, last, step, output))
+            if len(pending) > 2 * workers:
+                _write(pending.popleft(), raw)
+        while pending:
+            _write(pending.popleft(), raw)
+    return frames
+
+
+def _write(future, raw):
+    data = future.result()
+    if raw is not None:
+        raw.write(data)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Render a preview flythrough of a track without the editor.")
+    parser.add_argument('track', type=pathlib.Path, help="Track file to render.")
+    parser.add_argument('-o', '--output', type=pathlib.Path, help="Directory to write PNG frames to.")
+    parser.add_argument('-r', '--raw', help="File to write raw 320x240 RGBA frames to, or - for stdout.")
+    parser.add_argument('--fps', type=float, default=60, help="Frames per second of the output.")
+    parser.add_argument('--speed', type=float, default=30, help="Camera speed in track units per second.")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument('--chunk', type=int, default=64, help="Frames rendered per task.")
+    args = parser.parse_args()
+
+    if (args.output is None) == (args.raw is None):
+        parser.error("exactly one of --output or --raw is required")
+
+    jsonstr = args.track.read_text()
+    step = args.speed / args.fps
+    start = time.perf_counter()
+    if args.raw == '-':
+        frames = flythrough(jsonstr, step, raw=sys.stdout.buffer, workers=args.workers, chunk_size=args.chunk)
+    elif args.raw is not None:
+        with open(args.raw, 'wb') as raw:
+            frames = flythrough(jsonstr, step, raw=raw, workers=args.workers, chunk_size=args.chunk)
+    else:
+        frames = flythrough(jsonstr, step, output=args.output, workers=args.workers, chunk_size=args.chunk)
+    elapsed = time.perf_counter() - start
+    print(f'{frames} frames in {elapsed:.1f}s ({frames / elapsed:.0f} fps)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    run()
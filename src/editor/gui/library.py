@@ -0,0 +1,152 @@
+import concurrent.futures
+import multiprocessing
+import os
+import pathlib
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from ..core.thumbnail import thumbnail
+
+
+CACHE_PATH = pathlib.Path(QtCore.QStandardPaths.writableLocation(
+    QtCore.QStandardPaths.StandardLocation.GenericCacheLocation
+)) / 'racer-editor' / 'thumbnails'
+
+PATTERNS = ('*.json', )
+
+
+class LibraryDock(QtWidgets.QDockWidget):
+    """
+    Gallery of the tracks in a directory. Files are listed straight away
+    by name, and their thumbnails and headers are filled in as a pool of
+    worker processes renders them. Nothing is listed or started until the
+    dock is first shown. Thumbnails are cached in cache, by default
+    CACHE_PATH.
+    """
+    opened = QtCore.Signal(object)
+    _rendered = QtCore.Signal(int, str, object)
+
+    def __init__(self, parent=None, directory=None, width=128, workers=None, cache=None):
+        super().__init__("Library", parent)
+        self._width = width
+        self._cache = CACHE_PATH if cache is None else pathlib.Path(cache)
+        self._workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self._pool = None
+        self._futures = []
+        self._generation = 0
+        self._items = {}
+        self.directory = None
+
+        self._path = QtWidgets.QLineEdit()
+        self._path.setReadOnly(True)
+        browse = QtWidgets.QPushButton("Browse...")
+        browse.clicked.connect(self.browse)
+        refresh = QtWidgets.QPushButton("Refresh")
+        refresh.clicked.connect(self.refresh)
+        row = QtWidgets.QHBoxLayout()
+        row.addWidget(self._path)
+        row.addWidget(browse)
+        row.addWidget(refresh)
+
+        self._list = QtWidgets.QListWidget()
+        self._list.setViewMode(QtWidgets.QListView.ViewMode.IconMode)
+        self._list.setResizeMode(QtWidgets.QListView.ResizeMode.Adjust)
+        self._list.setMovement(QtWidgets.QListView.Movement.Static)
+        self._list.setUniformItemSizes(True)
+        self._list.setIconSize(QtCore.QSize(width, width * 5 // 4))
+        self._list.setGridSize(QtCore.QSize(width + 16, (width * 5 // 4) + 40))
+        self._list.itemActivated.connect(lambda item: self.opened.emit(item.data(QtCore.Qt.ItemDataRole.UserRole)))
+        placeholder = QtGui.QPixmap(self._list.iconSize())
+        placeholder.fill(QtCore.Qt.GlobalColor.transparent)
+        self._placeholder = QtGui.QIcon(placeholder)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(row)
+        layout.addWidget(self._list)
+        widget = QtWidgets.QWidget()
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        self._pending_directory = pathlib.Path.cwd() if directory is None else pathlib.Path(directory)
+        self._rendered.connect(self._set_thumbnail)
+        self.visibilityChanged.connect(self._first_show)
+
+    def _first_show(self, visible):
+        if visible and self.directory is None:
+            self.set_directory(self._pending_directory)
+
+    def browse(self):
+        path = QtWidgets.QFileDialog.getExistingDirectory(self, "Track Library", str(self.directory or ''))
+        if path:
+            self.set_directory(path)
+
+    def refresh(self):
+        if self.directory is not None:
+            self.set_directory(self.directory)
+
+    def set_directory(self, directory):
+        """Lists the tracks in directory and starts rendering their thumbnails."""
+        self.directory = pathlib.Path(directory)
+        self._path.setText(str(self.directory))
+        self.cancel()
+        self._list.clear()
+        self._items = {}
+        paths = sorted({p for pattern in PATTERNS for p in self.directory.glob(pattern) if p.is_file()})
+        for path in paths:
+            item = QtWidgets.QListWidgetItem(self._placeholder, path.stem)
+            item.setData(QtCore.Qt.ItemDataRole.UserRole, path)
+            item.setToolTip(path.name)
+            self._list.addItem(item)
+            self._items[str(path)] = item
+
+        if self._pool is None and paths:
+            # spawned rather than forked, as forking a process running Qt threads is unsafe
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        generation = self._generation
+        for path in paths:
+            future = self._pool.submit(thumbnail, path, self._cache, self._width)
+            # done callbacks run in a pool thread, so results go back to the GUI thread by signal
+            future.add_done_callback(lambda f, p=str(path): self._done(generation, p, f))
+            self._futures.append(future)
+
+    def _done(self, generation, path, future):
+        if future.cancelled():
+            return
+        # a track which cannot be read gets its error in place of a thumbnail
+        result = future.exception() or future.result()
+        try:
+            self._rendered.emit(generation, path, result)
+        except RuntimeError:
+            # the dock was deleted while rendering
+            pass
+
+    def _set_thumbnail(self, generation, path, result):
+        if generation != self._generation or path not in self._items:
+            return
+        item = self._items[path]
+        if isinstance(result, Exception):
+            item.setToolTip(f"{pathlib.Path(path).name}\n{result}")
+            return
+        image, info = result
+        item.setIcon(QtGui.QIcon(QtGui.QPixmap.fromImage(QtGui.QImage(
+            image.data, image.shape[1], image.shape[0], image.strides[0], QtGui.QImage.Format.Format_RGBA8888
+        ).copy())))
+        item.setToolTip(
+            f"{pathlib.Path(path).name}\n{info['points']} control points\n"
+            f"{info['length'] / 1000:.2f}km, climb {info['climb']:.1f}m"
+        )
+
+    def cancel(self):
+        """Cancels the thumbnails not yet rendered, and ignores those in progress."""
+        self._generation += 1
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+
+    def shutdown(self):
+        self.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
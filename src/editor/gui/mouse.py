@@ -23,8 +23,9 @@ class BaseInteraction(QtCore.QObject):
 
 class CameraTranslateInteraction(BaseInteraction):
     def drag(self, event):
-        x0, y0 = self._camera.unproject(self._mx, self._my)
-        x1, y1 = self._camera.unproject(event.x(), event.y())
+        (x0, y0), (x1, y1) = self._camera.unproject_points(
+            np.array(((self._mx, self._my), (event.x(), event.y())))
+        )
         self._camera.translate(x1 - x0, y1 - y0)
         self._mx = event.x()
         self._my = event.y()
@@ -44,7 +45,6 @@ class CameraRotateInteraction(BaseInteraction):
 class SelectInteraction(BaseInteraction):
     def __init__(self, widget, press_event, camera):
         super().__init__(widget, press_event, camera)
-        self._control_points = self._widget.project_track(camera.scrn)
         self._rubber_band = None
 
     def drag(self, event):
@@ -64,42 +64,70 @@ class SelectInteraction(BaseInteraction):
             multi = self._press_event.modifiers() & QtCore.Qt.KeyboardModifier.ShiftModifier
             if self._rubber_band:
                 rect = self._rubber_band.geometry()
-                rx = self._control_points[:, 0] >= rect.x()
-                ry = self._control_points[:, 1] >= rect.y()
-                rxx = self._control_points[:, 0] <= (rect.width() + rect.x())
-                ryy = self._control_points[:, 1] <= (rect.height() + rect.y())
+                # the camera cannot move during the interaction
+                control_points = self._widget.project_track(self._camera.scrn_np)
+                rx = control_points[:, 0] >= rect.x()
+                ry = control_points[:, 1] >= rect.y()
+                rxx = control_points[:, 0] <= (rect.width() + rect.x())
+                ryy = control_points[:, 1] <= (rect.height() + rect.y())
                 selected = np.where(np.logical_and(np.logical_and(rx, ry), np.logical_and(rxx, ryy)))[0]
                 self._rubber_band.hide()
                 self._rubber_band = None
             else:
-                diff = np.linalg.norm(self._control_points - (event.x(), event.y()), axis=1)
-                best = np.argmin(diff)
-                if diff[best] < 25:
-                    selected = best
-                else:
+                picked = self._widget.pick(event.x(), event.y())
+                if picked is None:
                     selected = slice(0, 0)
+                elif picked[0] == 'point':
+                    selected = picked[1]
+                else:
+                    selected = [picked[1], (picked[1] + 1) % self._widget._track.P.shape[0]]
             self._widget._track.select(selected, multi)
             self.finished.emit()
 
 
 class TransformInteraction(BaseInteraction):
+    """
+    Moves the selected points. Mouse motion is accumulated and applied as
+    a single translation per frame, since every write to the track points
+    invalidates the curve. The camera cannot move during the interaction,
+    so the unprojection matrix is computed once.
+    """
     def __init__(self, widget, press_event, camera):
         super().__init__(widget, press_event, camera)
         self._snapshot = self._widget._track.create_snapshot()
         self._modified = False
+        self._scrn_i = camera.scrn_inverse
+        self._x = self._mx
+        self._y = self._my
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(16)
+        self._timer.timeout.connect(self.apply)
 
     def drag(self, event):
-        x0, y0 = self._camera.unproject(self._mx, self._my)
-        x1, y1 = self._camera.unproject(event.x(), event.y())
+        self._x = event.x()
+        self._y = event.y()
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def apply(self):
+        self._timer.stop()
+        if (self._x, self._y) == (self._mx, self._my):
+            return
+        (x0, y0), (x1, y1) = self._camera.unproject_points(
+            np.array(((self._mx, self._my), (self._x, self._y))), self._scrn_i
+        )
         self._widget.translate_points(x1 - x0, y1 - y0)
-        self._mx = event.x()
-        self._my = event.y()
+        self._mx = self._x
+        self._my = self._y
         self._modified = True
 
     def release(self, event):
-        if self._modified:
-            name = f"Move Control Points {self._widget.description}"
-            self._widget._track.push_undo(name, self._snapshot)
+        if event.button() == self._press_event.button():
+            self.apply()
+            if self._modified:
+                name = f"Move Control Points {self._widget.description}"
+                self._widget._track.push_undo(name, self._snapshot)
         super().release(event)
 
 
@@ -5,9 +5,9 @@ from PySide6 import QtCore, QtWidgets
 
 def ask_if_unsaved(f):
     @functools.wraps(f)
-    def _ask_if_unsaved(self):
+    def _ask_if_unsaved(self, *args):
         if self.warning():
-            return f(self)
+            return f(self, *args)
     return _ask_if_unsaved
 
 
@@ -67,8 +67,9 @@ class OpenSaveController(QtCore.QObject):
         return True
 
     @ask_if_unsaved
-    def open(self):
-        path, filter = QtWidgets.QFileDialog.getOpenFileName()
+    def open(self, path=None):
+        if path is None:
+            path, filter = QtWidgets.QFileDialog.getOpenFileName()
         self._filepath = pathlib.Path(path)
         self.unsaved = False
         return self._filepath
@@ -1,101 +1,181 @@
+import functools
+import time
+
 import numpy as np
-from PySide6 import QtGui, QtWidgets
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from ..core.profile import timed
+
+
+SKY = (0, 200, 255)
+GRASS = (91, 173, 51), (81, 163, 41)
+ROAD = (84, 66, 66), (74, 56, 56)
+CURB = (200, 0, 0), (200, 200, 200)
+
+# palette indices used by the raster renderer
+_SKY, _GRASS, _ROAD, _CURB = 0, 1, 3, 5
+_PALETTE = np.array([(*c, 255) for c in (SKY, *GRASS, *ROAD, *CURB)], dtype=np.uint8)
 
 
-class Preview(QtWidgets.QLabel):
+class PreviewRenderer:
+    """
+    Pseudo-3D road renderer. Does not depend on any widget, so it can
+    be used headless: render() returns the frame as an RGBA array.
+    """
+    GROUND_HEIGHT = 120
+    WIDTH = 320
+    HEIGHT = 240
+    SCALE = 100
+
     def __init__(self, track):
-        super().__init__()
         self.segment = 0
         self.px = 0
         self.py = 0
         self.track = track
         self.update_data()
-        self._pixmap = QtGui.QPixmap(320, 240)
-        self.redraw()
-        self.track.visualChanged.connect(self.update_data)
+        self._frame = np.empty((self.HEIGHT, self.WIDTH, 4), dtype=np.uint8)
 
     def move(self, d):
-        self.py += d
-        while self.py > self.L[self.segment]:
-            self.py -= self.L[self.segment]
-            self.segment += 1
-            self.segment %= len(self.L)
+        self.update_data()
+        self.segment, self.py = self.locate(self.py + d)
 
     def update_data(self):
-        self.P = self.track.P * 100
-        self.M = self.track.M * 100
-        self.A = self.track.A * 100
-        self.B = self.track.B * 100
-        self.L = np.linalg.norm(self.M, axis=1)
-        self.segment %= len(self.P)
+        # also run before every use, as points can be deleted before visualChanged is delivered
+        self.segment %= self.track.P.shape[0]
+
+    # The track arrays are read in place, in track units. Positions and
+    # distances are converted to preview units by SCALE as they are used.
+
+    @property
+    def L(self):
+        return self.track._len
 
     def interpolate(self, seg, d):
-        P = self.P[seg]
-        M = self.M[seg]
-        A = self.A[seg]
-        B = self.B[seg]
-        L = 1 / self.L[seg]
-        t = d * L
+        P = self.track.P[seg]
+        M = self.track.M[seg]
+        A = self.track.A[seg]
+        B = self.track.B[seg]
+        L = (1 / (self.L[seg] * self.SCALE))[..., np.newaxis]
+        t = np.asarray(d)[..., np.newaxis] * L
         t2 = t**2
         t3 = t**3
-        r = (A * t3) + (B * t2) + (M * t) + P
+        r = ((A * t3) + (B * t2) + (M * t) + P) * self.SCALE
         dr = ((3*A)*t2) + ((2*B)*t) + M
         ddr = ((6*A)*t) + (2 * B)
-        return r, dr * L, ddr * L * L
+        return r, dr * L * self.SCALE, ddr * L * L * self.SCALE
+
+    def locate(self, d):
+        """Finds the segment and offset into it at distance d ahead of the camera segment."""
+        distances = self.track._distances
+        d = (distances[self.segment, 0] + (d / self.SCALE)) % distances[-1, 1]
+        seg = np.minimum(np.searchsorted(distances[:, 1], d, side='right'), distances.shape[0] - 1)
+        return seg, (d - distances[seg, 0]) * self.SCALE
+
+    @functools.cached_property
+    def rows(self):
+        nn = np.linspace(0, 1, self.GROUND_HEIGHT)
+        z = 500 / (1.05 - nn)
+        return z, 200 / z, 1 - (nn / 1.01)
 
     def draw_lists(self):
-        GROUND_HEIGHT = 120
+        self.update_data()
         screenX = 160 + (self.px * 32)
-        perspectiveDX = (160 - screenX) / GROUND_HEIGHT
-
-        sy = np.empty((GROUND_HEIGHT, ), dtype=np.float32)
-        sx = np.empty((GROUND_HEIGHT, ), dtype=np.float32)
-        sz = np.empty((GROUND_HEIGHT, ), dtype=int)
-        scale = np.empty((GROUND_HEIGHT, ))
+        perspectiveDX = (160 - screenX) / self.GROUND_HEIGHT
+        z, zz, scale = self.rows
 
         sp, sdp, sddp = self.interpolate(self.segment, self.py)
         camdir = sdp[:2] / np.linalg.norm(sdp[:2])
         camdir = np.array((camdir[1], -camdir[0]))
 
-        for n in range(GROUND_HEIGHT):
-            nn = n / (GROUND_HEIGHT - 1)
-            z = 500 / (1.05 - nn)
-            zz = 200 / z
-            scale[n] = 1 - (nn / 1.01)
-            py = self.py + z
-            segment = self.segment
-            while py > self.L[segment]:
-                py -= self.L[segment]
-                segment += 1
-                segment %= len(self.L)
-
-            p, dp, ddp = self.interpolate(segment, py)
-            relpos = p - sp
-            left = np.dot(relpos[:2], camdir) * zz
-            sx[n] = left + screenX + (n * perspectiveDX)
-            relh = relpos[2]
-            sy[n] = relh * zz
-            sz[n] = (int(py) % 512) > 255
+        segment, py = self.locate(self.py + z)
+        p, dp, ddp = self.interpolate(segment, py)
+        relpos = p - sp
+        left = np.dot(relpos[:, :2], camdir) * zz
+        sx = left + screenX + (np.arange(self.GROUND_HEIGHT) * perspectiveDX)
+        sy = relpos[:, 2] * zz
+        sz = ((py.astype(int) % 512) > 255).astype(int)
 
         sy -= sy[0]
-        y = np.linspace(239, 120, GROUND_HEIGHT) - sy
+        y = np.linspace(239, 120, self.GROUND_HEIGHT) - sy
 
         return sx, scale, y.astype(int), sz
 
+    def scanlines(self):
+        """
+        Resolves the row spans from draw_lists into one entry per scanline,
+        nearer rows overwriting further ones. Rows showing sky are -1.
+        """
+        sx, ss, sy, sz = self.draw_lists()
+        prev = np.concatenate(((self.HEIGHT, ), sy[:-1]))
+        ya = np.minimum(sy, prev)[:, np.newaxis]
+        yb = np.maximum(sy, prev)[:, np.newaxis]
+        y = np.arange(self.HEIGHT)
+        covered = (y >= ya) & (y < yb)
+        # rows are drawn far to near, so the nearest covering row wins
+        owner = np.argmax(covered, axis=0)
+        owner[~np.any(covered, axis=0)] = -1
+        return owner, sx, ss, sz
+
+    def render(self):
+        """Renders a frame into a reused RGBA array and returns it."""
+        owner, sx, ss, sz = self.scanlines()
+        ground = owner >= 0
+        n = np.where(ground, owner, 0)
+        x = sx[n][:, np.newaxis]
+        scale = ss[n][:, np.newaxis]
+        c = sz[n].astype(np.uint8)[:, np.newaxis]
+
+        px = np.arange(self.WIDTH) + 0.5
+        l = x - (scale * 256)
+        r = x + (scale * 256)
+        curbw = scale * 16
+        road = (px >= l) & (px <= r)
+        curb = (np.abs(px - l) <= curbw) | (np.abs(px - r) <= curbw)
+        centre = (np.abs(px - x) <= scale * 4) & (c == 0)
+
+        idx = np.where(road, _ROAD + c, _GRASS + c)
+        idx = np.where(curb, _CURB + c, idx)
+        idx = np.where(centre, _CURB + 1, idx)
+        idx[~ground] = _SKY
+        np.take(_PALETTE, idx, axis=0, out=self._frame)
+        return self._frame
+
+
+class Preview(PreviewRenderer, QtWidgets.QLabel):
+    def __init__(self, track):
+        QtWidgets.QLabel.__init__(self)
+        PreviewRenderer.__init__(self, track)
+        self.raster = True
+        self._pixmap = QtGui.QPixmap(self.WIDTH, self.HEIGHT)
+        self.redraw()
+        self.track.visualChanged.connect(self.update_data)
+
+    @timed('Preview.redraw')
     def redraw(self):
+        if self.raster:
+            frame = self.render()
+            image = QtGui.QImage(
+                frame.data, self.WIDTH, self.HEIGHT, frame.strides[0],
+                QtGui.QImage.Format.Format_RGBA8888
+            )
+            self.setPixmap(QtGui.QPixmap.fromImage(image))
+        else:
+            self.redraw_painter()
+
+    def redraw_painter(self):
         pixmap = self._pixmap
         painter = QtGui.QPainter(pixmap)
 
-        sky = QtGui.QColor(0, 200, 255)
-        grass = QtGui.QColor(91, 173, 51), QtGui.QColor(81, 163, 41)
-        road = QtGui.QColor(84, 66, 66), QtGui.QColor(74, 56, 56)
-        curb = QtGui.QColor(200, 0, 0), QtGui.QColor(200, 200, 200)
+        sky = QtGui.QColor(*SKY)
+        grass = QtGui.QColor(*GRASS[0]), QtGui.QColor(*GRASS[1])
+        road = QtGui.QColor(*ROAD[0]), QtGui.QColor(*ROAD[1])
+        curb = QtGui.QColor(*CURB[0]), QtGui.QColor(*CURB[1])
 
         sx, ss, sy, sz = self.draw_lists()
-        sx = sx[::-1]
-        sy = list(sy[::-1]) + [240]
-        ss = ss[::-1]
-        sz = sz[::-1]
+        sx = sx[::-1].tolist()
+        sy = sy[::-1].tolist() + [240]
+        ss = ss[::-1].tolist()
+        sz = sz[::-1].tolist()
 
         painter.fillRect(0, 0, 320, 240, sky)
 
@@ -125,4 +205,76 @@ class Preview(QtWidgets.QLabel):
         self.setPixmap(pixmap)
 
 
+class PreviewScheduler(QtCore.QObject):
+    """
+    Drives a Preview at a target frame rate while it is running. The camera
+    advances by elapsed wall time, so when rendering falls behind frames are
+    skipped instead of the flythrough slowing down.
+    """
+    stats = QtCore.Signal(float, float)
+
+    def __init__(self, preview, fps=30, speed=3000):
+        # owned by the preview so the timer outlives anything that can stop it
+        super().__init__(preview)
+        self._preview = preview
+        self.speed = speed
+        self._timer = QtCore.QTimer(self)
+        self._timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self.tick)
+        self._clock = QtCore.QElapsedTimer()
+        self._frames = 0
+        self._render_time = 0
+        self._window = QtCore.QElapsedTimer()
+        self.fps = 0.0
+        self.frame_time = 0.0
+        self.skipped = 0
+        self.target_fps = fps
+
+    @property
+    def target_fps(self):
+        return self._target_fps
+
+    @target_fps.setter
+    def target_fps(self, fps):
+        self._target_fps = fps
+        self._timer.setInterval(1000 // fps)
+
+    @property
+    def running(self):
+        return self._timer.isActive()
+
+    def start(self):
+        if not self._timer.isActive():
+            self._clock.start()
+            self._window.start()
+            self._frames = 0
+            self._render_time = 0
+            self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def set_running(self, running):
+        if running:
+            self.start()
+        else:
+            self.stop()
+
+    def tick(self):
+        elapsed = self._clock.restart()
+        self.skipped += max(0, (elapsed // self._timer.interval()) - 1)
+        self._preview.move(self.speed * elapsed / 1000)
+        t = time.perf_counter()
+        self._preview.redraw()
+        self._render_time += time.perf_counter() - t
+        self._frames += 1
+
+        window = self._window.elapsed()
+        if window >= 1000:
+            self.fps = self._frames * 1000 / window
+            self.frame_time = self._render_time * 1000 / self._frames
+            self._frames = 0
+            self._render_time = 0
+            self._window.restart()
+            self.stats.emit(self.fps, self.frame_time)
 
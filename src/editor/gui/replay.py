@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import pathlib
+import sys
+import time
+
+import numpy as np
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from ..core import hermite
+from .view import BaseView
+
+
+"""
+Recording and replaying editing sessions.
+
+    python -m editor.gui --record session.jsonl
+    python -m editor.gui.replay session.jsonl
+
+A recording holds the starting track and window size, then every mouse and
+key event on the views and every menu action, one JSON object per line.
+Replay runs them against a fresh editor at the recorded times and reports
+the latency from each event to the next repaint, and the optimiser time
+spent on each edit.
+
+"""
+
+
+Type = QtCore.QEvent.Type
+
+MOUSE_EVENTS = {
+    Type.MouseButtonPress: 'press',
+    Type.MouseButtonRelease: 'release',
+    Type.MouseButtonDblClick: 'double',
+    Type.MouseMove: 'move',
+    Type.Wheel: 'wheel',
+}
+
+KEY_EVENTS = {
+    Type.KeyPress: 'key_press',
+    Type.KeyRelease: 'key_release',
+}
+
+
+def menu_actions(menu, path=()):
+    """Yields ('Menu/Item', action) for every action under a menu or menu bar."""
+    for action in menu.actions():
+        name = (*path, action.text().replace('&', ''))
+        if action.menu() is not None:
+            yield from menu_actions(action.menu(), name)
+        elif not action.isSeparator():
+            yield '/'.join(name), action
+
+
+class EventRecorder(QtCore.QObject):
+    """Writes the input events of a TrackEditor to a file until it is closed."""
+
+    def __init__(self, editor, path):
+        super().__init__(editor)
+        self._file = open(path, 'w')
+        self._clock = QtCore.QElapsedTimer()
+        self._clock.start()
+        self._views = {view: view.description for view in editor.findChildren(BaseView)}
+        self._write(
+            type='start', width=editor.width(), height=editor.height(),
+            track=editor._track.serialize()
+        )
+        for view in self._views:
+            view.installEventFilter(self)
+        for name, action in menu_actions(editor.menuBar()):
+            if name.startswith('File/'):
+                # file dialogs cannot be replayed
+                continue
+            action.triggered.connect(lambda checked=False, name=name: self._write(type='action', name=name))
+        editor.destroyed.connect(self._file.close)
+        QtWidgets.QApplication.instance().aboutToQuit.connect(self._file.close)
+
+    def _write(self, **record):
+        if not self._file.closed:
+            self._file.write(json.dumps({'t': self._clock.elapsed() / 1000, **record}) + '\n')
+
+    def eventFilter(self, watched, event):
+        target = self._views.get(watched)
+        if event.type() in MOUSE_EVENTS:
+            record = dict(
+                type=MOUSE_EVENTS[event.type()], target=target,
+                x=event.position().x(), y=event.position().y(),
+                buttons=event.buttons().value, modifiers=event.modifiers().value,
+            )
+            if event.type() == Type.Wheel:
+                record['delta'] = event.angleDelta().y()
+            else:
+                record['button'] = event.button().value
+            self._write(**record)
+        elif event.type() in KEY_EVENTS:
+            self._write(
+                type=KEY_EVENTS[event.type()], target=target, key=event.key(),
+                modifiers=event.modifiers().value, text=event.text()
+            )
+        return False
+
+
+def make_event(record):
+    """Rebuilds the Qt event for a recorded mouse or key event."""
+    modifiers = QtCore.Qt.KeyboardModifier(record['modifiers'])
+    if record['type'] in KEY_EVENTS.values():
+        kind = Type.KeyPress if record['type'] == 'key_press' else Type.KeyRelease
+        return QtGui.QKeyEvent(kind, record['key'], modifiers, record['text'])
+    pos = QtCore.QPointF(record['x'], record['y'])
+    buttons = QtCore.Qt.MouseButton(record['buttons'])
+    if record['type'] == 'wheel':
+        return QtGui.QWheelEvent(
+            pos, pos, QtCore.QPoint(), QtCore.QPoint(0, record['delta']), buttons, modifiers,
+            QtCore.Qt.ScrollPhase.NoScrollPhase, False
+        )
+    kind = {value: key for key, value in MOUSE_EVENTS.items()}[record['type']]
+    return QtGui.QMouseEvent(kind, pos, pos, QtCore.Qt.MouseButton(record['button']), buttons, modifiers)
+
+
+def percentiles(values):
+    if not len(values):
+        return None
+    return dict(zip(('p50', 'p95', 'p99'), np.percentile(values, (50, 95, 99)).tolist()))
+
+
+class Replay:
+    """
+    Replays a recording against editor. Every mouse press and menu action
+    starts a new edit, and time spent in hermite.optimize is charged to the
+    edit in progress.
+    """
+
+    def __init__(self, editor, records, speed=1.0):
+        self._editor = editor
+        self._records = records
+        self._speed = speed
+        self._views = {view.description: view for view in editor.findChildren(BaseView)}
+        self._actions = dict(menu_actions(editor.menuBar()))
+        self._pending = []
+        self.latency = []
+        self.handling = []
+        self.optimizing = []
+        self.frames = 0
+        for view in self._views.values():
+            view.frameSwapped.connect(self._frame)
+            if not view.isValid():
+                # no OpenGL, so select by projecting the control points
+                view.gpu_picking = False
+
+    def _frame(self):
+        now = time.perf_counter()
+        self.frames += 1
+        self.latency.extend(now - t for t in self._pending)
+        self._pending.clear()
+
+    def _optimize(self, f):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                if self.optimizing:
+                    self.optimizing[-1] += time.perf_counter() - start
+        return timed
+
+    def _dispatch(self, record):
+        if record['type'] == 'action':
+            self.optimizing.append(0.0)
+            start = time.perf_counter()
+            self._actions[record['name']].trigger()
+        else:
+            if record['type'] == 'press':
+                self.optimizing.append(0.0)
+            event = make_event(record)
+            start = time.perf_counter()
+            QtWidgets.QApplication.sendEvent(self._views[record['target']], event)
+        self.handling.append(time.perf_counter() - start)
+        self._pending.append(start)
+
+    def _next(self):
+        now = time.perf_counter() - self._start
+        while self._index < len(self._records) and self._records[self._index]['t'] / self._speed <= now:
+            self._dispatch(self._records[self._index])
+            self._index += 1
+        if self._index < len(self._records):
+            delay = (self._records[self._index]['t'] / self._speed) - (time.perf_counter() - self._start)
+            self._timer.start(max(0, int(delay * 1000)))
+        else:
+            QtCore.QTimer.singleShot(int(self._settle * 1000), self._loop.quit)
+
+    def run(self, settle=2.0):
+        # driven from a running event loop rather than processEvents() so
+        # that repaints and timers happen just as they do in the editor
+        self._settle = settle
+        self._index = 0
+        self._loop = QtCore.QEventLoop()
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(QtCore.Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._next)
+        optimize = hermite.optimize
+        hermite.optimize = self._optimize(optimize)
+        try:
+            self._start = time.perf_counter()
+            self._timer.start(0)
+            self._loop.exec()
+        finally:
+            hermite.optimize = optimize
+
+    def report(self):
+        ms = lambda values: np.array(values) * 1000
+        return {
+            'events': len(self.handling),
+            'frames': self.frames,
+            'edits': len(self.optimizing),
+            'event_to_repaint_ms': percentiles(ms(self.latency)),
+            'event_handling_ms': percentiles(ms(self.handling)),
+            'optimize_per_edit_ms': percentiles(ms(self.optimizing)),
+        }
+
+
+def replay(path, speed=1.0, settle=2.0):
+    from .__main__ import TrackEditor
+
+    lines = pathlib.Path(path).read_text().splitlines()
+    start, *records = [json.loads(line) for line in lines if line]
+    editor = TrackEditor()
+    editor.resize(start['width'], start['height'])
+    editor.show()
+    editor._track.deserialize(start['track'])
+    QtWidgets.QApplication.processEvents()
+    session = Replay(editor, records, speed)
+    session.run(settle)
+    editor.close()
+    return session.report()
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Replay a recorded editing session and report latencies.")
+    parser.add_argument('session', type=pathlib.Path, help="Session recorded with python -m editor.gui --record.")
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed relative to the recording.")
+    parser.add_argument('--settle', type=float, default=2.0, help="Seconds to keep running after the last event.")
+    parser.add_argument('-o', '--output', type=pathlib.Path, help="Write the report to a JSON file.")
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QtWidgets.QApplication(sys.argv[:1])
+    report = replay(args.session, args.speed, args.settle)
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=4))
+    print(f"{report['events']} events, {report['edits']} edits, {report['frames']} frames")
+    for name in ('event_to_repaint_ms', 'event_handling_ms', 'optimize_per_edit_ms'):
+        p = report[name]
+        if p is None:
+            print(f'{name}: no samples')
+        else:
+            print(f"{name}: p50 {p['p50']:.1f}  p95 {p['p95']:.1f}  p99 {p['p99']:.1f}")
+    if not report['frames']:
+        print("No frames were drawn. Run under xvfb-run for OpenGL.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    run()
@@ -1,42 +1,104 @@
+import hashlib
+import json
 import pathlib
 import numpy as np
 
+from PySide6 import QtCore
 from PySide6.QtOpenGL import QOpenGLShaderProgram, QOpenGLShader, QOpenGLBuffer
 import OpenGL.GL as gl
 import ctypes
 
+from ..core.journal import atomic_write
+from ..core.profile import section
+
 SHADER_PATH = pathlib.Path(__file__).parent / 'shaders'
+CACHE_PATH = pathlib.Path(QtCore.QStandardPaths.writableLocation(
+    QtCore.QStandardPaths.StandardLocation.GenericCacheLocation
+)) / 'racer-editor' / 'shaders'
 
 
 def shader_path(f):
     return str(SHADER_PATH / f)
 
 
+def driver():
+    """Vendor, renderer and version of the current OpenGL context."""
+    return b'\n'.join(gl.glGetString(name) or b'' for name in (gl.GL_VENDOR, gl.GL_RENDERER, gl.GL_VERSION))
+
+
+def program_key(files, driver):
+    """Hash of the driver and the shader sources, identifying a linked program."""
+    h = hashlib.sha256(driver)
+    for f in files:
+        source = (SHADER_PATH / f).read_bytes()
+        # lengths keep the boundaries between sources in the hash
+        h.update(len(source).to_bytes(8, 'little'))
+        h.update(source)
+    return h.hexdigest()
+
+
+def load_locations(key, introspect, cache=None):
+    """
+    Returns the variable locations of the program identified by key from
+    the cache directory, by default CACHE_PATH. If they are not cached, or
+    the cache file cannot be read, they are found with introspect() and
+    cached.
+    """
+    path = (CACHE_PATH if cache is None else pathlib.Path(cache)) / f'{key}.json'
+    try:
+        loc = json.loads(path.read_text())
+        if isinstance(loc, dict) and all(type(v) is int for v in loc.values()):
+            return loc
+    except (OSError, ValueError):
+        pass
+    loc = introspect()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(path, json.dumps(loc))
+    except OSError:
+        # the cache is only an optimisation
+        pass
+    return loc
+
+
 class ShaderProgram(QOpenGLShaderProgram):
+    """
+    Program binaries are cached by Qt, in memory and on disk, so only the
+    first program built from some sources with some driver is compiled.
+    The attribute and uniform locations are cached here alongside them.
+    Set QT_DISABLE_SHADER_DISK_CACHE=1 to always compile.
+    """
+    _locations = {}
 
     def __init__(self, vert_prog, frag_prog, geom_prog=None):
         super().__init__()
-        self.addShaderFromSourceFile(QOpenGLShader.ShaderTypeBit.Vertex, shader_path(vert_prog))
-        self.addShaderFromSourceFile(QOpenGLShader.ShaderTypeBit.Fragment, shader_path(frag_prog))
+        self.addCacheableShaderFromSourceFile(QOpenGLShader.ShaderTypeBit.Vertex, shader_path(vert_prog))
+        self.addCacheableShaderFromSourceFile(QOpenGLShader.ShaderTypeBit.Fragment, shader_path(frag_prog))
         if geom_prog is not None:
-            self.addShaderFromSourceFile(QOpenGLShader.ShaderTypeBit.Geometry, shader_path(geom_prog))
-        self.link()
-
-        # now introspect the variable names from the shaders
-        self._loc = {}
+            self.addCacheableShaderFromSourceFile(QOpenGLShader.ShaderTypeBit.Geometry, shader_path(geom_prog))
+        with section('ShaderProgram.link'):
+            self.link()
+
+        key = program_key([f for f in (vert_prog, frag_prog, geom_prog) if f is not None], driver())
+        try:
+            self._loc = self._locations[key]
+        except KeyError:
+            self._loc = self._locations[key] = load_locations(key, self._introspect)
+
+    def _introspect(self):
+        """Queries the locations of the variables in the linked program."""
+        loc = {}
         progid = self.programId()
 
         for i in range(gl.glGetProgramiv(progid, gl.GL_ACTIVE_ATTRIBUTES)):
             name, size, type_enum = gl.glGetActiveAttrib(progid, i)
-            #print(name, size)
-            loc = self.attributeLocation(name)
-            self._loc[name.decode('utf8')] = loc
+            loc[name.decode('utf8')] = self.attributeLocation(name)
 
         for i in range(gl.glGetProgramiv(progid, gl.GL_ACTIVE_UNIFORMS)):
             name, size, type_enum = gl.glGetActiveUniform(progid, i)
-            #print(name, size)
-            loc = self.uniformLocation(name)
-            self._loc[name.decode('utf8')] = loc
+            loc[name.decode('utf8')] = self.uniformLocation(name)
+
+        return loc
 
     def setUniform(self, name, value):
         loc = self._loc[name]
@@ -52,10 +114,13 @@ class ShaderProgram(QOpenGLShaderProgram):
 
     def setAttribute(self, name, buffer, type, tupleSize, stride=None, offset=0, divisor=0):
         if stride is None:
-            stride = tupleSize * 4
+            stride = buffer.stride
+        if name not in self._loc:
+            # optimised out by the linker, eg. colour inputs in the pick programs
+            return
         loc = self._loc[name]
         buffer.bind()
-        if type == gl.GL_INT:
+        if type in (gl.GL_INT, gl.GL_UNSIGNED_INT):
             gl.glVertexAttribIPointer(loc, tupleSize, type, stride, ctypes.c_void_p(offset))
         else:
             self.setAttributeBuffer(loc, type, offset, tupleSize, stride)
@@ -69,9 +134,11 @@ class Buffer(QOpenGLBuffer):
         super().__init__(QOpenGLBuffer.Type.VertexBuffer)
         self._data = data
         self._modified = True
+        self._ranges = None
         self._grown = True
         self._buf_size = 0
         self._alloc_size = alloc_size
+        self.uploaded = 0
         self.create()
         self.bind()
         self.release()
@@ -80,6 +147,11 @@ class Buffer(QOpenGLBuffer):
     def data(self):
         return self._data
 
+    @property
+    def stride(self):
+        """Bytes between rows of the data, used when an attribute has no explicit stride."""
+        return self._data.strides[0]
+
     @data.setter
     def data(self, newdata: np.ndarray):
         if newdata is not self._data:
@@ -88,15 +160,81 @@ class Buffer(QOpenGLBuffer):
             self._data = newdata
         self.modified()
 
-    def modified(self):
+    def modified(self, ranges=None):
+        """
+        Marks the data for upload on the next bind. If ranges is given, only
+        those (start, stop) rows have changed.
+        """
+        if ranges is None or not self._modified:
+            self._ranges = None if ranges is None else list(ranges)
+        elif self._ranges is not None:
+            self._ranges.extend(ranges)
         self._modified = True
 
     def bind(self):
         super().bind()
         if self._modified:
-            if self._grown:
-                self._buf_size = ((self._data.nbytes // self._alloc_size) + 1) * self._alloc_size
-                self.allocate(self._buf_size)
-                self._grown = False
-            self.write(0, self._data, self._data.nbytes)
+            with section('Buffer.upload'):
+                if self._grown:
+                    self._buf_size = ((self._data.nbytes // self._alloc_size) + 1) * self._alloc_size
+                    self.allocate(self._buf_size)
+                    self._grown = False
+                    self._ranges = None
+                if self._ranges is None:
+                    self.write(0, self._data, self._data.nbytes)
+                    self.uploaded += self._data.nbytes
+                else:
+                    stride = self.stride
+                    for start, stop in self._ranges:
+                        rows = self._data[start:stop]
+                        self.write(start * stride, rows, rows.nbytes)
+                        self.uploaded += rows.nbytes
             self._modified = False
+            self._ranges = None
+
+
+class PickBuffer:
+    """Offscreen integer framebuffer holding one object id per pixel."""
+
+    def __init__(self):
+        self._fbo = gl.glGenFramebuffers(1)
+        self._colour, self._depth = gl.glGenRenderbuffers(2)
+        self._size = (0, 0)
+        self.complete = False
+
+    def _allocate(self, w, h):
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self._colour)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_R32I, w, h)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self._depth)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_DEPTH_COMPONENT24, w, h)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_RENDERBUFFER, self._colour)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_DEPTH_ATTACHMENT, gl.GL_RENDERBUFFER, self._depth)
+        self._size = (w, h)
+        self.complete = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER) == gl.GL_FRAMEBUFFER_COMPLETE
+
+    def bind(self, w, h):
+        """Binds and clears the framebuffer. Returns False if it is incomplete and cannot be drawn to."""
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._fbo)
+        if self._size != (w, h):
+            self._allocate(w, h)
+        if not self.complete:
+            return False
+        gl.glViewport(0, 0, w, h)
+        gl.glClearBufferiv(gl.GL_COLOR, 0, np.zeros((4, ), dtype=np.int32))
+        gl.glClear(gl.GL_DEPTH_BUFFER_BIT)
+        return True
+
+    def read(self, x, y, w, h):
+        """Reads a window of ids. Rows are returned top to bottom."""
+        x0 = max(0, x)
+        y0 = max(0, self._size[1] - (y + h))
+        x1 = min(self._size[0], x + w)
+        y1 = min(self._size[1], self._size[1] - y)
+        ids = np.zeros((h, w), dtype=np.int32)
+        if x1 > x0 and y1 > y0:
+            pixels = np.empty((y1 - y0, x1 - x0), dtype=np.int32)
+            gl.glReadPixels(x0, y0, x1 - x0, y1 - y0, gl.GL_RED_INTEGER, gl.GL_INT, pixels)
+            top = self._size[1] - y1 - y
+            ids[top:top + pixels.shape[0], x0 - x:x1 - x] = pixels[::-1]
+        return ids
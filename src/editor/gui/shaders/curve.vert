@@ -7,15 +7,18 @@ in vec3 b;
 in vec2 distance;
 in int selected;
 in int next_selected;
+in uint style;
 
 uniform vec4 unselected_colour;
 uniform vec4 selected_colour;
 uniform mat4 matrix;
 uniform int interp;
 uniform int mode;
+uniform int style_colours;
 
 out vec4 colour;
 out float offset;
+flat out int pick_id;
 
 float t;
 float t2;
@@ -38,18 +41,26 @@ void calculate(int step) {
 }
 
 
+vec4 line_colour(void) {
+    if (style_colours == 0 || style == 0u) return unselected_colour;
+    // spread the styles around the hue circle
+    float h = fract(float(style) * 0.618034);
+    return vec4(clamp(abs(mod((h * 6) + vec3(0, 4, 2), 6) - 3) - 1, 0, 1), 1);
+}
+
+
 void main_line(void) {
     calculate(gl_VertexID);
     gl_Position = matrix * vec4(r, 1);
     float tc = mix(float(selected), float(next_selected), t);
-    colour = mix(unselected_colour, selected_colour, tc);
+    colour = mix(line_colour(), selected_colour, tc);
 }
 
 void main_line_d(void) {
     calculate(gl_VertexID);
     gl_Position = matrix * vec4(d, r.z, 0, 1);
     float tc = mix(float(selected), float(next_selected), t);
-    colour = mix(unselected_colour, selected_colour, tc);
+    colour = mix(line_colour(), selected_colour, tc);
 }
 
 
@@ -115,6 +126,8 @@ void height_d(void) {
 
 void main(void)
 {
+    // only meaningful for the main line, where interp equals the attribute divisor
+    pick_id = -1 - (gl_InstanceID / interp);
     switch (mode) {
         case 0:
             offset = 0;
@@ -11,6 +11,7 @@ uniform mat4 matrix;
 uniform int mode;
 
 out vec4 colour;
+flat out int pick_id;
 
 void main(void)
 {
@@ -20,4 +21,5 @@ void main(void)
       gl_Position = matrix * position;
    }
    colour = (selected == 1) ? selected_colour : unselected_colour;
+   pick_id = gl_VertexID + 1;
 }
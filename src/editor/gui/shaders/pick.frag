@@ -0,0 +1,10 @@
+#version 330
+
+flat in int pick_id;
+
+out int id;
+
+void main(void)
+{
+    id = pick_id;
+}
@@ -2,69 +2,115 @@ import numpy as np
 import OpenGL.GL as gl
 from PySide6 import QtCore
 
+from ..core import hermite
+from ..core.profile import timed
 from ..core.track import Track
+from .changes import ChangeBus, GEOMETRY, CURVE, SELECTION, STYLE, ranges_of, rows_in, rows_of
 from .shaders import ShaderProgram, Buffer
 
 
 class TrackGLSL(Track, QtCore.QObject):
     visualChanged = QtCore.Signal()
+    # the control points whose segments changed, or None for all of them
+    curveChanged = QtCore.Signal(object)
     dataChanged = QtCore.Signal()
     selectionChanged = QtCore.Signal()
+    optimized = QtCore.Signal()
+    historyChanged = QtCore.Signal()
+    # data_set() starts the optimiser timer, so loading does not block on it
+    optimize_on_load = False
 
     def __init__(self, data=None):
         QtCore.QObject.__init__(self)
         self._opt_timer = QtCore.QTimer()
         self._opt_timer.setInterval(50)
         self._opt_timer.timeout.connect(self._opt_step)
-        Track.__init__(self, data)
+        self.changes = ChangeBus()
+        self.changes.changed.connect(self._apply_changes)
+        # buffers are uploaded as GL_FLOAT, so the track must be float32
+        Track.__init__(self, data, dtype=np.float32)
         self._widgets = []
-
+        self.style_colours = False
+
+    @timed('TrackGLSL._apply_changes')
+    def _apply_changes(self, changes):
+        """Handles one frame's worth of invalidations and notifies subscribers once."""
+        if GEOMETRY in changes:
+            moved = changes[GEOMETRY]
+            self.construct(keep=True, rows=None if moved is None else rows_in(moved))
+            self.start_optimizing()
+        if GEOMETRY in changes or CURVE in changes or STYLE in changes:
+            # the control points that were edited, or None if the whole curve changed
+            edited = [changes[kind] for kind in (GEOMETRY, STYLE) if kind in changes]
+            rows = None if CURVE in changes or None in edited else np.concatenate([rows_in(r) for r in edited])
+            if hasattr(self, '_points_vbo'):
+                if rows is None or self._points_vbo.data is not self._points.array:
+                    self._points_vbo.data = self._points.array
+                else:
+                    self._points_vbo.modified(ranges_of(hermite.segments_around(rows, self._data.shape[0])))
+            self.visualChanged.emit()
+            self.curveChanged.emit(rows)
+        if SELECTION in changes:
+            self.selectionChanged.emit()
+        if GEOMETRY in changes or STYLE in changes:
+            self.dataChanged.emit()
+
+    @timed('TrackGLSL._opt_step')
     def _opt_step(self):
         self.optimize(max_opt_its=10)
-        if hasattr(self, '_trackdata_vbo'):
-            self._trackdata_vbo.data = self._data
-            self._distances_vbo.data = self._distances
-        self.visualChanged.emit()
+        self.changes.invalidate(CURVE)
         self._opt_counter += 1
         if self._opt_counter > 20:
             self._opt_timer.stop()
+            self.optimized.emit()
 
     def start_optimizing(self):
         self._opt_counter = 0
         if not self._opt_timer.isActive():
             self._opt_timer.start()
 
-    def data_modified(self):
-        self.construct(keep=True)
+    def data_modified(self, item=None):
+        self.changes.invalidate(GEOMETRY, rows_of(item, self._data.shape[0]))
+
+    def styles_modified(self, item=None):
+        self.changes.invalidate(STYLE, rows_of(item, self._styles.shape[0]))
+
+    def set_style_colours(self, enabled):
+        """Colours the main line by segment style instead of the unselected colour."""
+        self.style_colours = enabled
         self.visualChanged.emit()
-        self.start_optimizing()
-        self.dataChanged.emit()
 
     def data_set(self):
-        if hasattr(self, '_trackdata_vbo'):
-            self._trackdata_vbo.data = self._data
-            self._distances_vbo.data = self._distances
-            self._selection_vbo.data = self._selection
-        self.visualChanged.emit()
-        self.selectionChanged.emit()
+        # the arrays have been replaced, so buffers must follow them before the next paint
+        if hasattr(self, '_points_vbo'):
+            self._points_vbo.data = self._points.array
+            self._selection_vbo.data = self._selection.mask
+        self.changes.invalidate(CURVE)
+        self.changes.invalidate(SELECTION)
         self.start_optimizing()
 
     def data_moved(self):
         self.data_set()
         self.dataChanged.emit()
 
+    def history_changed(self):
+        self.historyChanged.emit()
+
     def select(self, selection, multi=False):
         super().select(selection, multi)
-        self._selection_vbo.data = self._selection
-        self.selectionChanged.emit()
+        if hasattr(self, '_selection_vbo'):
+            self._selection_vbo.data = self._selection.mask
+        self.changes.invalidate(SELECTION)
 
     def init_shaders(self):
         self._handle_prog = ShaderProgram('handle.vert', 'handle.frag')
         self._curve_prog = ShaderProgram('curve.vert', 'curve.frag')
+        self._handle_pick_prog = ShaderProgram('handle.vert', 'pick.frag')
+        self._curve_pick_prog = ShaderProgram('curve.vert', 'pick.frag')
 
-        self._trackdata_vbo = Buffer(self._data)
-        self._distances_vbo = Buffer(self._distances)
-        self._selection_vbo = Buffer(self._selection)
+        # every per-point column shares one interleaved buffer
+        self._points_vbo = Buffer(self._points.array)
+        self._selection_vbo = Buffer(self._selection.mask)
 
     def add_to_widget(self, widget):
         if not self._widgets:
@@ -74,7 +120,10 @@ class TrackGLSL(Track, QtCore.QObject):
             self._widgets.append(widget)
         else:
             raise ValueError("Cannot add to widget because it is not context sharing.")
+        self.setup_gl()
 
+    def setup_gl(self):
+        """Sets the GL state the draw methods expect in the current context."""
         gl.glEnable(gl.GL_DEPTH_TEST)
         gl.glDepthFunc(gl.GL_LEQUAL)
         gl.glEnable(gl.GL_BLEND)
@@ -84,15 +133,28 @@ class TrackGLSL(Track, QtCore.QObject):
         gl.glEnable(gl.GL_POINT_SPRITE)
         gl.glPointSize(5)
 
+    def _bind_curve(self, prog, interp):
+        prog.bind()
+        offset = self._points.offset
+        prog.setAttribute('p', self._points_vbo, gl.GL_FLOAT, 3, offset=offset('data', 0, 0), divisor=interp)
+        prog.setAttribute('m', self._points_vbo, gl.GL_FLOAT, 3, offset=offset('data', 1, 0), divisor=interp)
+        prog.setAttribute('a', self._points_vbo, gl.GL_FLOAT, 3, offset=offset('data', 2, 0), divisor=interp)
+        prog.setAttribute('b', self._points_vbo, gl.GL_FLOAT, 3, offset=offset('data', 3, 0), divisor=interp)
+        prog.setAttribute('distance', self._points_vbo, gl.GL_FLOAT, 2, offset=offset('distance'), divisor=interp)
+        prog.setAttribute('style', self._points_vbo, gl.GL_UNSIGNED_INT, 1, offset=offset('style'), divisor=interp)
+        prog.setAttribute('selected', self._selection_vbo, gl.GL_INT,1, divisor=interp)
+        prog.setAttribute('next_selected', self._selection_vbo, gl.GL_INT,1, offset=4, divisor=interp)
+
+    def _bind_handle(self, prog):
+        prog.bind()
+        offset = self._points.offset
+        prog.setAttribute('position', self._points_vbo, gl.GL_FLOAT, 3, offset=offset('data', 0, 0))
+        prog.setAttribute('distance', self._points_vbo, gl.GL_FLOAT, 1, offset=offset('distance'))
+        prog.setAttribute('selected', self._selection_vbo, gl.GL_INT, 1)
+
+    @timed('TrackGLSL.draw')
     def draw(self, mvp, interp=20, mode=0):
-        self._curve_prog.bind()
-        self._curve_prog.setAttribute('p', self._trackdata_vbo, gl.GL_FLOAT, 3, offset=0,  stride=48, divisor=interp)
-        self._curve_prog.setAttribute('m', self._trackdata_vbo, gl.GL_FLOAT, 3, offset=12,  stride=48, divisor=interp)
-        self._curve_prog.setAttribute('a', self._trackdata_vbo, gl.GL_FLOAT, 3, offset=24,  stride=48, divisor=interp)
-        self._curve_prog.setAttribute('b', self._trackdata_vbo, gl.GL_FLOAT, 3, offset=36, stride=48, divisor=interp)
-        self._curve_prog.setAttribute('distance', self._distances_vbo, gl.GL_FLOAT, 2, divisor=interp)
-        self._curve_prog.setAttribute('selected', self._selection_vbo, gl.GL_INT,1, divisor=interp)
-        self._curve_prog.setAttribute('next_selected', self._selection_vbo, gl.GL_INT,1, offset=4, divisor=interp)
+        self._bind_curve(self._curve_prog, interp)
         self._curve_prog.setUniform('unselected_colour', 'green')
         self._curve_prog.setUniform('selected_colour', 'red')
         self._curve_prog.setUniform('matrix', mvp)
@@ -110,17 +172,39 @@ class TrackGLSL(Track, QtCore.QObject):
 
         self._curve_prog.setUniform('unselected_colour', 'dimgrey')
         self._curve_prog.setUniform('selected_colour', 'orange')
+        self._curve_prog.setUniform1i('style_colours', int(self.style_colours))
         self._curve_prog.setUniform1i('mode', 0 + mode)
         gl.glLineWidth(3)
         gl.glDrawArraysInstanced(gl.GL_LINE_STRIP, 0, interp, self._data.shape[0] * interp)
 
-        self._handle_prog.bind()
-        self._handle_prog.setAttribute('position', self._trackdata_vbo, gl.GL_FLOAT, 3, stride=48)
-        self._handle_prog.setAttribute('distance', self._distances_vbo, gl.GL_FLOAT, 1, stride=8)
-        self._handle_prog.setAttribute('selected', self._selection_vbo, gl.GL_INT, 1)
+        self._bind_handle(self._handle_prog)
         self._handle_prog.setUniform('unselected_colour', 'black')
         self._handle_prog.setUniform('selected_colour', 'yellow')
         self._handle_prog.setUniform('matrix', mvp)
         self._handle_prog.setUniform1i('mode', mode)
         gl.glDrawArrays(gl.GL_POINTS, 0, self._data.shape[0])
         self._handle_prog.release()
+
+    @timed('TrackGLSL.draw_ids')
+    def draw_ids(self, mvp, interp=20, mode=0):
+        """
+        Draws the main line and the control points into an integer id buffer.
+        Control point n is written as n + 1 and segment n as -(n + 1).
+        """
+        gl.glDisable(gl.GL_BLEND)
+        gl.glDisable(gl.GL_DEPTH_TEST)
+        self._bind_curve(self._curve_pick_prog, interp)
+        self._curve_pick_prog.setUniform('matrix', mvp)
+        self._curve_pick_prog.setUniform1i('interp', interp)
+        self._curve_pick_prog.setUniform1i('mode', int(mode))
+        gl.glLineWidth(3)
+        gl.glDrawArraysInstanced(gl.GL_LINE_STRIP, 0, interp, self._data.shape[0] * interp)
+
+        # points are drawn last so they win over the line beneath them
+        self._bind_handle(self._handle_pick_prog)
+        self._handle_pick_prog.setUniform('matrix', mvp)
+        self._handle_pick_prog.setUniform1i('mode', mode)
+        gl.glDrawArrays(gl.GL_POINTS, 0, self._data.shape[0])
+        self._handle_pick_prog.release()
+        gl.glEnable(gl.GL_DEPTH_TEST)
+        gl.glEnable(gl.GL_BLEND)
@@ -1,15 +1,18 @@
 import numpy as np
-from PySide6 import QtOpenGLWidgets
+from PySide6 import QtCore, QtGui, QtOpenGLWidgets
 import OpenGL.GL as gl
 
+from ..core.profile import profiler
 from .mouse import MouseInteraction
 from .camera import Camera, LockedCamera
-from .shaders import ShaderProgram, Buffer
+from .shaders import ShaderProgram, Buffer, PickBuffer
 
 
 class BaseView(QtOpenGLWidgets.QOpenGLWidget):
     Camera = Camera
     description = "???"
+    mode = 0
+    gpu_picking = True
     _grid_data = np.array(((1, 1), (-1, 1), (1, -1), (-1, -1)), dtype=np.float32) * 2000
 
     def __init__(self, parent, track):
@@ -25,6 +28,7 @@ class BaseView(QtOpenGLWidgets.QOpenGLWidget):
         self._track.add_to_widget(self)
         self._grid = ShaderProgram('grid.vert', 'grid.frag')
         self._grid_vbo = Buffer(self._grid_data)
+        self._pick_buffer = PickBuffer()
 
     def resizeGL(self, w, h):
         self._camera.resize(w, h)
@@ -32,7 +36,7 @@ class BaseView(QtOpenGLWidgets.QOpenGLWidget):
     def draw_grid(self):
         self._grid.bind()
         self._grid.setAttribute('position', self._grid_vbo, gl.GL_FLOAT, 2)
-        self._grid.setUniform('matrix', self._camera.proj * self._camera.view)
+        self._grid.setUniform('matrix', self._camera.mvp)
         gl.glDrawArrays(gl.GL_TRIANGLE_STRIP, 0, 4)
 
     def paintGL(self):
@@ -40,10 +44,45 @@ class BaseView(QtOpenGLWidgets.QOpenGLWidget):
         gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
         self.draw_grid()
 
-    def project_track(self, scrn):
-        scrn_np = np.array(scrn.data()).reshape(4, 4)
+    def project_track(self, scrn_np):
         return (np.matmul(self._track.P, scrn_np[:3]) + scrn_np[3])[:, :2]
 
+    def pick(self, x, y, radius=25):
+        """
+        Finds the control point or segment nearest to screen position x, y
+        by rendering ids offscreen and reading back the pixels around it.
+        Without gpu_picking, or if the pick buffer cannot be rendered to,
+        finds the nearest projected control point instead.
+        Returns ('point', n), ('segment', n) or None.
+        """
+        ids = self._read_ids(x, y, radius) if self.gpu_picking else None
+        if ids is None:
+            diff = np.linalg.norm(self.project_track(self._camera.scrn_np) - (x, y), axis=1)
+            best = np.argmin(diff)
+            return ('point', best) if diff[best] < radius else None
+
+        dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        dist = np.hypot(dx, dy)
+        for kind, hits in (('point', ids > 0), ('segment', ids < 0)):
+            hits &= dist < radius
+            if np.any(hits):
+                best = np.argmin(np.where(hits, dist, np.inf))
+                return kind, abs(ids.flat[best]) - 1
+        return None
+
+    def _read_ids(self, x, y, radius):
+        self.makeCurrent()
+        ids = None
+        if self._pick_buffer.bind(self.width(), self.height()):
+            self._track.draw_ids(self._camera.mvp, mode=self.mode)
+            ids = self._pick_buffer.read(x - radius, y - radius, (2 * radius) + 1, (2 * radius) + 1)
+        else:
+            # eg. no integer renderbuffers, so don't try again
+            self.gpu_picking = False
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.defaultFramebufferObject())
+        self.doneCurrent()
+        return ids
+
     def wheelEvent(self, event):
         if not self._interaction:
             self._camera.zoom(event.angleDelta().y() * 0.01)
@@ -69,29 +108,65 @@ class BaseView(QtOpenGLWidgets.QOpenGLWidget):
         self._track.P[self._track.selected, :2] += (x, y)
 
     def reset_view_rotation(self):
-        self._camera._rotation = 0
-        self._camera._pitch = 0
-        self.update()
+        self._camera.reset_rotation()
 
 class View3D(BaseView):
     description = "XY"
 
+    def __init__(self, parent, track):
+        super().__init__(parent, track)
+        # the overlay is refreshed even when nothing else repaints
+        self._overlay_timer = QtCore.QTimer(self)
+        self._overlay_timer.setInterval(500)
+        self._overlay_timer.timeout.connect(self.update)
+
     def paintGL(self):
         super().paintGL()
-        self._track.draw(self._camera.proj * self._camera.view, mode=0)
+        self._track.draw(self._camera.mvp, mode=self.mode)
+        if self._overlay_timer.isActive():
+            self.draw_overlay()
+
+    def set_overlay(self, enabled):
+        """Shows the profiler's timings over the view, enabling the profiler."""
+        if enabled:
+            profiler.enabled = True
+            self._overlay_timer.start()
+        else:
+            self._overlay_timer.stop()
+        self.update()
+
+    def draw_overlay(self):
+        painter = QtGui.QPainter(self)
+        painter.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.SystemFont.FixedFont))
+        line = painter.fontMetrics().height()
+        bars = 8 + (60 * painter.fontMetrics().horizontalAdvance(' '))
+        y = line
+        for name, h in sorted(profiler.histograms.items()):
+            p50, p95 = h.percentiles((50, 95)) * 1000
+            painter.setPen(QtGui.QColor('white'))
+            painter.drawText(8, y, f'{name:<28} {h.count:>6} {p50:8.2f} {p95:8.2f} ms')
+            # log scale histogram from 10us to 10s
+            counts = h.counts()
+            for i, c in enumerate(counts):
+                height = int(line * c / max(1, counts.max()))
+                painter.fillRect(bars + (i * 3), y - height, 2, height, QtGui.QColor('orange'))
+            y += line
+        painter.end()
+        # QPainter leaves its own GL state behind
+        self._track.setup_gl()
 
 
 class View1D(BaseView):
     Camera = LockedCamera
     description = "Z"
+    mode = 4
     _grid_data = np.array(((10, 1), (0, 1), (10, -1), (0, -1)), dtype=np.float32) * 2000
 
     def paintGL(self):
         super().paintGL()
-        self._track.draw(self._camera.proj * self._camera.view, mode=4)
+        self._track.draw(self._camera.mvp, mode=self.mode)
 
-    def project_track(self, scrn):
-        scrn_np = np.array(scrn.data()).reshape(4, 4)
+    def project_track(self, scrn_np):
         return (
                        np.matmul(self._track._distances[:, 0:1], scrn_np[0:1])
                        + np.matmul(self._track.P[:, 2:], scrn_np[1:2]) + scrn_np[3]
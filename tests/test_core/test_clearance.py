@@ -0,0 +1,66 @@
+import math
+import numpy as np
+
+from editor.core.clearance import ClearanceChecker, candidate_pairs, check
+from editor.core.track import Track
+
+
+def figure_eight(bridge=0):
+    rads = [math.radians(d) for d in range(10, 370, 20)]
+    return [(300 * math.sin(r), 150 * math.sin(2 * r), bridge * math.cos(r)) for r in rads]
+
+
+def test_candidate_pairs():
+    mins = np.array([[0, 0], [5, 5], [20, 0], [1, 1]], dtype=float)
+    maxs = mins + 2
+    a, b = candidate_pairs(mins, maxs, np.arange(4))
+    assert sorted(zip(a.tolist(), b.tolist())) == [(0, 3), (3, 0)]
+
+
+def test_circle_is_clear():
+    assert check(Track()) == {}
+
+
+def test_figure_eight_crosses():
+    conflicts = check(Track(figure_eight()))
+    assert any(crossing for dist, crossing in conflicts.values())
+
+
+def test_bridge_is_clear():
+    assert check(Track(figure_eight(bridge=30))) == {}
+
+
+def test_clearance():
+    # two concentric arcs joined at the ends, 8 units apart
+    outer = [(200 * math.sin(math.radians(d)), 200 * math.cos(math.radians(d))) for d in range(0, 181, 20)]
+    inner = [(192 * math.sin(math.radians(d)), 192 * math.cos(math.radians(d))) for d in range(180, -1, -20)]
+    conflicts = check(Track(outer + inner), clearance=12)
+    assert conflicts
+    assert not any(crossing for dist, crossing in conflicts.values())
+    assert check(Track(outer + inner), clearance=4) == {}
+
+
+def test_incremental():
+    track = Track()
+    checker = ClearanceChecker()
+    assert checker.update(track) == track.P.shape[0]
+    assert checker.update(track) == 0
+    track.P[0] = track.P[5] + (5, 0, 0)
+    track.construct()
+    assert checker.update(track) < track.P.shape[0]
+    assert checker.conflicts == check(track)
+    assert len(checker.segments)
+
+
+def test_incremental_rows():
+    track = Track(figure_eight())
+    checker = ClearanceChecker()
+    checker.update(track)
+    conflicts = dict(checker.conflicts)
+    a, b = next(iter(conflicts))
+    track.P[a, 2] += 30
+    track.P[(a + 1) % track.P.shape[0], 2] += 30
+    track.construct()
+    assert checker.update(track, rows=[a, a + 1]) == 3
+    assert checker.conflicts == check(track)
+    assert checker.conflicts != conflicts
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from editor.core.columns import ColumnStore
+
+
+@pytest.fixture
+def store():
+    s = ColumnStore([('data', np.float32, (4, 3)), ('style', np.uint32, ())], 4)
+    s['style'][:] = np.arange(4)
+    return s
+
+
+def test_layout(store):
+    assert store.stride == 52
+    assert store.offset('data') == 0
+    assert store.offset('data', 1, 0) == 12
+    assert store.offset('data', 3, 2) == 44
+    assert store.offset('style') == 48
+
+
+def test_views(store):
+    store['data'][2, 0] = 5
+    assert np.all(store.array['data'][2, 0] == 5)
+
+
+def test_insert_delete(store):
+    rows = store.rows([1])
+    rows['data'] = 7
+    store.insert([2], rows)
+    assert store['style'].tolist() == [0, 1, 1, 2, 3]
+    assert np.all(store['data'][2] == 7)
+    store.delete([0, 3])
+    assert store['style'].tolist() == [1, 1, 3]
+
+
+def test_snapshot(store):
+    snapshot = store.snapshot()
+    store.delete([0])
+    store.restore(snapshot)
+    assert store['style'].tolist() == [0, 1, 2, 3]
+
+
+def test_add_column(store):
+    store.add_column('width', np.float32, fill=2)
+    assert store.columns == ('data', 'style', 'width')
+    assert store.offset('width') == 52
+    assert store['style'].tolist() == [0, 1, 2, 3]
+    assert np.all(store['width'] == 2)
+    with pytest.raises(ValueError):
+        store.add_column('width', np.float32)
+
+
+def test_resize_keeps_fill(store):
+    store.add_column('width', np.float32, fill=8)
+    store.resize(3)
+    assert np.all(store['width'] == 8)
+    assert not np.any(store['style'])
+
+
+def test_restore_before_add_column(store):
+    snapshot = store.snapshot()
+    store.delete([0])
+    store.add_column('width', np.float32, fill=2)
+    store.restore(snapshot)
+    assert store.columns == ('data', 'style', 'width')
+    assert store['style'].tolist() == [0, 1, 2, 3]
+    assert np.all(store['width'] == 2)
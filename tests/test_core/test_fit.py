@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from editor.core.fit import GridIndex, HermiteFit
+from editor.core.track import TrackException
+
+
+def wobbly(n=20000):
+    t = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    r = 400 + (60 * np.sin(5 * t))
+    return np.stack((r * np.cos(t), r * np.sin(t), 10 * np.sin(3 * t)), axis=1)
+
+
+def test_grid_index():
+    rng = np.random.default_rng(1)
+    points = rng.random((2000, 3)) * 100
+    queries = (rng.random((500, 3)) * 300) - 100
+    index, dist = GridIndex(points, 3.0).nearest(queries)
+    brute = np.linalg.norm(queries[:, np.newaxis] - points[np.newaxis], axis=2)
+    assert np.array_equal(index, np.argmin(brute, axis=1))
+    assert np.allclose(dist, np.min(brute, axis=1))
+
+
+@pytest.mark.parametrize('tolerance', [0.1, 1.0])
+def test_fit_within_tolerance(tolerance):
+    reference = wobbly()
+    fit = HermiteFit(reference, tolerance)
+    assert fit.fit()
+    assert fit.max_error <= tolerance
+    assert fit.segment_errors.shape == (fit.points.shape[0], )
+    assert np.max(fit.segment_errors) == fit.max_error
+
+
+def test_relax_reduces_error():
+    fit = HermiteFit(wobbly(), 0.5)
+    before = fit.rms_error
+    fit.relax()
+    assert fit.rms_error < before
+
+
+def test_subdivide_and_restore():
+    fit = HermiteFit(wobbly(), 0.01)
+    snapshot = fit.snapshot()
+    n = fit.points.shape[0]
+    assert fit.subdivide(limit=3) == 3
+    assert fit.points.shape[0] == n + 3
+    fit.restore(snapshot)
+    assert fit.points.shape[0] == n
+
+
+def test_too_few_points():
+    with pytest.raises(TrackException):
+        HermiteFit(np.zeros((10, 3)))
@@ -81,3 +81,50 @@ def test_hermite_construct_shapes(p0):
     assert opt_b.shape == p0.shape
     assert opt_b.shape == p0.shape
     assert opt_lengths.shape == lengths.shape
+
+
+def optimize_its(p0, max_opt_its=1000):
+    m0, a, b, tangents, lengths = hermite.construct(p0)
+    return hermite.optimize(p0, tangents, lengths, max_opt_its, return_its=True)[-1]
+
+
+def test_optimize_converges(p0):
+    # the unit fixtures are too tight for the solver, so scale them up to track size
+    its = optimize_its(p0 * 100)
+    assert its < 1000
+    if p0.shape[1] == 3:
+        # 3D tracks take no more iterations than their flat projection
+        assert its <= optimize_its(p0[:, :2] * 100)
+
+
+def test_optimize_hilly_converges():
+    rads = ([math.radians(d) for d in range(0, 180, 15)] +
+            [math.radians(d) for d in range(180, 360, 45)])
+    flat = np.array([(100 * math.sin(r), 100 * math.cos(r), 0) for r in rads], dtype=float)
+    hilly = flat.copy()
+    hilly[:, 2] = 20 * np.sin(3 * np.array(rads))
+    flat_its = optimize_its(flat)
+    assert optimize_its(hilly) < flat_its * 1.5
+
+    m0, a, b, tangents, lengths = hermite.optimize(hilly, *hermite.construct(hilly)[3:], 1000)
+    p, dp, ddp = hermite.eval(hilly, m0, a, b, lengths, steps=[0, 1])
+    assert np.sum(np.linalg.norm(hermite.discontinuity_vectors(dp, ddp), axis=1)) < 1e-9
+
+
+def test_optimize_float32_stops():
+    # float32 cannot reach the float64 threshold on long tracks, so it must stop once the error stalls
+    r = np.linspace(0, 2 * np.pi, 1000, endpoint=False)
+    p = np.stack((1600 * np.sin(r), 1600 * np.cos(r), 20 * np.sin(5 * r)), axis=1).astype(np.float32)
+    assert optimize_its(p) < 100
+
+
+def test_rotate_vectors_axis():
+    v = np.array([[1, 0, 0], [0, 1, 0]], dtype=float)
+    r = hermite.rotate_vectors_axis(v, np.array([[0, 0, math.pi / 2], [0, 0, 0]]))
+    assert np.allclose(r, [[0, 1, 0], [0, 1, 0]])
+    # rotating about z matches the 2D rotation
+    angles = np.array([0.3, -0.2])
+    assert np.allclose(
+        hermite.rotate_vectors_axis(v, np.array([[0, 0, -0.3], [0, 0, 0.2]])),
+        hermite.rotate_vectors_3d(v, angles)
+    )
@@ -0,0 +1,159 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from editor.core.importer import Decimator, douglas_peucker, import_points, read_gpx, read_svg, svg_path_points
+from editor.core.track import TrackException
+
+
+def circle(n, r=500):
+    t = np.linspace(0, 2 * np.pi, n)
+    return np.stack((r * np.cos(t), r * np.sin(t), 10 * np.sin(3 * t)), axis=1)
+
+
+def polyline_error(samples, points):
+    """Largest distance from any sample to the closed polyline through points."""
+    a = points
+    b = np.roll(points, -1, axis=0)
+    ab = b - a
+    t = np.einsum('sij,ij->si', samples[:, np.newaxis] - a, ab) / np.einsum('ij,ij->i', ab, ab)
+    closest = a + (np.clip(t, 0, 1)[:, :, np.newaxis] * ab)
+    return np.max(np.min(np.linalg.norm(samples[:, np.newaxis] - closest, axis=2), axis=1))
+
+
+def test_douglas_peucker_line():
+    points = np.zeros((10, 3))
+    points[:, 0] = np.arange(10)
+    points[5, 1] = 0.5
+    assert douglas_peucker(points, 1.0).tolist() == [0, 9]
+    assert douglas_peucker(points, 0.1).tolist() == [0, 4, 5, 6, 9]
+
+
+def test_decimator_within_tolerance():
+    samples = circle(20000)
+    d = Decimator(1.0, window=512)
+    points = np.concatenate([d.feed(chunk) for chunk in np.array_split(samples, 37)] + [d.finish()])
+    assert d.samples == 20000
+    assert d._buffer.shape[0] == 0
+    assert polyline_error(samples[::7], points) <= 1.0 + 1e-9
+    assert len(points) < 200
+
+
+def test_import_csv(tmp_path):
+    samples = circle(5000)
+    path = tmp_path / 'line.csv'
+    with open(path, 'w') as f:
+        f.write('x,y,z\n')
+        np.savetxt(f, samples, delimiter=',')
+    points = import_points(path, tolerance=0.5)
+    assert points.shape[1] == 3
+    # the closing sample duplicates the first
+    assert not np.allclose(points[-1], points[0])
+    assert polyline_error(samples[::5], points) <= 0.5 + 1e-9
+
+
+def test_import_gpx(tmp_path):
+    path = tmp_path / 'line.gpx'
+    angles = np.linspace(0, 2 * np.pi, 200)
+    path.write_text(
+        '<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>'
+        + ''.join(f'<trkpt lat="{51 + 0.001 * np.sin(a)}" lon="{0.0015 * np.cos(a)}"><ele>5</ele></trkpt>' for a in angles)
+        + '</trkseg></trk></gpx>'
+    )
+    points = import_points(path)
+    # about 100m radius east-west and 111m north-south
+    assert np.ptp(points[:, 0]) == pytest.approx(2 * 6371000 * np.radians(0.0015) * np.cos(np.radians(51)), rel=1e-2)
+    assert np.ptp(points[:, 1]) == pytest.approx(2 * 6371000 * np.radians(0.001), rel=1e-2)
+    assert np.all(points[:, 2] == 5)
+
+
+def test_import_gpx_waypoints(tmp_path):
+    path = tmp_path / 'waypoints.gpx'
+    path.write_text(
+        '<gpx xmlns="http://www.topografix.com/GPX/1/1">'
+        '<wpt lat="52.2" lon="1.0"><ele>40</ele><name>Car park</name></wpt>'
+        '<trk><trkseg>'
+        + ''.join(f'<trkpt lat="{51 + 0.0001 * n}" lon="0"><ele>5</ele></trkpt>' for n in range(4))
+        + '</trkseg></trk>'
+        '<wpt lat="51.0002" lon="0.0001"><name>Pits</name></wpt>'
+        '</gpx>'
+    )
+    points = np.concatenate(list(read_gpx(path)))
+    assert points.shape == (4, 3)
+    # projected about the first track point
+    assert np.allclose(points[:, 0], 0)
+    assert np.allclose(points[:, 1], 6371000 * np.radians(0.0001) * np.arange(4))
+    assert np.all(points[:, 2] == 5)
+
+
+def test_import_gpx_fallback(tmp_path):
+    path = tmp_path / 'route.gpx'
+    path.write_text(
+        '<gpx xmlns="http://www.topografix.com/GPX/1/1">'
+        '<wpt lat="52.2" lon="1.0"/>'
+        '<rte><rtept lat="51" lon="0"/><rtept lat="51.001" lon="0"/></rte>'
+        '</gpx>'
+    )
+    points = np.concatenate(list(read_gpx(path)))
+    assert points.shape == (2, 3)
+    assert np.allclose(points[0], 0)
+    path.write_text('<gpx><wpt lat="51" lon="0"/><wpt lat="51" lon="0.001"/><wpt lat="51.001" lon="0"/></gpx>')
+    assert np.concatenate(list(read_gpx(path))).shape == (3, 3)
+
+
+def test_svg_path():
+    points = np.array(list(svg_path_points('M 0 0 l 10 0 0 10 H 0 z')))
+    assert points.tolist() == [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+    curve = np.array(list(svg_path_points('M0,0 C 0,10 10,10 10,0', steps=4)))
+    assert curve[-1].tolist() == [10, 0]
+    assert curve[2, 1] == pytest.approx(7.5)
+    with pytest.raises(ValueError):
+        list(svg_path_points('M 0 0 A 5 5 0 0 1 10 0'))
+
+
+def test_import_too_few(tmp_path):
+    path = tmp_path / 'line.csv'
+    path.write_text('0 0\n1 0\n2 0\n')
+    with pytest.raises(TrackException):
+        import_points(path)
+
+
+def write_gpx(path, n):
+    with open(path, 'w') as f:
+        f.write('<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>\n')
+        for i in range(n):
+            f.write(f'<trkpt lat="{51 + i * 1e-6}" lon="{i * 1e-6}"><ele>{i % 50}</ele></trkpt>\n')
+        f.write('</trkseg></trk></gpx>\n')
+
+
+def write_svg(path, n):
+    with open(path, 'w') as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg"><g>\n')
+        for i in range(n):
+            f.write(f'<rect x="{i}" y="0" width="1" height="1"/>\n')
+            if i % 10 == 0:
+                f.write(f'<path d="M {i} 0 L {i} 1"/>\n')
+        f.write('</g></svg>\n')
+
+
+def peak_memory(reader, path):
+    # the first read allocates caches which would count against the small input
+    for chunk in reader(path, chunk_size=256):
+        pass
+    tracemalloc.start()
+    try:
+        for chunk in reader(path, chunk_size=256):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize('write, reader, n', [(write_gpx, read_gpx, 1000), (write_svg, read_svg, 2000)])
+def test_xml_memory_bounded(tmp_path, write, reader, n):
+    small, large = tmp_path / 'small.xml', tmp_path / 'large.xml'
+    write(small, n)
+    write(large, n * 10)
+    # ten times the input must not use noticeably more memory
+    assert peak_memory(reader, large) < peak_memory(reader, small) + 100000
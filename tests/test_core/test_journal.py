@@ -0,0 +1,89 @@
+import json
+
+import numpy as np
+import pytest
+
+from editor.core.journal import Journal, STATE, apply_splice, atomic_write, read, splice, state_of
+from editor.core.track import Track
+
+
+def states(*lengths):
+    rng = np.random.default_rng(0)
+    result = []
+    for n in lengths:
+        state = np.zeros((n, ), dtype=STATE)
+        state['position'] = rng.random((n, 3))
+        result.append(state)
+    return result
+
+
+@pytest.mark.parametrize('edit', [
+    lambda s: s,
+    lambda s: np.delete(s, [3, 4]),
+    lambda s: np.insert(s, 5, s[2]),
+    lambda s: np.concatenate((s[:0], s[1:])),
+    lambda s: np.concatenate((s, s[:2])),
+])
+def test_splice(edit):
+    old, = states(10)
+    new = edit(old.copy())
+    change = splice(old, new)
+    if change is None:
+        assert np.array_equal(old, new)
+    else:
+        assert np.array_equal(apply_splice(old, *change), new)
+
+
+def test_splice_is_minimal():
+    old, = states(10)
+    new = old.copy()
+    new['style'][[3, 6]] = 1
+    assert splice(old, new)[:2] == (3, 4)
+
+
+def test_journal_round_trip(tmp_path):
+    path = tmp_path / 'journal.bin'
+    t = Track()
+    journal = Journal(path, compact_every=3)
+    t.history_changed = lambda: journal.record(state_of(t))
+    for n in range(5):
+        t.select([n])
+        t.add_after()
+    t.select([0])
+    t.delete()
+    t.undo()
+    journal.flush()
+    assert np.array_equal(read(path), state_of(t))
+    journal.close(discard=False)
+    assert path.exists()
+
+
+def test_journal_torn_tail(tmp_path):
+    path = tmp_path / 'journal.bin'
+    a, b = states(10, 11)
+    journal = Journal(path)
+    journal.record(a)
+    journal.record(b)
+    journal.close(discard=False)
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+    assert np.array_equal(read(path), a)
+
+
+def test_journal_reset(tmp_path):
+    path = tmp_path / 'journal.bin'
+    a, = states(10)
+    journal = Journal(path)
+    journal.record(a)
+    journal.reset()
+    journal.flush()
+    assert read(path) is None
+    journal.close()
+
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / 'track.json'
+    t = Track()
+    atomic_write(path, t.serialize())
+    assert len(json.loads(path.read_text())) == 10
+    assert list(tmp_path.iterdir()) == [path]
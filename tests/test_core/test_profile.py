@@ -0,0 +1,71 @@
+import json
+
+from editor.core.profile import Histogram, Profiler, profiler
+from editor.core.track import Track
+
+
+def test_histogram_rolls():
+    h = Histogram(size=4)
+    for d in range(6):
+        h.add(d)
+    assert h.count == 6
+    assert h.total == 15
+    assert len(h) == 4
+    assert h.samples.tolist() == [2, 3, 4, 5]
+    assert h.percentiles((0, 100)).tolist() == [2, 5]
+    assert h.counts([0, 3, 6]).tolist() == [1, 3]
+
+
+def test_disabled_records_nothing():
+    p = Profiler()
+    f = p.timed('f')(lambda x: x * 2)
+    with p.section('block'):
+        assert f(2) == 4
+    assert not p.histograms
+    assert not p.trace
+
+
+def test_sections_and_trace(tmp_path):
+    p = Profiler()
+    p.enabled = True
+    f = p.timed('f')(lambda x: x * 2)
+    with p.section('block'):
+        f(1)
+        f(2)
+    assert p.histograms['f'].count == 2
+    assert p.histograms['block'].count == 1
+    assert set(p.summary()) == {'f', 'block'}
+    p.dump_trace(tmp_path / 'trace.json')
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert [e['name'] for e in events] == ['f', 'f', 'block']
+    block = events[2]
+    assert all(block['ts'] <= e['ts'] and e['ts'] + e['dur'] <= block['ts'] + block['dur'] for e in events[:2])
+
+
+def test_timed_exception():
+    p = Profiler()
+    p.enabled = True
+
+    @p.timed()
+    def fails():
+        raise ValueError
+
+    try:
+        fails()
+    except ValueError:
+        pass
+    assert p.histograms['test_timed_exception.<locals>.fails'].count == 1
+
+
+def test_hooks():
+    t = Track()
+    profiler.clear()
+    profiler.enabled = True
+    try:
+        t.construct()
+        t.optimize()
+    finally:
+        profiler.enabled = False
+    assert profiler.histograms['Track.construct'].count == 1
+    assert profiler.histograms['hermite.optimize'].count == 1
+    profiler.clear()
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from editor.core.selection import Selection
+
+
+def reference(mask):
+    m = np.append(mask, mask[0])
+    return (
+        np.where(m[:-1])[0],
+        np.where(m[:-1] & m[1:])[0],
+        np.where(m[:-1] & m[1:] & np.roll(m[:-1], 1))[0],
+    )
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_index_sets(seed):
+    rng = np.random.default_rng(seed)
+    mask = rng.integers(0, 2, 30).astype(np.int32)
+    s = Selection(30)
+    s.select(np.flatnonzero(mask))
+    points, segments, inner = reference(mask)
+    assert np.array_equal(s.points, points)
+    assert np.array_equal(s.segments, segments)
+    assert np.array_equal(s.inner, inner)
+    runs = np.zeros(30, dtype=np.int32)
+    for start, stop in s.runs:
+        runs[np.arange(start, stop) % 30] += 1
+    assert np.array_equal(runs, mask)
+
+
+def test_cache():
+    s = Selection(10)
+    s.select([1, 2])
+    assert s.points is s.points
+    with pytest.raises(ValueError):
+        s.points[0] = 5
+    s.select([3], multi=True)
+    assert s.points.tolist() == [1, 2, 3]
+
+
+def test_select_range():
+    s = Selection(10)
+    s.select_range(8, 1)
+    assert s.points.tolist() == [0, 1, 8, 9]
+    assert s.runs == [(8, 12)]
+    assert s.mask[-1] == 1
+    s.select_range(3, 4, multi=True)
+    assert s.runs == [(3, 5), (8, 12)]
+
+
+def test_all_none():
+    s = Selection(5)
+    s.select(None)
+    assert s.runs == [(0, 5)]
+    s.select(slice(0, 0))
+    assert s.runs == []
+    assert len(s.points) == 0
+
+
+def test_insert_delete():
+    s = Selection(5)
+    s.select([0, 1])
+    s.insert([1])
+    assert s.points.tolist() == [0, 1, 2]
+    assert len(s) == 6
+    s.delete([0])
+    assert s.points.tolist() == [0, 1]
+    assert s.mask[-1] == 1
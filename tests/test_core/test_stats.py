@@ -0,0 +1,97 @@
+import math
+
+import pytest
+import numpy as np
+
+from editor.core import hermite
+from editor.core.stats import SegmentTree, TrackStats
+from editor.core.track import Track
+
+
+@pytest.fixture
+def track():
+    t = Track()
+    t.P[:, 2] = np.linspace(0, 20, t.P.shape[0])
+    t.construct()
+    t.optimize()
+    return t
+
+
+@pytest.fixture
+def stats(track):
+    s = TrackStats()
+    s.update(track)
+    return s
+
+
+def test_segment_tree():
+    values = np.random.default_rng(0).random((13, 2))
+    tree = SegmentTree([(np.add, 0.0), (np.maximum, -np.inf)], 13)
+    tree.build(values)
+    assert np.allclose(tree.root, (values[:, 0].sum(), values[:, 1].max()))
+    values[[2, 11]] = 5
+    tree.set([2, 11], values[[2, 11]])
+    assert np.allclose(tree.root, (values[:, 0].sum(), values[:, 1].max()))
+    assert np.allclose(tree.query(3, 9), (values[3:9, 0].sum(), values[3:9, 1].max()))
+
+
+def test_length(track, stats):
+    assert abs(stats.length - track.total_length) < 0.01
+    assert stats.style_lengths == pytest.approx({0: track.total_length}, abs=0.01)
+
+
+def test_radius():
+    # the default track is a flat circle 1000 units around
+    stats = TrackStats()
+    stats.update(Track())
+    assert stats.min_radius == pytest.approx(1000 / (2 * np.pi), rel=0.05)
+    assert stats.max_radius == pytest.approx(1000 / (2 * np.pi), rel=0.05)
+    assert stats.min_radius <= stats.max_radius
+
+
+def test_gradient(stats):
+    assert stats.max_gradient > 0
+
+
+def test_incremental(track, stats):
+    assert stats.update(track) == 0
+    track.P[3, :2] += 10
+    track.S[4] = 2
+    track.construct()
+    assert 0 < stats.update(track) < track.P.shape[0]
+    fresh = TrackStats()
+    fresh.update(track)
+    for name in ('length', 'min_radius', 'max_radius', 'max_gradient', 'residual'):
+        assert getattr(stats, name) == pytest.approx(getattr(fresh, name))
+    assert stats.style_lengths == pytest.approx(fresh.style_lengths)
+    assert 2 in stats.style_lengths
+
+
+def test_incremental_rows(track, stats):
+    track.P[3, :2] += 10
+    track.construct()
+    # only the rows given are checked, so the edit is missed without them
+    assert stats.update(track, rows=[7]) == 0
+    assert stats.update(track, rows=[3]) == 2
+    fresh = TrackStats()
+    fresh.update(track)
+    assert stats.residual == pytest.approx(fresh.residual)
+    assert stats.min_radius == pytest.approx(fresh.min_radius)
+
+
+def test_resize(track, stats):
+    track.select([0, 1])
+    track.subdivide()
+    assert stats.update(track) == track.P.shape[0]
+
+
+def test_residual_sign_flip():
+    # a figure eight with control points where the curvature changes sign
+    rads = [math.radians(d) for d in range(0, 360, 30)]
+    t = Track([(300 * math.sin(r), 150 * math.sin(2 * r), 0) for r in rads])
+    p, dp, ddp = hermite.eval(t.P, t.M, t.A, t.B, t._len, steps=16)
+    c = hermite.curvature(dp, ddp)
+    assert np.any(np.sign(np.roll(c[:, -1], 1)) != np.sign(c[:, 0]))
+    stats = TrackStats()
+    stats.update(t)
+    assert stats.residual == pytest.approx(np.sum(np.abs(hermite.discontinuity(dp, ddp))), rel=1e-5)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from editor.core.styles import StyleRuns
+from editor.core.track import Track, TrackException
+
+
+def test_runs():
+    runs = StyleRuns(np.array([3, 3, 1, 1, 1, 0], dtype=np.uint32))
+    assert list(runs) == [(0, 2, 3), (2, 5, 1), (5, 6, 0)]
+    assert runs.run_of([0, 1, 2, 4, 5]).tolist() == [0, 0, 1, 1, 2]
+
+
+def test_runs_follow_edits():
+    t = Track()
+    t.S[2:5] = 1
+    assert list(t.style_runs) == [(0, 2, 0), (2, 5, 1), (5, 10, 0)]
+    t.select([3])
+    t.add_after()
+    assert list(t.style_runs) == [(0, 2, 0), (2, 6, 1), (6, 11, 0)]
+    t.select([0])
+    t.delete()
+    assert list(t.style_runs) == [(0, 1, 0), (1, 5, 1), (5, 10, 0)]
+    t.undo()
+    assert list(t.style_runs) == [(0, 2, 0), (2, 6, 1), (6, 11, 0)]
+
+
+def test_style_at():
+    t = Track()
+    t.set_style(2, 3, 6)
+    d = t._distances
+    assert t.style_at(d[3, 0] + 1) == 2
+    assert t.style_at(d[5, 1] - 1) == 2
+    assert t.style_at(d[6, 0] + 1) == 0
+    assert t.style_at(t.total_length + d[4, 0]) == 2
+    samples = np.linspace(0, t.total_length, 1000, endpoint=False)
+    segments = np.searchsorted(d[:, 1], samples, side='right')
+    assert np.array_equal(t.style_at(samples), t._styles[segments])
+
+
+def test_set_style_between():
+    t = Track()
+    d = t._distances
+    t.set_style_between(4, d[2, 0], d[7, 0])
+    assert t._styles.tolist() == [0, 0, 4, 4, 4, 4, 4, 0, 0, 0]
+    t.undo()
+    assert not np.any(t._styles)
+    with pytest.raises(TrackException):
+        t.set_style_between(4, d[2, 0] + 1, d[3, 0])
+    with pytest.raises(TrackException):
+        t.set_style(1, 4, 4)
+
+
+def test_set_selected_style():
+    t = Track()
+    with pytest.raises(TrackException):
+        t.set_selected_style(3)
+    t.select([1, 5])
+    t.set_selected_style(3)
+    assert t._styles.tolist() == [0, 3, 0, 0, 0, 3, 0, 0, 0, 0]
+    t.undo()
+    assert not np.any(t._styles)
+    t.redo()
+    assert t._styles.tolist() == [0, 3, 0, 0, 0, 3, 0, 0, 0, 0]
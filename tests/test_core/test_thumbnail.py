@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from editor.core import thumbnail as th
+from editor.core.track import Track
+
+
+@pytest.fixture
+def track_file(tmp_path):
+    t = Track()
+    a = np.linspace(0, 2 * np.pi, 12, endpoint=False)
+    t.set_data(np.stack((np.cos(a) * 500, np.sin(a) * 200, np.sin(a) * 20), axis=1), np.arange(12) % 2)
+    path = tmp_path / 'track.json'
+    path.write_text(t.serialize())
+    return path
+
+
+def test_render():
+    image = th.render(Track(), width=64)
+    assert image.shape == (80, 64, 4)
+    top, profile = image[:64], image[64:]
+    drawn = np.flatnonzero(top[..., 3].any(axis=0))
+    # the default circle fills the width, less the margins and line width
+    assert drawn[0] <= 3 and drawn[-1] >= 60
+    assert not top[32, 32, 3]
+    # a flat track has a flat profile along the bottom
+    assert profile[-2:, :, 3].all() and not profile[:-2, :, 3].any()
+
+
+def test_header(track_file):
+    t = Track()
+    t.deserialize(track_file.read_text())
+    info = th.header(t)
+    assert info['points'] == 12
+    assert info['climb'] == pytest.approx(40, rel=1e-3)
+    assert info['length'] == pytest.approx(t.total_length)
+
+
+def test_content_key():
+    assert th.content_key(b'a', 128) == th.content_key(b'a', 128)
+    assert th.content_key(b'a', 128) != th.content_key(b'b', 128)
+    assert th.content_key(b'a', 128) != th.content_key(b'a', 64)
+
+
+def test_cache(track_file, tmp_path, monkeypatch):
+    cache = tmp_path / 'cache'
+    image, info = th.thumbnail(track_file, cache, 64)
+    assert len(list(cache.iterdir())) == 1
+
+    def fail(*args):
+        raise AssertionError("rendered despite cache")
+
+    monkeypatch.setattr(th, 'render', fail)
+    cached, cached_info = th.thumbnail(track_file, cache, 64)
+    assert np.array_equal(cached, image)
+    assert cached_info == info
+
+    # an edited file misses the cache
+    track_file.write_text(track_file.read_text().replace('500.0', '501.0', 1))
+    with pytest.raises(AssertionError):
+        th.thumbnail(track_file, cache, 64)
+
+
+def test_corrupt_cache(track_file, tmp_path):
+    cache = tmp_path / 'cache'
+    image, info = th.thumbnail(track_file, cache, 64)
+    path, = cache.iterdir()
+    path.write_bytes(b'junk')
+    assert np.array_equal(th.thumbnail(track_file, cache, 64)[0], image)
@@ -81,6 +81,34 @@ def test_styles(track):
     assert track.S[1] == 1
 
 
+def test_add_column(track):
+    track.add_column('width', np.float32, fill=8)
+    track._points['width'][0] = 12
+    track.select([0])
+    track.add_after()
+    assert track._points['width'][1] == 12
+    assert track._points['width'][2] == 8
+    track.undo()
+    assert track._points['width'].shape == (10, )
+    assert track.total_length > 0
+
+
+def test_undo_add_column(track):
+    track.select([0])
+    track.add_after()
+    track.add_column('width', np.float32, fill=8)
+    track.undo()
+    assert track.P.shape[0] == 10
+    assert np.all(track._points['width'] == 8)
+    track.redo()
+    assert track.P.shape[0] == 11
+    assert np.all(track._points['width'] == 8)
+    track.select([0])
+    track.delete()
+    track.undo()
+    assert track._points['width'].shape == (11, )
+
+
 def test_total_length(track):
     assert abs(track.total_length - track._len.sum()) < 0.01
     assert abs(track.total_length - 1000) < 0.5
@@ -90,3 +118,30 @@ def test_write(track):
     track.P[0] = 0
     assert np.all(track.P[0] == 0)
 
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_dtype(dtype):
+    t = Track(dtype=dtype)
+    for a in (t._data, t._tan, t._len, t._distances):
+        assert a.dtype == dtype
+    t.select([0, 1])
+    t.subdivide()
+    assert t._data.dtype == dtype
+
+
+def test_precision():
+    data = [(100 * np.sin(r), 100 * np.cos(r), 20 * np.sin(3 * r)) for r in np.radians(np.arange(0, 360, 20))]
+    t32 = Track(data, dtype=np.float32)
+    t64 = Track(data, dtype=np.float64)
+    assert abs(t32.total_length - t64.total_length) < 1e-6 * t64.total_length
+    assert np.max(np.abs(t32._data - t64._data)) < 1e-5 * np.max(np.abs(t64._data))
+
+
+def test_construct_rows(track):
+    partial = Track()
+    for t in (track, partial):
+        t.P[[3, 4]] += (10, -5, 2)
+    track.construct()
+    partial.construct(rows=[3, 4])
+    for a, b in ((track.M, partial.M), (track.A, partial.A), (track.B, partial.B)):
+        assert np.allclose(a, b)
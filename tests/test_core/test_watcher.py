@@ -12,12 +12,42 @@ class WatcherTester:
     def arr(self):
         return self._arr.view(Watcher(self.callback))
 
+    @property
+    def indexed_arr(self):
+        return self._arr.view(Watcher(self.indexed_callback, indexed=True))
+
     def callback(self):
         self.called = True
 
+    def indexed_callback(self, item):
+        self.called = item
+
 
 def test_watcher():
     w = WatcherTester()
     w.arr[0] = 4
     assert w.called
     assert w.arr[0] == 4
+
+
+def test_watcher_indexed():
+    w = WatcherTester()
+    w.indexed_arr[1:] = 4
+    assert w.called == slice(1, None)
+    assert w.arr[2] == 4
+
+
+def test_watcher_derived_arrays_unwatched():
+    w = WatcherTester()
+    derived = (w.indexed_arr * 2, w.indexed_arr[[0, 1]], w.indexed_arr[1:])
+    for a in derived:
+        a[0] = 7
+        assert type(a) is np.ndarray
+    assert w.called is False
+
+
+def test_watcher_reductions():
+    w = WatcherTester()
+    total = np.sum(w.arr)
+    assert total == 3
+    assert not isinstance(total, np.ndarray)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from PySide6 import QtGui
+
+from editor.gui.camera import Camera, LockedCamera, to_numpy
+
+
+def uncached(camera):
+    """The view and screen matrices rebuilt from the camera's state, as before caching."""
+    view = QtGui.QMatrix4x4()
+    view.scale(1 / (camera._zoom**3))
+    view.rotate(camera._pitch, -1, 0, 0)
+    view.rotate(camera._rotation, 0, 0, 1)
+    view.translate(-camera._x, -camera._y, 0)
+    return view, camera._scrn * view
+
+
+def unproject(camera, x, y):
+    """Camera.unproject before it was vectorised."""
+    scrn_np_i = to_numpy(uncached(camera)[1].inverted()[0])
+    wv = np.array(((x, y, 0, 1), (x, y, 1, 1))) @ scrn_np_i
+    a = wv[1, :3] - wv[0, :3]
+    if a[2] == 0:
+        return 0, 0
+    return wv[0, 0] - (a[0] / a[2]) * wv[0, 2], wv[0, 1] - (a[1] / a[2]) * wv[0, 2]
+
+
+@pytest.mark.parametrize('cls', [Camera, LockedCamera])
+def test_cache(cls):
+    camera = cls()
+    points = np.array(((0, 0), (320, 240), (17.5, 401), (640, 480)))
+    mutators = [
+        lambda: camera.resize(640, 480),
+        lambda: camera.zoom(2),
+        lambda: camera.translate(120, -35),
+        lambda: camera.rotate(100, -60),
+        lambda: camera.zoom(-3),
+        lambda: camera.resize(300, 700),
+        lambda: camera.rotate(-40, 20),
+        lambda: camera.reset_rotation(),
+        lambda: camera.translate(-5, 7),
+    ]
+    for mutate in mutators:
+        mutate()
+        for _ in range(2):
+            view, scrn = uncached(camera)
+            assert np.allclose(to_numpy(camera.view), to_numpy(view))
+            assert np.allclose(camera.scrn_np, to_numpy(scrn))
+            assert np.allclose(camera.scrn_inverse, to_numpy(scrn.inverted()[0]))
+            assert np.allclose(to_numpy(camera.mvp), to_numpy(camera.proj * view))
+            expected = [unproject(camera, x, y) for x, y in points]
+            assert np.allclose(camera.unproject_points(points), expected)
+            assert np.allclose(camera.unproject(*points[2]), expected[2])
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from PySide6 import QtCore
+
+from editor.gui.changes import ChangeBus, CURVE, GEOMETRY, STYLE, ranges_of, rows_in, rows_of
+
+
+@pytest.mark.parametrize('item, rows', [
+    (3, [3]),
+    (-1, [9]),
+    (slice(2, 5), [2, 3, 4]),
+    ([7, 1, 7], [1, 7]),
+    (np.arange(10) % 4 == 0, [0, 4, 8]),
+    ((slice(None, 2), 0), [0, 1]),
+    ((Ellipsis, 1), list(range(10))),
+])
+def test_rows_of(item, rows):
+    assert rows_of(item, 10).tolist() == rows
+
+
+def test_ranges_of():
+    assert ranges_of(np.array([], dtype=int)) == []
+    assert ranges_of(np.array([4])) == [(4, 5)]
+    assert ranges_of(np.array([1, 2, 3, 7, 9, 10])) == [(1, 4), (7, 8), (9, 11)]
+    assert rows_in(ranges_of(np.array([1, 2, 3, 7, 9, 10]))).tolist() == [1, 2, 3, 7, 9, 10]
+    assert rows_in([]).tolist() == []
+
+
+def test_coalescing(app):
+    bus = ChangeBus()
+    delivered = []
+    bus.changed.connect(delivered.append)
+    bus.invalidate(GEOMETRY, np.array([1, 2]))
+    bus.invalidate(GEOMETRY, np.array([2, 5]))
+    bus.invalidate(STYLE, np.array([0]))
+    bus.invalidate(CURVE, np.array([3]))
+    bus.invalidate(CURVE)
+    bus.invalidate(CURVE, np.array([4]))
+    assert not delivered
+    bus.flush()
+    assert delivered == [{GEOMETRY: [(1, 3), (5, 6)], STYLE: [(0, 1)], CURVE: None}]
+    bus.flush()
+    assert len(delivered) == 1
+
+
+def test_timer(app):
+    bus = ChangeBus(interval=10)
+    delivered = []
+    bus.changed.connect(delivered.append)
+    for n in range(100):
+        bus.invalidate(GEOMETRY, np.array([n % 7]))
+    loop = QtCore.QEventLoop()
+    QtCore.QTimer.singleShot(100, loop.quit)
+    loop.exec()
+    assert delivered == [{GEOMETRY: [(0, 7)]}]
@@ -0,0 +1,59 @@
+import io
+import math
+
+import numpy as np
+import pytest
+
+from editor.core.track import Track
+from editor.gui import flythrough as fly
+
+
+@pytest.fixture(scope='module')
+def jsonstr():
+    rads = [math.radians(d) for d in range(0, 360, 30)]
+    return Track([(300 * math.sin(r), 200 * math.cos(r), 20 * math.sin(3 * r)) for r in rads]).serialize()
+
+
+@pytest.mark.parametrize('frames, size', [(0, 4), (1, 4), (7, 7), (10, 3), (64, 64), (65, 64)])
+def test_chunks(frames, size):
+    chunks = list(fly.chunks(frames, size))
+    covered = [n for first, last in chunks for n in range(first, last)]
+    assert covered == list(range(frames))
+    assert all(0 < last - first <= size for first, last in chunks)
+
+
+def test_camera_on_curve(jsonstr):
+    fly._init_worker(jsonstr)
+    r = fly._renderer
+    track = r.track
+    for d in np.linspace(0, track.total_length, 17)[:-1] + 3.7:
+        fly._frame_at(d)
+        # the segment and offset are those at distance d along the track
+        seg = np.searchsorted(track._distances[:, 1], d, side='right')
+        assert r.segment == seg
+        t = (d - track._distances[seg, 0]) / track._len[seg]
+        assert r.py / r.SCALE == pytest.approx(t * track._len[seg], abs=1e-3)
+        expected = (track.A[seg] * t**3) + (track.B[seg] * t**2) + (track.M[seg] * t) + track.P[seg]
+        assert np.allclose(r.interpolate(r.segment, r.py)[0] / r.SCALE, expected, atol=1e-3)
+
+
+def test_render_chunk(app, jsonstr, tmp_path):
+    fly._init_worker(jsonstr)
+    frame = fly.PreviewRenderer.HEIGHT * fly.PreviewRenderer.WIDTH * 4
+    raw = fly.render_chunk(3, 6, 10.0)
+    assert len(raw) == 3 * frame
+    assert raw[frame:2 * frame] == fly._frame_at(40.0).tobytes()
+    assert fly.render_chunk(3, 6, 10.0, tmp_path) == b''
+    assert sorted(p.name for p in tmp_path.iterdir()) == [f'frame_{n:06d}.png' for n in range(3, 6)]
+
+
+def test_flythrough(jsonstr):
+    raw = io.BytesIO()
+    step = 97.0
+    frames = fly.flythrough(jsonstr, step, raw=raw, workers=2, chunk_size=3)
+    track = Track()
+    track.deserialize(jsonstr)
+    assert frames == int(track.total_length // step)
+    # frames come back in order, however the chunks were scheduled
+    fly._init_worker(jsonstr)
+    assert raw.getvalue() == fly.render_chunk(0, frames, step)
@@ -0,0 +1,100 @@
+import concurrent.futures
+
+import pytest
+from PySide6 import QtCore
+
+from editor.core.track import Track
+from editor.gui import library
+
+
+@pytest.fixture
+def tracks(tmp_path):
+    directory = tmp_path / 'tracks'
+    directory.mkdir()
+    (directory / 'good.json').write_text(Track().serialize())
+    (directory / 'bad.json').write_text('not a track')
+    (directory / 'notes.txt').write_text('ignored')
+    return directory
+
+
+@pytest.fixture
+def dock(app, tmp_path, monkeypatch):
+    # nothing may touch the user's real cache
+    monkeypatch.setattr(library, 'CACHE_PATH', tmp_path / 'default')
+    dock = library.LibraryDock(workers=1, cache=tmp_path / 'cache')
+    yield dock
+    dock.shutdown()
+
+
+def wait_rendered(dock, n, timeout=60000):
+    results = []
+    loop = QtCore.QEventLoop()
+
+    def rendered(generation, path, result):
+        if generation == dock._generation:
+            results.append((path, result))
+        if len(results) == n:
+            loop.quit()
+
+    dock._rendered.connect(rendered)
+    QtCore.QTimer.singleShot(timeout, loop.quit)
+    loop.exec()
+    dock._rendered.disconnect(rendered)
+    return results
+
+
+def test_library(dock, tracks, tmp_path):
+    assert dock.directory is None and dock._list.count() == 0
+    dock.set_directory(tracks)
+    # listed by name before anything has rendered
+    assert [dock._list.item(n).text() for n in range(dock._list.count())] == ['bad', 'good']
+    good, bad = dock._items[str(tracks / 'good.json')], dock._items[str(tracks / 'bad.json')]
+    assert good.icon().cacheKey() == dock._placeholder.cacheKey()
+
+    assert len(wait_rendered(dock, 2)) == 2
+    assert good.icon().cacheKey() != dock._placeholder.cacheKey()
+    assert '10 control points' in good.toolTip()
+    assert bad.icon().cacheKey() == dock._placeholder.cacheKey()
+    assert bad.toolTip().startswith('bad.json\n') and len(bad.toolTip()) > len('bad.json\n')
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+    assert not (tmp_path / 'default').exists()
+
+
+def test_stale_results(dock, tracks):
+    dock.set_directory(tracks)
+    generation = dock._generation
+    dock.refresh()
+    assert dock._generation != generation
+    good = dock._items[str(tracks / 'good.json')]
+    # a result from before the refresh is dropped
+    dock._set_thumbnail(generation, str(tracks / 'good.json'), ValueError('stale'))
+    assert 'stale' not in good.toolTip()
+    wait_rendered(dock, 2)
+    assert good.icon().cacheKey() != dock._placeholder.cacheKey()
+
+
+def test_done(dock, tracks):
+    dock.set_directory(tracks)
+    dock.cancel()
+    path = str(tracks / 'good.json')
+    emitted = []
+    dock._rendered.connect(lambda *args: emitted.append(args))
+    failed = concurrent.futures.Future()
+    failed.set_exception(ValueError('broken'))
+    dock._done(dock._generation, path, failed)
+    assert emitted[-1][2].args == ('broken', )
+    assert 'broken' in dock._items[path].toolTip()
+    cancelled = concurrent.futures.Future()
+    cancelled.cancel()
+    dock._done(dock._generation, path, cancelled)
+    assert len(emitted) == 1
+
+
+def test_shutdown(dock, tracks):
+    dock.set_directory(tracks)
+    assert dock._pool is not None and dock._futures
+    generation = dock._generation
+    dock.shutdown()
+    assert dock._pool is None and not dock._futures
+    assert dock._generation == generation + 1
+    dock.shutdown()
@@ -0,0 +1,54 @@
+import pytest
+from PySide6 import QtCore, QtGui
+
+from editor.gui.mouse import SelectInteraction
+from editor.gui.trackglsl import TrackGLSL
+from editor.gui.view import View3D
+
+
+@pytest.fixture
+def view(app):
+    # no OpenGL here, so picking falls back to projecting the control points
+    view = View3D(None, TrackGLSL())
+    view.gpu_picking = False
+    view._camera.resize(640, 480)
+    return view
+
+
+def mouse_event(kind, x, y):
+    return QtGui.QMouseEvent(
+        kind, QtCore.QPointF(x, y), QtCore.QPointF(x, y), QtCore.Qt.MouseButton.LeftButton,
+        QtCore.Qt.MouseButton.LeftButton, QtCore.Qt.KeyboardModifier.NoModifier
+    )
+
+
+def click(view, x, y):
+    press = mouse_event(QtCore.QEvent.Type.MouseButtonPress, x, y)
+    release = mouse_event(QtCore.QEvent.Type.MouseButtonRelease, x, y)
+    SelectInteraction(view, press, view._camera).release(release)
+
+
+def test_pick_fallback(view):
+    points = view.project_track(view._camera.scrn_np)
+    x, y = points[3]
+    assert view.pick(x + 5, y - 5) == ('point', 3)
+    assert view.pick(x + 30, y) is None
+    click(view, x, y + 2)
+    assert view._track.selected.tolist() == [3]
+    click(view, 320, 240)
+    assert not len(view._track.selected)
+
+
+def test_select_does_not_project(view, monkeypatch):
+    x, y = view.project_track(view._camera.scrn_np)[6]
+    view.gpu_picking = True
+    monkeypatch.setattr(view, '_read_ids', lambda *args: None)
+    projected = []
+    project_track = view.project_track
+    monkeypatch.setattr(view, 'project_track', lambda scrn_np: projected.append(1) or project_track(scrn_np))
+    SelectInteraction(view, mouse_event(QtCore.QEvent.Type.MouseButtonPress, x, y), view._camera)
+    assert not projected
+    # when the pick buffer could not be read, the click still selects
+    click(view, x, y)
+    assert view._track.selected.tolist() == [6]
+    assert projected
@@ -0,0 +1,130 @@
+import math
+
+import numpy as np
+import pytest
+
+from editor.core.track import Track
+from editor.gui.preview import PreviewRenderer
+
+
+@pytest.fixture
+def renderer():
+    r = PreviewRenderer(Track())
+    # onto the last segment of the default track
+    r.move(95000)
+    assert r.segment == r.track.P.shape[0] - 1
+    return r
+
+
+def test_delete_before_update(renderer):
+    renderer.track.select([0, 1])
+    renderer.track.delete()
+    renderer.move(100)
+    renderer.render()
+    assert renderer.segment < renderer.track.P.shape[0]
+
+
+def test_undo_before_update():
+    t = Track()
+    t.select([0])
+    t.add_after()
+    renderer = PreviewRenderer(t)
+    renderer.move(95000)
+    assert renderer.segment == 10
+    t.undo()
+    renderer.render()
+    renderer.move(100)
+    assert renderer.segment < t.P.shape[0]
+
+
+def test_set_data_before_update(renderer):
+    renderer.track.set_data([(0, 0), (100, 0), (0, 100)])
+    renderer.render()
+    renderer.move(100)
+    assert renderer.segment < 3
+
+
+class Baseline:
+    """The preview maths before it was vectorised, in preview units."""
+
+    def __init__(self, track):
+        self.P, self.M, self.A, self.B = (a * 100 for a in (track.P, track.M, track.A, track.B))
+        self.L = np.linalg.norm(self.M, axis=1)
+
+    def interpolate(self, seg, d):
+        L = 1 / self.L[seg]
+        t = d * L
+        r = (self.A[seg] * t**3) + (self.B[seg] * t**2) + (self.M[seg] * t) + self.P[seg]
+        dr = ((3*self.A[seg])*t**2) + ((2*self.B[seg])*t) + self.M[seg]
+        ddr = ((6*self.A[seg])*t) + (2 * self.B[seg])
+        return r, dr * L, ddr * L * L
+
+    def locate(self, segment, py):
+        while py > self.L[segment]:
+            py -= self.L[segment]
+            segment = (segment + 1) % len(self.L)
+        return segment, py
+
+    def draw_lists(self, segment, py, px=0):
+        screenX = 160 + (px * 32)
+        perspectiveDX = (160 - screenX) / 120
+        sx, sy, sz, scale = (np.empty((120, )) for _ in range(4))
+        sp, sdp, sddp = self.interpolate(segment, py)
+        camdir = sdp[:2] / np.linalg.norm(sdp[:2])
+        camdir = np.array((camdir[1], -camdir[0]))
+        for n in range(120):
+            nn = n / 119
+            z = 500 / (1.05 - nn)
+            zz = 200 / z
+            scale[n] = 1 - (nn / 1.01)
+            seg, d = self.locate(segment, py + z)
+            p, dp, ddp = self.interpolate(seg, d)
+            relpos = p - sp
+            sx[n] = (np.dot(relpos[:2], camdir) * zz) + screenX + (n * perspectiveDX)
+            sy[n] = relpos[2] * zz
+            sz[n] = (int(d) % 512) > 255
+        sy -= sy[0]
+        return sx, scale, (np.linspace(239, 120, 120) - sy).astype(int), sz
+
+
+@pytest.fixture
+def hilly():
+    rads = [math.radians(d) for d in range(0, 360, 30)]
+    t = Track([(300 * math.sin(r), 200 * math.cos(r), 20 * math.sin(3 * r)) for r in rads], dtype=np.float64)
+    return t, Baseline(t)
+
+
+def test_interpolate(hilly):
+    track, baseline = hilly
+    r = PreviewRenderer(track)
+    for seg in (0, 5, 11):
+        for d in (0, 123.4, baseline.L[seg] * 0.9):
+            for a, b in zip(r.interpolate(seg, d), baseline.interpolate(seg, d)):
+                assert np.allclose(a, b)
+    d = np.linspace(0, 1000, 7)
+    for a, b in zip(r.interpolate(np.full(7, 3), d), baseline.interpolate(3, d[:, np.newaxis])):
+        assert np.allclose(a, b)
+
+
+def test_locate(hilly):
+    track, baseline = hilly
+    r = PreviewRenderer(track)
+    for segment in (0, 7, 11):
+        r.segment = segment
+        for d in (10.5, 2500.25, baseline.L.sum() * 2.3):
+            seg, py = r.locate(d)
+            assert (seg, py) == pytest.approx(baseline.locate(segment, d))
+
+
+def test_draw_lists(hilly):
+    track, baseline = hilly
+    r = PreviewRenderer(track)
+    r.px = 1.5
+    for step in (0, 777.7, 40000):
+        r.move(step)
+        sx, scale, y, sz = r.draw_lists()
+        bx, bscale, by, bz = baseline.draw_lists(r.segment, r.py, r.px)
+        assert np.allclose(sx, bx)
+        assert np.allclose(scale, bscale)
+        assert np.array_equal(y, by)
+        assert np.array_equal(sz, bz)
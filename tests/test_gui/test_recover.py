@@ -0,0 +1,48 @@
+import pytest
+from PySide6 import QtWidgets
+
+from editor.gui.__main__ import TrackEditor
+
+
+@pytest.fixture
+def asked(monkeypatch):
+    asked = []
+    monkeypatch.setattr(
+        QtWidgets.QMessageBox, 'question',
+        lambda *args: asked.append(args) or QtWidgets.QMessageBox.StandardButton.Yes
+    )
+    return asked
+
+
+def edited(app, directory):
+    editor = TrackEditor(journal=directory)
+    editor._track.select([0])
+    editor._track.delete()
+    editor._journal.flush()
+    return editor
+
+
+def test_running_not_recovered(app, tmp_path, asked):
+    running = edited(app, tmp_path)
+    editor = TrackEditor(journal=tmp_path)
+    editor.recover()
+    assert not asked
+    assert running._journal.path.exists()
+    for e in (running, editor):
+        e.close()
+    assert not list(tmp_path.iterdir())
+
+
+def test_crashed_recovered(app, tmp_path, asked):
+    crashed = edited(app, tmp_path)
+    # leaves the journal behind, and releases the lock as exiting would
+    crashed._journal.close(discard=False)
+    crashed._lock.unlock()
+    editor = TrackEditor(journal=tmp_path)
+    editor.recover()
+    assert len(asked) == 1
+    assert editor._track.P.shape[0] == 9
+    assert not crashed._journal.path.exists()
+    editor.recover()
+    assert len(asked) == 1
+    editor.close()
@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+import pytest
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from editor.gui.__main__ import TrackEditor
+from editor.gui.replay import EventRecorder, Replay, make_event, menu_actions
+from editor.gui.view import BaseView
+
+
+Qt = QtCore.Qt
+Type = QtCore.QEvent.Type
+
+
+@pytest.fixture
+def editor(app):
+    editors = []
+
+    def editor():
+        e = TrackEditor()
+        e.resize(800, 700)
+        e.show()
+        QtWidgets.QApplication.processEvents()
+        views = {view.description: view for view in e.findChildren(BaseView)}
+        for view in views.values():
+            # no OpenGL, so resizeGL never runs
+            view._camera.resize(view.width(), view.height())
+            view.gpu_picking = False
+        editors.append(e)
+        return e, views
+
+    yield editor
+    for e in editors:
+        e.close()
+
+
+def read(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def mouse(kind, button, buttons, x, y):
+    return QtGui.QMouseEvent(
+        kind, QtCore.QPointF(x, y), QtCore.QPointF(x, y), button, buttons, Qt.KeyboardModifier.NoModifier
+    )
+
+
+def without_time(records):
+    return [{k: v for k, v in record.items() if k != 't'} for record in records]
+
+
+def test_round_trip(editor, tmp_path):
+    recorded, views = editor()
+    recorder = EventRecorder(recorded, tmp_path / 'recorded.jsonl')
+    xy = views['XY']
+    x, y = xy.project_track(xy._camera.scrn_np)[3]
+    events = [
+        (xy, mouse(Type.MouseButtonPress, Qt.MouseButton.LeftButton, Qt.MouseButton.LeftButton, x, y)),
+        # a drag too short to start a rubber band
+        (xy, mouse(Type.MouseMove, Qt.MouseButton.NoButton, Qt.MouseButton.LeftButton, x + 3, y + 2)),
+        (xy, mouse(Type.MouseButtonRelease, Qt.MouseButton.LeftButton, Qt.MouseButton.NoButton, x, y)),
+        (views['Z'], QtGui.QWheelEvent(
+            QtCore.QPointF(10, 20), QtCore.QPointF(10, 20), QtCore.QPoint(), QtCore.QPoint(0, -120),
+            Qt.MouseButton.NoButton, Qt.KeyboardModifier.ShiftModifier, Qt.ScrollPhase.NoScrollPhase, False
+        )),
+        (xy, QtGui.QKeyEvent(Type.KeyPress, Qt.Key.Key_Q, Qt.KeyboardModifier.NoModifier, 'q')),
+        (xy, QtGui.QKeyEvent(Type.KeyRelease, Qt.Key.Key_Q, Qt.KeyboardModifier.NoModifier, 'q')),
+    ]
+    for view, event in events:
+        QtWidgets.QApplication.sendEvent(view, event)
+    assert recorded._track.selected.tolist() == [3]
+    dict(menu_actions(recorded.menuBar()))['Control Points/Delete'].trigger()
+    recorder._file.close()
+
+    start, *records = read(tmp_path / 'recorded.jsonl')
+    assert [r['type'] for r in records] == ['press', 'move', 'release', 'wheel', 'key_press', 'key_release', 'action']
+    assert [r['t'] for r in records] == sorted(r['t'] for r in records)
+
+    # each event is rebuilt as it was sent
+    for (view, event), record in zip(events, records):
+        rebuilt = make_event(record)
+        assert rebuilt.type() == event.type()
+        assert rebuilt.modifiers() == event.modifiers()
+        if isinstance(event, QtGui.QKeyEvent):
+            assert (rebuilt.key(), rebuilt.text()) == (event.key(), event.text())
+        else:
+            assert rebuilt.position() == event.position()
+            assert rebuilt.buttons() == event.buttons()
+
+    replayed, _ = editor()
+    replayed._track.deserialize(start['track'])
+    replayer = EventRecorder(replayed, tmp_path / 'replayed.jsonl')
+    session = Replay(replayed, records, speed=10)
+    session.run(settle=0)
+    replayer._file.close()
+    assert without_time(read(tmp_path / 'replayed.jsonl')[1:]) == without_time(records)
+    assert session.report()['events'] == len(records)
+    assert replayed._track.P.shape[0] == 9
+    assert np.array_equal(replayed._track.P, recorded._track.P)
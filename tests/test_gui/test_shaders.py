@@ -0,0 +1,81 @@
+import json
+import shutil
+
+import pytest
+
+from editor.gui import shaders
+
+
+DRIVER = b'Vendor\nRenderer\n4.6'
+FILES = ['curve.vert', 'pick.frag']
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    directory = tmp_path / 'shaders'
+    shutil.copytree(shaders.SHADER_PATH, directory)
+    monkeypatch.setattr(shaders, 'SHADER_PATH', directory)
+    return directory
+
+
+def test_program_key(sources):
+    key = shaders.program_key(FILES, DRIVER)
+    assert key == shaders.program_key(FILES, DRIVER)
+    assert key != shaders.program_key(FILES, DRIVER + b'.1')
+    assert key != shaders.program_key(FILES[::-1], DRIVER)
+    assert key != shaders.program_key(FILES[:1], DRIVER)
+    for f in FILES:
+        original = (sources / f).read_text()
+        (sources / f).write_text(original + '\n')
+        assert shaders.program_key(FILES, DRIVER) != key
+        (sources / f).write_text(original)
+    assert shaders.program_key(FILES, DRIVER) == key
+
+
+def test_program_key_boundaries(sources):
+    (sources / 'a').write_text('ab')
+    (sources / 'b').write_text('c')
+    (sources / 'c').write_text('a')
+    (sources / 'd').write_text('bc')
+    assert shaders.program_key(['a', 'b'], DRIVER) != shaders.program_key(['c', 'd'], DRIVER)
+
+
+def introspected(loc):
+    calls = []
+
+    def introspect():
+        calls.append(1)
+        return loc
+    return introspect, calls
+
+
+def test_load_locations(tmp_path):
+    loc = {'matrix': 0, 'position': 1}
+    introspect, calls = introspected(loc)
+    assert shaders.load_locations('key', introspect, tmp_path) == loc
+    assert json.loads((tmp_path / 'key.json').read_text()) == loc
+    assert shaders.load_locations('key', introspect, tmp_path) == loc
+    assert len(calls) == 1
+    # another program or driver misses the cache
+    assert shaders.load_locations('other', introspect, tmp_path) == loc
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize('content', [
+    b'{"matrix": 0, "posit', b'\xff\xfe\x00', b'', b'[0, 1]', b'{"matrix": "0"}', b'null',
+])
+def test_load_locations_corrupt(tmp_path, content):
+    (tmp_path / 'key.json').write_bytes(content)
+    loc = {'matrix': 3}
+    introspect, calls = introspected(loc)
+    assert shaders.load_locations('key', introspect, tmp_path) == loc
+    assert len(calls) == 1
+    # and the cache is repaired
+    assert json.loads((tmp_path / 'key.json').read_text()) == loc
+
+
+def test_load_locations_unwritable(tmp_path):
+    blocked = tmp_path / 'file'
+    blocked.write_text('')
+    introspect, calls = introspected({'matrix': 0})
+    assert shaders.load_locations('key', introspect, blocked / 'cache') == {'matrix': 0}